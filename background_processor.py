@@ -2,35 +2,130 @@
 """
 Background processor for all data comparisons
 Handles KPI, landing page widgets, and drillthrough widget comparisons in parallel
+
+The shared processor is created on first use (get_background_processor or
+any submit_*_bg helper); importing this module starts no threads, pools or
+DB connections. Comparison modules are imported when a task needs them.
 """
 
+import asyncio
 import threading
 import queue
 import time
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from kpistoreprocedures import Data, compare_kpi_data, read_kpi_from_excel
-from widgetstoreprocedures import read_widget_values, fetch_db_widget_values, compare_widget_data, widget_sp_map
-from drillthrough_db_handler import DrillthroughDBHandler
-from dynamic_comparison_engine import DynamicComparisonEngine
+import itertools
+import json
+import sys
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from config_loader import config_loader
+from sheet_comparison import create_process_pool, set_sheet_executor
+from comparison_summary import summary_path_for, aggregate_summaries
+from sidecar_tables import report_size
+from sp_batch import SPBatch, batch_scope, group_by_requirements
+from sp_parameters import landing_params, drillthrough_params
+from report_writer import ReportWriter
+from task_journal import TaskJournal, journal_config, inputs_available
+
+# Queued on task_queue / batch_queue to stop the worker and batch threads
+_STOP = object()
+
+# Lower runs first; overridable with performance.parallel_processing.task_priorities
+DEFAULT_TASK_PRIORITIES = {
+    'kpi_comparison': 0,
+    'landing_widget_comparison': 1,
+    'drillthrough_widget_comparison': 2
+}
 
 class BackgroundProcessor:
-    def __init__(self):
-        self.task_queue = queue.Queue()
+    def __init__(self, execution_mode=None, process_workers=None, summary_only=None):
+        """
+        Args:
+            execution_mode: 'thread' (default) runs comparisons in the thread pool only;
+                'process' additionally schedules sheet-level comparison work on a
+                process pool so CPU-bound parsing/rounding uses all cores
+            process_workers: Process pool size (defaults to CPU count)
+            summary_only: Write compact JSON verdicts instead of Excel reports
+                (defaults to reporting.summary_only in dynamic_engine_config.yaml)
+        """
+        # Priority queue of (deadline, priority, sequence, task): tasks with an explicit
+        # deadline first (earliest first), then by task type priority, then FIFO
+        self.task_queue = queue.PriorityQueue()
         self.results_queue = queue.Queue()
-        self.executor = ThreadPoolExecutor(max_workers=4)  # Increased to 4 threads
+        self.max_workers = 4
+        # Set on the worker and pool threads (tasks, completion and progress callbacks),
+        # which must never wait on backpressure: they would stall dispatch
+        self._own_thread = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,  # Increased to 4 threads
+                                           initializer=self._mark_own_thread)
+        # Tasks are only handed to the executor when a thread is free, so the
+        # backlog waits in the priority queue rather than the executor's FIFO
+        self._free_workers = threading.Semaphore(self.max_workers)
+        self._sequence = itertools.count()
+        
+        # Optional process pool for the CPU-heavy comparison stage.
+        # DB results are still fetched by the task threads in this process.
+        parallel_config = config_loader.get_dynamic_engine_config().get("performance", {}).get("parallel_processing", {})
+        self.execution_mode = execution_mode or parallel_config.get("execution_mode", "thread")
+        self.task_priorities = dict(DEFAULT_TASK_PRIORITIES, **(parallel_config.get("task_priorities") or {}))
+        
+        # Backpressure: at most queue_limit comparisons wait in memory (0 = unbounded);
+        # beyond that producers are blocked, slowed down, or their tasks spilled to disk
+        backpressure = parallel_config.get("backpressure", {}) or {}
+        self.queue_limit = backpressure.get("queue_limit", 0) or 0
+        self.backpressure_policy = backpressure.get("policy", "block")
+        self.slow_delay = backpressure.get("slow_delay", 0.5)
+        self.max_slow_delay = backpressure.get("max_delay", 5)
+        self.spill_dir = backpressure.get("spill_dir", os.path.join("download", ".task_spill"))
+        self._spilled = deque()  # Spill file paths, oldest first
+        self.producer_wait = 0.0
+        self.spilled_total = 0
+        self.queue_depth_samples = []  # (time, queued in memory, active, spilled)
+        self.process_pool = None
+        if self.execution_mode == "process":
+            self.process_pool = create_process_pool(process_workers or parallel_config.get("process_workers"))
+            set_sheet_executor(self.process_pool)
+        
+        # Summary-only gating mode: comparisons write *_summary.json instead of workbooks
+        reporting_config = config_loader.get_dynamic_engine_config().get("reporting", {}) or {}
+        self.summary_only = reporting_config.get("summary_only", False) if summary_only is None else summary_only
+        self.summary_paths = []
         
         # Initialize dynamic comparison engine
+        from dynamic_comparison_engine import DynamicComparisonEngine
         self.dynamic_engine = DynamicComparisonEngine()
         print("🧠 Background processor initialized with dynamic comparison engine")
+        
+        # Task registry: every submitted task from queueing to completion.
+        # Executor callback threads update it, so all access goes through _tasks_changed.
+        self._tasks_changed = threading.Condition()
+        self.task_records = {}
         self.active_tasks = {}
         self.completed_tasks = {}
+        self._pending = 0
+        self._progress_callbacks = []
+        self._task_counter = itertools.count(1)
+        # Part of every task id, so ids stay unique across runs sharing one journal
+        self.run_id = uuid.uuid4().hex[:8]
         self.running = True
         
+        # Persistent task journal (crash recovery / resume)
+        journal_settings = journal_config()
+        self.journal = None
+        if journal_settings.get("enabled", False):
+            self.journal = TaskJournal(journal_settings.get("path", os.path.join("download", ".task_journal.sqlite")))
+        
         # Enhanced features
         self.db_cache = {}  # Cache DB results
         self.sp_performance = {}  # Track SP performance
         self.batch_queue = queue.Queue()  # For batch processing
+        # Tasks queued within batch_window seconds share the DB results they have in common (0 = off)
+        self.batch_window = parallel_config.get("batch_window", 0) or 0
+        self._batching = True  # Cleared under _dispatch_lock once the batch thread is told to stop
+        self._dispatch_lock = threading.Lock()
+        self._batch_counter = itertools.count(1)
         self.cache_lock = threading.Lock()
         
         # Start background worker
@@ -41,76 +136,159 @@ class BackgroundProcessor:
         self.batch_thread = threading.Thread(target=self._batch_processor, daemon=True)
         self.batch_thread.start()
         
-        print("🔄 Enhanced background processor started with 4 worker threads + batch processing")
+        print(f"🔄 Enhanced background processor started with 4 worker threads + batch processing ({self.execution_mode} mode"
+              f"{', summary only' if self.summary_only else ''})")
 
     def _batch_processor(self):
-        """Batch processor for handling multiple similar tasks efficiently"""
+        """Batch processor: coalesce the DB work of tasks queued within batch_window seconds"""
         print("🔄 Batch processor thread started")
         
-        while self.running:
+        stopping = False
+        while not stopping:
+            # Blocks until a task or the stop sentinel arrives; no periodic wake-ups
+            task = self.batch_queue.get()
+            if task is _STOP:
+                break
+            batch = [task]
+            
+            # Collect whatever else arrives within the window
+            deadline = time.time() + self.batch_window
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    task = self.batch_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if task is _STOP:
+                    stopping = True
+                    break
+                batch.append(task)
+            
             try:
-                # Simple batch processing - can be enhanced later
-                time.sleep(1)  # Check every second
-                
-                # For now, just ensure the thread runs without errors
-                # Actual batch processing logic can be added later
-                
+                self._assign_sp_batches(batch)
             except Exception as e:
                 print(f"❌ Batch processor error: {e}")
-                time.sleep(1)  # Prevent tight error loop
+            for task in batch:
+                self._enqueue(task)
+
+    def _sp_requirements(self, task):
+        """(SP, params) pairs a task is expected to fetch"""
+        task_type = task['type']
+        if task_type == 'kpi_comparison':
+            if task.get('db_kpis') is not None:
+                return set()  # DB values were fetched before the task was queued
+            from kpistoreprocedures import kpi_sp_calls
+            calls = kpi_sp_calls(task.get('is_drillthrough', False), task.get('extra_params'))
+            return {(proc_name, params) for _, proc_name, params, _ in calls}
+        if task_type == 'landing_widget_comparison':
+            params = landing_params()
+        elif task_type == 'drillthrough_widget_comparison':
+            # Same parameters DrillthroughDBHandler executes with, without building one (no connection here)
+            params = drillthrough_params(task['submenu_selection'])
+        else:
+            return set()
+        # The dynamic engine picks each sheet's SP from the available SPs
+        return {(sp_name, params) for sp_name in self.dynamic_engine.available_sps}
+
+    def _assign_sp_batches(self, tasks):
+        """Give each group of tasks needing common (SP, params) pairs a shared SPBatch"""
+        requirements = [self._sp_requirements(task) for task in tasks]
+        for group in group_by_requirements(requirements):
+            if len(group) < 2:
+                continue
+            requested = sum(len(requirements[i]) for i in group)
+            unique = len(set().union(*(requirements[i] for i in group)))
+            batch = SPBatch(f"Batch {next(self._batch_counter)}", task_count=len(group))
+            with self._tasks_changed:
+                for i in group:
+                    self.task_records[tasks[i]['id']]['sp_batch'] = batch
+            print(f"🧺 {batch.name}: {len(group)} comparisons share {unique} unique (SP, params) pairs "
+                  f"(up to {requested - unique} repeat fetches avoided)")
+
+    def _mark_own_thread(self):
+        self._own_thread.marked = True
 
     def _worker(self):
-        """Background worker that processes tasks from the queue"""
-        while self.running:
+        """Background worker that dispatches the most urgent queued task whenever a pool thread is free"""
+        self._mark_own_thread()
+        while True:
+            self._free_workers.acquire()
+            task = self.task_queue.get()[-1]  # Blocks while idle instead of polling
+            if task is _STOP:
+                self._free_workers.release()
+                break
             try:
-                if not self.task_queue.empty():
-                    task = self.task_queue.get(timeout=1)
-                    task_id = task['id']
-                    task_type = task['type']
-                    
-                    print(f"🔄 Background: Starting {task_type} (ID: {task_id})")
-                    self.active_tasks[task_id] = task
-                    
-                    # Submit task to thread pool
-                    future = self.executor.submit(self._execute_task, task)
-                    
-                    # Handle completion
-                    def on_complete(fut):
-                        try:
-                            result = fut.result()
-                            self.completed_tasks[task_id] = result
-                            self.active_tasks.pop(task_id, None)
-                            self.results_queue.put({
-                                'id': task_id,
-                                'type': task_type,
-                                'result': result,
-                                'status': 'completed'
-                            })
-                            print(f"✅ Background: Completed {task_type} (ID: {task_id})")
-                        except Exception as e:
-                            self.completed_tasks[task_id] = {'error': str(e)}
-                            self.active_tasks.pop(task_id, None)
-                            self.results_queue.put({
-                                'id': task_id,
-                                'type': task_type,
-                                'error': str(e),
-                                'status': 'failed'
-                            })
-                            print(f"❌ Background: Failed {task_type} (ID: {task_id}): {e}")
-                    
-                    future.add_done_callback(on_complete)
-                else:
-                    time.sleep(0.1)  # Brief pause when queue is empty
+                print(f"🔄 Background: Starting {task['type']} (ID: {task['id']})")
+                with self._tasks_changed:
+                    self.active_tasks[task['id']] = task
+                    self._sample_depth()
+                    self._tasks_changed.notify_all()  # Room in the queue for blocked producers
+                self._refill_from_spill()
+                
+                # Submit task to thread pool
+                future = self.executor.submit(self._run_task, task)
+                future.add_done_callback(lambda fut, task=task: self._finish_task(task, fut))
                     
-            except queue.Empty:
-                continue
             except Exception as e:
+                self._free_workers.release()
                 print(f"❌ Background worker error: {e}")
 
+    def _run_task(self, task):
+        """Thread pool entry point: record the start time, then run the comparison"""
+        with self._tasks_changed:
+            record = self.task_records[task['id']]
+            record['status'] = 'active'
+            record['started_at'] = time.time()
+        self._journal("record_started", task['id'])
+        self._notify_progress(record)
+        with batch_scope(record.get('sp_batch')):
+            return self._execute_task(task)
+
+    def _finish_task(self, task, fut):
+        """Executor callback: record the outcome, wake waiters and report progress"""
+        task_id, task_type = task['id'], task['type']
+        self._free_workers.release()
+        error = fut.exception()
+        result = {'error': str(error)} if error else fut.result()
+        # Journal first: once waiters are woken the process may exit
+        self._journal("record_finished", task_id, 'failed' if error else 'completed', result)
+        with self._tasks_changed:
+            record = self.task_records[task_id]
+            record['status'] = 'failed' if error else 'completed'
+            record['finished_at'] = time.time()
+            self.completed_tasks[task_id] = result
+            self.active_tasks.pop(task_id, None)
+            self._pending -= 1
+            self._sample_depth()
+            self._tasks_changed.notify_all()
+        if record.get('sp_batch'):
+            record['sp_batch'].release()
+        
+        entry = {'id': task_id, 'type': task_type, 'status': record['status'], 'duration': self._duration(record)}
+        entry.update({'error': str(error)} if error else {'result': result})
+        self.results_queue.put(entry)
+        if error:
+            print(f"❌ Background: Failed {task_type} (ID: {task_id}): {error}")
+        else:
+            print(f"✅ Background: Completed {task_type} (ID: {task_id}) in {entry['duration']:.1f}s")
+        # A caller may have cancelled the shared Future (e.g. an awaiting coroutine timing out)
+        if not record['future'].done():
+            if error:
+                record['future'].set_exception(error)
+            else:
+                record['future'].set_result(result)
+        self._notify_progress(record)
+
     def _execute_task(self, task):
         """Execute a specific task based on its type"""
         task_type = task['type']
         
+        if self.summary_only:
+            task = dict(task, output_path=summary_path_for(task['output_path']))
+            self.summary_paths.append(task['output_path'])
+        
         if task_type == 'kpi_comparison':
             return self._compare_kpi(task)
         elif task_type == 'landing_widget_comparison':
@@ -122,6 +300,7 @@ class BackgroundProcessor:
 
     def _compare_kpi(self, task):
         """Background KPI comparison"""
+        from kpistoreprocedures import Data, compare_kpi_data, read_kpi_from_excel
         try:
             excel_path = task['excel_path']
             output_path = task['output_path']
@@ -131,9 +310,11 @@ class BackgroundProcessor:
             # Read KPI from Excel
             excel_data = read_kpi_from_excel(excel_path)
             
-            # Fetch DB data
-            data = Data(is_drillthrough=is_drillthrough, extra_params=extra_params)
-            db_kpis = data.fetch_db_kpi_values()
+            # Fetch DB data, unless the caller already fetched it (e.g. while the browser was busy)
+            db_kpis = task.get('db_kpis')
+            if db_kpis is None:
+                data = Data(is_drillthrough=is_drillthrough, extra_params=extra_params)
+                db_kpis = data.fetch_db_kpi_values()
             
             # Compare and save
             compare_kpi_data(excel_data, db_kpis, output_path)
@@ -157,7 +338,7 @@ class BackgroundProcessor:
             print(f"🧠 Background landing widget comparison using dynamic engine...")
             
             # Try dynamic comparison first
-            params = (2024, None, None, None, None, None, None)
+            params = landing_params()
             success = self.dynamic_engine.dynamic_compare_data(
                 excel_path=excel_path,
                 params=params,
@@ -165,7 +346,7 @@ class BackgroundProcessor:
             )
             
             if success:
-                file_size = os.path.getsize(output_path)
+                file_size = report_size(output_path)
                 return {
                     'success': True,
                     'output_path': output_path,
@@ -184,6 +365,7 @@ class BackgroundProcessor:
     
     def _legacy_compare_landing_widgets(self, task):
         """Legacy background landing page widget comparison (fallback)"""
+        from widgetstoreprocedures import read_widget_values, fetch_db_widget_values, compare_widget_data, widget_sp_map
         try:
             excel_path = task['excel_path']
             output_path = task['output_path']
@@ -195,7 +377,7 @@ class BackgroundProcessor:
             excel_data = read_widget_values(excel_path, normalized_widget_map)
             
             # Fetch DB data
-            params = (2024, None, None, None, None, None, None)
+            params = landing_params()
             db_data = fetch_db_widget_values(widget_sp_map, params)
             
             # Compare and save
@@ -221,6 +403,7 @@ class BackgroundProcessor:
             output_path = task['output_path']
             
             # Use drillthrough handler
+            from drillthrough_db_handler import DrillthroughDBHandler
             db_handler = DrillthroughDBHandler()
             success = db_handler.compare_drillthrough_widgets(
                 excel_path, widget_title, submenu_selection, output_path
@@ -238,39 +421,325 @@ class BackgroundProcessor:
         """Normalize names for comparison"""
         return ''.join(name.lower().strip().replace('_', '').replace(' ', ''))
 
+    # Task registry
+
+    def _register(self, task):
+        """Add a task to the registry (caller holds _tasks_changed)"""
+        record = {
+            'id': task['id'],
+            'type': task['type'],
+            'status': 'queued',
+            'queued_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'priority': task['priority'],
+            'deadline': task['deadline'],
+            'future': Future(),
+            'sp_batch': None
+        }
+        self.task_records[task['id']] = record
+        self._pending += 1
+        return record
+
+    def _queue_task(self, task, priority=None, deadline=None, block=True):
+        """
+        Register a task and queue it for dispatch; returns its Future
+
+        Args:
+            priority: Overrides the task type's priority (lower runs first)
+            deadline: Seconds from now the task should have started by; tasks with
+                a deadline are dispatched before all others, earliest first
+            block: False for callers that must not wait (download events, executor
+                callbacks): over the queue limit their task is spilled to disk
+                whatever the backpressure policy
+        """
+        task['priority'] = self.task_priorities.get(task['type'], len(self.task_priorities)) if priority is None else priority
+        task['deadline'] = time.time() + deadline if deadline is not None else None
+        spill = self._apply_backpressure(block)
+        with self._tasks_changed:
+            record = self._register(task)
+            if spill:
+                self._spill(task)
+            self._sample_depth()
+        self._journal("record_queued", task, self.run_id)
+        if not spill:
+            self._dispatch_queue(task)
+        return record['future']
+
+    def _dispatch_queue(self, task):
+        with self._dispatch_lock:
+            if self.batch_window > 0 and self._batching:
+                self.batch_queue.put(task)
+                return
+        self._enqueue(task)
+
+    # Backpressure
+
+    def _queued_in_memory(self):
+        """Registered tasks waiting for dispatch, excluding spilled ones (caller holds _tasks_changed)"""
+        return self._pending - len(self.active_tasks) - len(self._spilled)
+
+    def _sample_depth(self):
+        """Record queue depth over time (caller holds _tasks_changed)"""
+        self.queue_depth_samples.append((time.time(), self._queued_in_memory(), len(self.active_tasks), len(self._spilled)))
+
+    def _apply_backpressure(self, block=True):
+        """
+        Apply the backpressure policy to a producer about to queue a task
+
+        Only block=True producers are ever blocked or slowed down, and never on
+        the processor's own threads: their tasks are spilled instead.
+
+        Returns:
+            True when the task should be spilled to disk instead of queued in memory
+        """
+        if not self.queue_limit:
+            return False
+        with self._tasks_changed:
+            depth = self._queued_in_memory()
+            if depth < self.queue_limit:
+                return False
+            if self.backpressure_policy == "spill" or not block or getattr(self._own_thread, 'marked', False):
+                return True
+            if self.backpressure_policy == "block":
+                print(f"⏸️ Backpressure: {depth} comparisons queued (limit {self.queue_limit}), producer waiting...")
+                start = time.time()
+                while self._queued_in_memory() >= self.queue_limit:
+                    self._tasks_changed.wait()
+                self.producer_wait += time.time() - start
+                return False
+        # "slow": delay the producer in proportion to how far the queue is over its limit
+        delay = min(self.max_slow_delay, self.slow_delay * (depth - self.queue_limit + 1))
+        print(f"🐢 Backpressure: {depth} comparisons queued (limit {self.queue_limit}), slowing producer {delay:.1f}s")
+        time.sleep(delay)
+        self.producer_wait += delay
+        return False
+
+    def _spill(self, task):
+        """Park a task on disk until the queue has room (caller holds _tasks_changed)"""
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"{next(self._sequence):09d}_{task['id']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(task, f)
+        self._spilled.append(path)
+        self.spilled_total += 1
+        print(f"💾 Backpressure: spilled {task['id']} to disk ({len(self._spilled)} spilled)")
+
+    def _refill_from_spill(self):
+        """Move spilled tasks back into the queue, oldest first, while it is below its limit"""
+        refill = []
+        with self._tasks_changed:
+            while self._spilled and self._queued_in_memory() < self.queue_limit:
+                path = self._spilled.popleft()
+                with open(path, "r", encoding="utf-8") as f:
+                    refill.append(json.load(f))
+                os.remove(path)
+        for task in refill:
+            self._dispatch_queue(task)
+
+    def get_queue_metrics(self):
+        """Queue depth samples over time plus backpressure totals"""
+        with self._tasks_changed:
+            samples = list(self.queue_depth_samples)
+        return {
+            'samples': samples,
+            'max_queued': max((q for _, q, _, _ in samples), default=0),
+            'max_spilled': max((sp for _, _, _, sp in samples), default=0),
+            'spilled_total': self.spilled_total,
+            'producer_wait': self.producer_wait
+        }
+
+    def _journal(self, method, *args):
+        if self.journal is None:
+            return
+        try:
+            getattr(self.journal, method)(*args)
+        except Exception as e:
+            print(f"⚠️ Task journal write failed ({method}): {e}")
+
+    def resume_from_journal(self):
+        """
+        Re-queue the comparisons an earlier run queued but never finished
+
+        Tasks keep their ids; ones whose Excel input is gone are marked
+        'abandoned' in the journal instead.
+
+        Returns:
+            The re-queued task ids
+        """
+        if self.journal is None:
+            print("⚠️ Task journal disabled (performance.task_journal.enabled), nothing to resume")
+            return []
+
+        resumed = []
+        for task in self.journal.unfinished(exclude_run=self.run_id):
+            attempts = task.pop('attempts', 1)
+            if not inputs_available(task.get('excel_path')):
+                print(f"⚠️ Not resuming {task['id']}: input missing ({task.get('excel_path')})")
+                self.journal.set_status(task['id'], 'abandoned')
+                continue
+            self._queue_task(task, priority=task.get('priority'))
+            resumed.append(task['id'])
+            print(f"♻️ Resumed {task['type']} (ID: {task['id']}, attempt {attempts + 1})")
+        print(f"♻️ {len(resumed)} unfinished comparisons re-queued from {self.journal.path}")
+        return resumed
+
+    def _enqueue(self, task):
+        deadline = task['deadline'] if task['deadline'] is not None else float('inf')
+        self.task_queue.put((deadline, task['priority'], next(self._sequence), task))
+
+    @staticmethod
+    def _duration(record):
+        if record['started_at'] is None:
+            return 0.0
+        return (record['finished_at'] or time.time()) - record['started_at']
+
+    def _notify_progress(self, record):
+        if not self._progress_callbacks:
+            return
+        with self._tasks_changed:
+            total = len(self.task_records)
+            finished = total - self._pending
+            callbacks = list(self._progress_callbacks)
+        event = {
+            'id': record['id'],
+            'type': record['type'],
+            'status': record['status'],
+            'queue_wait': (record['started_at'] or time.time()) - record['queued_at'],
+            'duration': self._duration(record),
+            'finished': finished,
+            'total': total
+        }
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"⚠️ Progress callback error: {e}")
+
+    def add_progress_callback(self, callback):
+        """
+        Call callback(event) whenever a task starts or finishes
+
+        event: {'id', 'type', 'status' ('active'/'completed'/'failed'),
+                'queue_wait', 'duration' (seconds), 'finished', 'total'}
+        """
+        with self._tasks_changed:
+            self._progress_callbacks.append(callback)
+
+    def remove_progress_callback(self, callback):
+        with self._tasks_changed:
+            if callback in self._progress_callbacks:
+                self._progress_callbacks.remove(callback)
+
+    def get_future(self, task_id):
+        """Future resolved with the task's result dict (or its exception) when it finishes"""
+        with self._tasks_changed:
+            return self.task_records[task_id]['future']
+
+    def get_task_timings(self):
+        """Per-task scheduling and run time (seconds), in submission order"""
+        with self._tasks_changed:
+            records = list(self.task_records.values())
+        timings = []
+        for r in records:
+            started = r['started_at'] or time.time()
+            timings.append({
+                'id': r['id'],
+                'type': r['type'],
+                'status': r['status'],
+                'priority': r['priority'],
+                'deadline_missed': r['deadline'] is not None and started > r['deadline'],
+                'queue_wait': started - r['queued_at'],
+                'duration': self._duration(r)
+            })
+        return timings
+
+    def write_scheduling_report(self, output_path):
+        """
+        Report queue wait and run time per task, plus wait statistics per task type
+
+        Returns:
+            output_path
+        """
+        timings = self.get_task_timings()
+        by_type = {}
+        for t in timings:
+            by_type.setdefault(t['type'], []).append(t['queue_wait'])
+        by_type = sorted(by_type.items(), key=lambda item: self.task_priorities.get(item[0], len(self.task_priorities)))
+
+        with ReportWriter(output_path) as report:
+            report.write_sheet(
+                "Tasks",
+                ["Task ID", "Type", "Priority", "Status", "Queue Wait (s)", "Run Time (s)", "Deadline Missed"],
+                ([t['id'], t['type'], t['priority'], t['status'], round(t['queue_wait'], 3),
+                  round(t['duration'], 3), "Yes" if t['deadline_missed'] else ""] for t in timings)
+            )
+            metrics = self.get_queue_metrics()
+            start = metrics['samples'][0][0] if metrics['samples'] else 0
+            report.write_sheet(
+                "Queue Depth",
+                ["Elapsed (s)", "Queued", "Active", "Spilled"],
+                ([round(t - start, 3), queued, active, spilled] for t, queued, active, spilled in metrics['samples'])
+            )
+            report.write_sheet(
+                "By Type",
+                ["Type", "Tasks", "Mean Wait (s)", "Max Wait (s)"],
+                ([task_type, len(waits), round(sum(waits) / len(waits), 3), round(max(waits), 3)]
+                 for task_type, waits in by_type)
+            )
+        for task_type, waits in by_type:
+            print(f"⏱️ {task_type}: {len(waits)} tasks, mean queue wait {sum(waits) / len(waits):.1f}s, max {max(waits):.1f}s")
+        if self.queue_limit:
+            print(f"📈 Queue depth peaked at {metrics['max_queued']} (limit {self.queue_limit}); producers waited "
+                  f"{metrics['producer_wait']:.1f}s, {metrics['spilled_total']} tasks spilled to disk")
+        print(f"📄 Scheduling report: {output_path}")
+        return output_path
+
     # Public methods for submitting tasks
+
+    def _task_id(self, prefix):
+        """Unique task id: pipelined runs can queue several tasks within one millisecond, and the journal spans runs"""
+        return f"{prefix}_{int(time.time() * 1000)}_{self.run_id}_{next(self._task_counter)}"
     
-    def submit_kpi_comparison(self, excel_path, output_path, is_drillthrough=False, extra_params=None):
-        """Submit KPI comparison task to background queue"""
-        task_id = f"kpi_{int(time.time() * 1000)}"
+    def submit_kpi_comparison(self, excel_path, output_path, is_drillthrough=False, extra_params=None,
+                              priority=None, deadline=None, db_kpis=None, block=True):
+        """
+        Submit KPI comparison task to background queue (priority/deadline/block: see _queue_task)
+
+        db_kpis: DB KPI values already fetched for these parameters; the task then
+        only reads the Excel side (a resumed task compares against the same values)
+        """
+        task_id = self._task_id("kpi")
         task = {
             'id': task_id,
             'type': 'kpi_comparison',
             'excel_path': excel_path,
             'output_path': output_path,
             'is_drillthrough': is_drillthrough,
-            'extra_params': extra_params or {}
+            'extra_params': extra_params or {},
+            'db_kpis': db_kpis
         }
-        self.task_queue.put(task)
+        self._queue_task(task, priority, deadline, block)
         print(f"📤 Queued KPI comparison: {os.path.basename(excel_path)} (ID: {task_id})")
         return task_id
 
-    def submit_landing_widget_comparison(self, excel_path, output_path):
-        """Submit landing page widget comparison task to background queue"""
-        task_id = f"landing_{int(time.time() * 1000)}"
+    def submit_landing_widget_comparison(self, excel_path, output_path, priority=None, deadline=None, block=True):
+        """Submit landing page widget comparison task to background queue (priority/deadline/block: see _queue_task)"""
+        task_id = self._task_id("landing")
         task = {
             'id': task_id,
             'type': 'landing_widget_comparison',
             'excel_path': excel_path,
             'output_path': output_path
         }
-        self.task_queue.put(task)
+        self._queue_task(task, priority, deadline, block)
         print(f"📤 Queued landing widget comparison: {os.path.basename(excel_path)} (ID: {task_id})")
         return task_id
 
-    def submit_drillthrough_widget_comparison(self, excel_path, widget_title, submenu_selection, output_path):
-        """Submit drillthrough widget comparison task to background queue"""
-        task_id = f"drill_{int(time.time() * 1000)}"
+    def submit_drillthrough_widget_comparison(self, excel_path, widget_title, submenu_selection, output_path,
+                                              priority=None, deadline=None, block=True):
+        """Submit drillthrough widget comparison task to background queue (priority/deadline/block: see _queue_task)"""
+        task_id = self._task_id("drill")
         task = {
             'id': task_id,
             'type': 'drillthrough_widget_comparison',
@@ -279,7 +748,7 @@ class BackgroundProcessor:
             'submenu_selection': submenu_selection,
             'output_path': output_path
         }
-        self.task_queue.put(task)
+        self._queue_task(task, priority, deadline, block)
         print(f"📤 Queued drillthrough comparison: {widget_title} -> {submenu_selection} (ID: {task_id})")
         return task_id
 
@@ -287,11 +756,13 @@ class BackgroundProcessor:
     
     def get_status(self):
         """Get current processing status"""
-        return {
-            'queued': self.task_queue.qsize(),
-            'active': len(self.active_tasks),
-            'completed': len(self.completed_tasks)
-        }
+        with self._tasks_changed:
+            active = len(self.active_tasks)
+            return {
+                'queued': self._pending - active,
+                'active': active,
+                'completed': len(self.completed_tasks)
+            }
 
     def get_completed_results(self):
         """Get all completed results and clear the results queue"""
@@ -304,55 +775,200 @@ class BackgroundProcessor:
                 break
         return results
 
-    def wait_for_completion(self, timeout=300):
-        """Wait for all tasks to complete"""
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            status = self.get_status()
-            if status['queued'] == 0 and status['active'] == 0:
-                print("✅ All background tasks completed")
-                return True
-            
-            print(f"🔄 Background status: {status['queued']} queued, {status['active']} active, {status['completed']} completed")
-            time.sleep(2)
+    def wait_for_completion(self, timeout=300, progress_callback=None):
+        """
+        Wait for all tasks to complete
+
+        Returns as soon as the last task finishes (woken by its completion
+        callback rather than polling).
+
+        Args:
+            progress_callback: Optional callback(event) for task starts and
+                completions while waiting (see add_progress_callback)
+        """
+        deadline = time.time() + timeout
+        if progress_callback:
+            self.add_progress_callback(progress_callback)
+        try:
+            with self._tasks_changed:
+                if self._pending:
+                    print(f"🔄 Background status: {self._pending - len(self.active_tasks)} queued, "
+                          f"{len(self.active_tasks)} active, {len(self.completed_tasks)} completed")
+                while self._pending:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        print(f"⚠️ Timeout waiting for background tasks after {timeout}s")
+                        return False
+                    self._tasks_changed.wait(remaining)
+        finally:
+            if progress_callback:
+                self.remove_progress_callback(progress_callback)
         
-        print(f"⚠️ Timeout waiting for background tasks after {timeout}s")
+        print("✅ All background tasks completed")
+        return True
+
+    async def wait_for_completion_async(self, timeout=300, progress_callback=None):
+        """
+        wait_for_completion for asyncio callers: awaits the futures of the
+        unfinished tasks instead of blocking a thread; tasks queued while
+        waiting are awaited in the next round.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        if progress_callback:
+            self.add_progress_callback(progress_callback)
+        try:
+            while True:
+                with self._tasks_changed:
+                    unfinished = [r['future'] for r in self.task_records.values() if not r['future'].done()]
+                if not unfinished:
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    print(f"⚠️ Timeout waiting for background tasks after {timeout}s")
+                    return False
+                await asyncio.wait([asyncio.wrap_future(f) for f in unfinished], timeout=remaining)
+        finally:
+            if progress_callback:
+                self.remove_progress_callback(progress_callback)
+
+        print("✅ All background tasks completed")
+        return True
+
+    def write_run_summary(self, output_path):
+        """Combine the summaries written in summary-only mode into one gating verdict"""
+        return aggregate_summaries(self.summary_paths, output_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
         return False
 
     def shutdown(self):
-        """Shutdown the background processor"""
+        """
+        Shutdown the background processor (safe to call twice)
+
+        Blocks until every queued and spilled comparison has run: the worker is
+        joined without a timeout, so it can never still be dispatching once the
+        executor is shut down.
+        """
+        if not self.running:
+            return
         print("🔄 Shutting down background processor...")
         self.running = False
+        # Sentinels go behind any queued work: the batch thread forwards its tasks
+        # before the worker is stopped, and the worker dispatches them all.
+        # Tasks refilled from the spill after this point skip the batch thread.
+        with self._dispatch_lock:
+            self._batching = False
+            self.batch_queue.put(_STOP)
+        self.batch_thread.join()
+        self.task_queue.put((float('inf'), float('inf'), next(self._sequence), _STOP))
+        self.worker_thread.join()
         self.executor.shutdown(wait=True)
-        if self.worker_thread.is_alive():
-            self.worker_thread.join(timeout=5)
+        if self.process_pool:
+            set_sheet_executor(None)
+            self.process_pool.shutdown(wait=True)
+        if self.journal is not None:
+            self.journal.close()
         print("✅ Background processor shutdown complete")
 
-# Global instance
-background_processor = BackgroundProcessor()
+# Shared instance, created on first use
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_background_processor():
+    """The shared BackgroundProcessor; starts its threads and pools on the first call"""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = BackgroundProcessor()
+        return _instance
+
+def current_background_processor():
+    """The shared BackgroundProcessor if one was started, else None (never creates one)"""
+    return _instance
+
+def __getattr__(name):
+    # `background_processor.background_processor` keeps working, created lazily
+    if name == "background_processor":
+        return get_background_processor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@contextmanager
+def background_processing():
+    """
+    Scope the shared processor's lifecycle: when the block exits, even on
+    errors, it waits for the queued comparisons (reporting progress), then
+    stops the threads and pools; shutdown finishes anything still running
+
+        with background_processing() as processor:
+            processor.submit_kpi_comparison(...)
+    """
+    try:
+        yield get_background_processor()
+    finally:
+        processor = current_background_processor()
+        if processor is not None:
+            processor.wait_for_completion()
+        shutdown_background_processor()
 
 # Convenience functions
-def submit_kpi_comparison_bg(excel_path, output_path, is_drillthrough=False, extra_params=None):
+def submit_kpi_comparison_bg(excel_path, output_path, is_drillthrough=False, extra_params=None, priority=None, deadline=None,
+                             db_kpis=None, block=True):
     """Submit KPI comparison to background processing"""
-    return background_processor.submit_kpi_comparison(excel_path, output_path, is_drillthrough, extra_params)
+    return get_background_processor().submit_kpi_comparison(excel_path, output_path, is_drillthrough, extra_params,
+                                                            priority, deadline, db_kpis, block)
 
-def submit_landing_widget_comparison_bg(excel_path, output_path):
+def submit_landing_widget_comparison_bg(excel_path, output_path, priority=None, deadline=None, block=True):
     """Submit landing widget comparison to background processing"""
-    return background_processor.submit_landing_widget_comparison(excel_path, output_path)
+    return get_background_processor().submit_landing_widget_comparison(excel_path, output_path, priority, deadline, block)
 
-def submit_drillthrough_widget_comparison_bg(excel_path, widget_title, submenu_selection, output_path):
+def submit_drillthrough_widget_comparison_bg(excel_path, widget_title, submenu_selection, output_path,
+                                             priority=None, deadline=None, block=True):
     """Submit drillthrough widget comparison to background processing"""
-    return background_processor.submit_drillthrough_widget_comparison(excel_path, widget_title, submenu_selection, output_path)
+    return get_background_processor().submit_drillthrough_widget_comparison(excel_path, widget_title, submenu_selection,
+                                                                            output_path, priority, deadline, block)
+
+def write_background_scheduling_report(output_path):
+    """Write the per-task queue wait / run time report (None when nothing was processed)"""
+    processor = current_background_processor()
+    return processor.write_scheduling_report(output_path) if processor else None
+
+def resume_comparisons_bg():
+    """Re-queue unfinished comparisons from the task journal"""
+    return get_background_processor().resume_from_journal()
 
 def get_background_status():
     """Get background processing status"""
-    return background_processor.get_status()
+    processor = current_background_processor()
+    return processor.get_status() if processor else {'queued': 0, 'active': 0, 'completed': 0}
+
+def wait_for_all_comparisons(timeout=300, progress_callback=None):
+    """Wait for all background comparisons to complete (True at once if none were submitted)"""
+    processor = current_background_processor()
+    return processor.wait_for_completion(timeout, progress_callback) if processor else True
 
-def wait_for_all_comparisons(timeout=300):
-    """Wait for all background comparisons to complete"""
-    return background_processor.wait_for_completion(timeout)
+async def wait_for_all_comparisons_async(timeout=300, progress_callback=None):
+    """Await all background comparisons (True at once if none were submitted)"""
+    processor = current_background_processor()
+    return await processor.wait_for_completion_async(timeout, progress_callback) if processor else True
 
 def shutdown_background_processor():
-    """Shutdown background processor"""
-    background_processor.shutdown()
\ No newline at end of file
+    """Shutdown background processor, if one was started; the next submit starts a new one"""
+    global _instance
+    with _instance_lock:
+        processor, _instance = _instance, None
+    if processor is not None:
+        processor.shutdown()
+
+if __name__ == "__main__":
+    # python background_processor.py --resume: finish an interrupted run's comparisons
+    # from their on-disk inputs, without the browser
+    if "--resume" in sys.argv:
+        with background_processing() as processor:
+            if processor.resume_from_journal():
+                processor.wait_for_completion(timeout=3600)
+                processor.write_scheduling_report(os.path.join("download", "background_schedule_resume.xlsx"))
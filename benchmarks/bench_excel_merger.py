@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ExcelMerger pandas round trip vs sheet part copy
+===========================================================
+Merges synthetic widget downloads with both backends and reports throughput
+in sheets/s and MB/s, then checks the merged cell values are identical.
+
+Run from the repository root:
+    python benchmarks/bench_excel_merger.py [files] [rows_per_file]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook, load_workbook
+
+from excel_merger import ExcelMerger
+
+
+def build_downloads(directory, files, rows):
+    """Widget-export-like files: identifier plus formatted and numeric values"""
+    paths = []
+    for f in range(files):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Sheet1")
+        ws.append(["Identifier", "Actual Sales", "Targets"])
+        for r in range(rows):
+            ws.append([f"Store {r}", r * 3.5, f"${r * 4:,}"])
+        path = os.path.join(directory, f"Widget {f}.xlsx")
+        wb.save(path)
+        paths.append(path)
+    return paths
+
+
+def dump(path):
+    wb = load_workbook(path, read_only=True)
+    data = {name: [tuple(row) for row in wb[name].iter_rows(values_only=True)] for name in wb.sheetnames}
+    wb.close()
+    return data
+
+
+def main(files=11, rows=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = build_downloads(tmp, files, rows)
+        total_bytes = sum(os.path.getsize(p) for p in paths)
+        print(f"📊 {files} downloads x {rows:,} rows ({total_bytes:,} bytes)")
+
+        outputs = {}
+        for backend in ("pandas", "zip"):
+            output_path = os.path.join(tmp, f"merged_{backend}.xlsx")
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = ExcelMerger.merge_specific_files(paths, output_path, one_sheet=False, backend=backend)
+            outputs[backend] = output_path
+            print(f"  {backend:<7} {stats['seconds']:6.2f} s  "
+                  f"{stats['sheets'] / stats['seconds']:7.1f} sheets/s  "
+                  f"{stats['bytes'] / stats['seconds'] / 1024 / 1024:6.2f} MB/s")
+
+        assert dump(outputs["pandas"]) == dump(outputs["zip"])
+        print("  ✅ identical merged values")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: import-time cost of newmain / background_processor
+=============================================================
+Imports each module in a fresh interpreter and reports the median import
+time, the threads running right after the import, the database
+connections opened (DatabaseConnector.connect calls) and which heavy
+modules were pulled in.
+
+Run from the repository root:
+    python benchmarks/bench_import_time.py [runs]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("background_processor", "kpistoreprocedures", "widgetstoreprocedures",
+                 "dynamic_comparison_engine", "drillthrough_db_handler", "pandas")
+
+PROBE = """
+import io, json, sys, threading, time, contextlib
+sys.path.insert(0, {root!r})
+import dataBase
+connects = []
+_connect = dataBase.DatabaseConnector.connect
+def counting_connect(self):
+    connects.append(1)
+    return _connect(self)
+dataBase.DatabaseConnector.connect = counting_connect
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'threads': threading.active_count(),
+    'db_connects': len(connects),
+    'heavy': [m for m in {heavy!r} if m in sys.modules]
+}}))
+"""
+
+
+def probe(module):
+    code = PROBE.format(root=REPO_ROOT, module=module, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(runs=5):
+    print(f"📊 import time, median of {runs} fresh interpreters")
+    print(f"  {'module':<22} {'import':>9} {'threads':>8} {'DB conns':>9}  heavy modules loaded")
+    for module in ("newmain", "background_processor"):
+        results = [probe(module) for _ in range(runs)]
+        seconds = statistics.median(r['seconds'] for r in results)
+        last = results[-1]
+        print(f"  {module:<22} {seconds * 1000:7.0f}ms {last['threads']:>8} {last['db_connects']:>9}  "
+              f"{', '.join(last['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
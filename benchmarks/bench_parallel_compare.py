@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sheet comparison scaling from 1 to N processes
+==========================================================
+Run from the repository root:
+    python benchmarks/bench_parallel_compare.py [sheets] [rows_per_sheet]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook
+
+from sheet_comparison import run_sheet_tasks, sheet_db_subset
+
+
+def build_workbook(path, sheets, rows):
+    """Synthetic widget workbook plus matching DB values (every 10th value differs)"""
+    wb = Workbook(write_only=True)
+    db_data = {}
+    for s in range(sheets):
+        sheet_name = f"Sales Summary_Widget {s}"
+        ws = wb.create_sheet(sheet_name)
+        if s % 2:
+            ws.append(["Identifier", "Previous Year", "Current Year"])
+            for r in range(rows):
+                ws.append([f"Week {r}", f"{r * 1.5:,.2f}", r * 2.25])
+                db_data[f"{sheet_name} - Week {r} Previous Year"] = str(r * 1.5)
+                db_data[f"{sheet_name} - Week {r} Current Year"] = str(r * 2.25 + (1 if r % 10 == 0 else 0))
+        else:
+            ws.append(["Identifier", "Actual Sales", "Targets"])
+            for r in range(rows):
+                ws.append([f"Store {r}", r * 3.5, f"${r * 4:,}"])
+                db_data[f"{sheet_name} - Store {r}"] = str(r * 3.5)
+                db_data[f"{sheet_name} - Store {r} Target"] = str(r * 4)
+    wb.save(path)
+    return [f"Sales Summary_Widget {s}" for s in range(sheets)], db_data
+
+
+def payloads_for(path, sheet_names, db_data):
+    return [
+        {'excel_path': path, 'sheet_name': name, 'mode': 'preserve', 'db_data': sheet_db_subset(db_data, name)}
+        for name in sheet_names
+    ]
+
+
+def main(sheets=14, rows=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_widgets.xlsx")
+        sheet_names, db_data = build_workbook(path, sheets, rows)
+        payloads = payloads_for(path, sheet_names, db_data)
+        print(f"📊 {sheets} sheets x {rows:,} rows ({os.path.getsize(path):,} bytes)")
+
+        start = time.perf_counter()
+        baseline = run_sheet_tasks(payloads)
+        inline_time = time.perf_counter() - start
+        print(f"  inline        {inline_time:7.2f} s")
+
+        max_workers = os.cpu_count() or 1
+        workers = 1
+        while True:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pool.submit(int, 0).result()  # warm up worker start-up outside the timing
+                start = time.perf_counter()
+                results = run_sheet_tasks(payloads, pool)
+                elapsed = time.perf_counter() - start
+            assert [r['rows'] for r in results] == [r['rows'] for r in baseline]
+            print(f"  {workers:>2} processes  {elapsed:7.2f} s  speedup {inline_time / elapsed:4.1f}x")
+            if workers >= max_workers:
+                break
+            workers = min(workers * 2, max_workers)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
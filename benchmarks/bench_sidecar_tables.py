@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: reading a widget workbook from xlsx vs sidecar tables
+================================================================
+Times a full values-only read of every sheet from the .xlsx (openpyxl
+read-only) and from its CSV / Parquet sidecar tables, and checks the
+values read back are identical. Parquet is skipped without pyarrow.
+
+Run from the repository root:
+    python benchmarks/bench_sidecar_tables.py [sheets] [rows_per_sheet]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import load_workbook
+
+from report_writer import PYARROW_AVAILABLE, sidecar_dir_for
+from sidecar_tables import SidecarWorkbook, write_workbook_tables
+from bench_parallel_compare import build_workbook
+
+
+def read_xlsx(path):
+    wb = load_workbook(path, read_only=True, data_only=True)
+    data = {}
+    for ws in wb.worksheets:
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows)
+        data[ws.title] = [header] + [row + (None,) * (len(header) - len(row)) for row in rows]
+    wb.close()
+    return data
+
+
+def read_tables(path):
+    wb = SidecarWorkbook.for_workbook(path)
+    return {title: list(wb[title].iter_rows(values_only=True)) for title in wb.sheetnames}
+
+
+def main(sheets=4, rows=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_widgets.xlsx")
+        build_workbook(path, sheets, rows)
+        print(f"📊 {sheets} sheets x {rows:,} rows ({os.path.getsize(path):,} bytes)")
+
+        start = time.perf_counter()
+        expected = read_xlsx(path)
+        print(f"  {'xlsx':<8} {time.perf_counter() - start:7.2f} s")
+
+        for fmt in ("csv", "parquet"):
+            if fmt == "parquet" and not PYARROW_AVAILABLE:
+                print("  parquet  skipped (pyarrow not installed)")
+                continue
+            shutil.rmtree(sidecar_dir_for(path), ignore_errors=True)
+            write_workbook_tables(path, [fmt])
+            start = time.perf_counter()
+            data = read_tables(path)
+            print(f"  {fmt:<8} {time.perf_counter() - start:7.2f} s")
+            assert data == expected
+        print("  ✅ identical values")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SP output formatters, one at a time
+===============================================
+Run from the repository root:  python benchmarks/bench_sp_formatters.py [rows]
+"""
+
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sp_formatters import FORMATTER_REGISTRY, load_formatter_plugins
+
+SAMPLE_SHAPES = {
+    'monthly_trends': (["Month", "CurrentYearSales", "PreviousYearSales"], lambda i: ("January", 1000.5 + i, 900.25)),
+    'weekly_trends': (["Week", "CurrentYearSales", "PreviousYearSales"], lambda i: (f"Week{i}", "1,000.50", "900.25")),
+    'weekday_weekend': (["WeekCategory", "CurrentYearSales", "PreviousYearSales"], lambda i: ("Weekday", 10.0 + i, 9.0)),
+    'product_sales': (["ProductName", "Sales"], lambda i: (f"Product {i}", 10.0 + i)),
+    'brand_sales': (["BrandName", "Sales"], lambda i: (f"Brand {i}", 10.0 + i)),
+    'employee_performance': (["EmployeeName", "Sales"], lambda i: (f"Employee {i}", 10.0 + i)),
+    'category_sales': (["CategoryName", "Sales"], lambda i: (f"Category {i}", 10.0 + i)),
+    'store_sales': (["StoreName", "Actual Sales", "Target"], lambda i: (f"Store {i}", 10.0 + i, 12.0)),
+    'metric_value_pairs': (["Identifier", "Metric", "Excel Value"], lambda i: (f"Store {i}", "Actual Sales", "1,234.5")),
+    'generic_sales': (["Identifier", "Actual Sales"], lambda i: (f"Id {i}", 10.0 + i)),
+    'generic': (["Label", "Value"], lambda i: (f"Label {i}", i)),
+}
+
+
+def main(rows=50000, repeats=5):
+    load_formatter_plugins()
+    print(f"📊 Formatting {rows:,} rows per result set ({repeats} repeats)")
+    for pattern, formatter in FORMATTER_REGISTRY.items():
+        if pattern not in SAMPLE_SHAPES:
+            print(f"  ⏭️ {pattern}: no sample shape")
+            continue
+        columns, make_row = SAMPLE_SHAPES[pattern]
+        result = [make_row(i) for i in range(rows)]
+        missing = formatter.missing_columns(columns)
+
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            for _ in range(repeats):
+                data = formatter.format(result, columns, "Sheet")
+        elapsed = (time.perf_counter() - start) / repeats
+
+        note = f" (missing declared columns: {missing})" if missing else ""
+        print(f"  {pattern:<22} {elapsed * 1000:8.2f} ms  {rows / elapsed:>12,.0f} rows/s  {len(data):>7,} keys{note}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
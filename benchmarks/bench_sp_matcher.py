@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compiled SP matcher vs legacy if/elif scoring
+=========================================================
+Run from the repository root:  python benchmarks/bench_sp_matcher.py
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sp_matcher import get_sp_matcher
+
+SHEETS = [
+    ("Sales Summary_Top Stores by Sal", ["identifier", "actual sales"]),
+    ("Sales Summary_Store Sales with", ["identifier", "actual sales", "targets"]),
+    ("Sales Summary_Top Brands by Sal", ["identifier", "actual sales"]),
+    ("Sales Summary_Top Categories by", ["identifier", "actual sales"]),
+    ("Sales Summary_Top Sub Categorie", ["identifier", "actual sales"]),
+    ("Sales Summary_Top Products by S", ["identifier", "actual sales"]),
+    ("Sales Summary_Weekly Trends", ["week", "previous year", "current year"]),
+    ("Sales Summary_Sales Trends", ["month", "previous year", "current year"]),
+    ("Sales Summary_Top Performing Employee", ["employee", "sales"]),
+    ("Sales Summary_Weekday Weekend", ["identifier", "previous year", "current year"]),
+    ("Sales Summary_Weekwise Sales", ["week", "previous year", "current year"]),
+]
+
+SPS = {
+    "SP_SalesTrend": "monthly_trends",
+    "SP_TopPerformingEmployee": "employee_performance",
+    "SP_TopProductsBySales": "product_sales",
+    "SP_WeekdayWeekendSales": "weekday_weekend",
+    "SP_WeekwiseSalesComparison": "weekly_trends",
+    "SP_TopStoresbySales": "store_sales",
+    "SP_TopBrandsBySales": "brand_sales",
+    "SP_TopCategoriesBySaleswidget": "category_sales",
+    "SP_TopSubCategoriesBySales": "generic_sales",
+    "SP_WeeklyTrendswidget": "weekly_trends",
+    "SP_StorewiseActualVsTarget_Vertical_SortedByActual": "metric_value_pairs",
+}
+
+
+def legacy_score(sheet_info, sp_info, sheet_name):
+    """Verbatim copy of the pre-matcher _calculate_enhanced_match_score (prints removed)"""
+    score = 0.0
+    sheet_patterns = set(sheet_info['data_patterns'])
+    sp_pattern = sp_info['output_pattern']
+    sp_name = sp_info.get('sp_name', '')
+    if 'store sales' in sheet_name and 'target_data' in sheet_patterns:
+        direct_mappings = {'store sales': 'SP_StorewiseActualVsTarget_Vertical_SortedByActual'}
+    else:
+        direct_mappings = {
+            'store sales': 'SP_TopStoresbySales', 'top stores': 'SP_TopStoresbySales',
+            'brands': 'SP_TopBrandsBySales', 'top brands': 'SP_TopBrandsBySales',
+            'categories': 'SP_TopCategoriesBySaleswidget', 'top categories': 'SP_TopCategoriesBySaleswidget',
+            'sub categories': 'SP_TopSubCategoriesBySales', 'products': 'SP_TopProductsBySales',
+            'top products': 'SP_TopProductsBySales', 'weekly trends': 'SP_WeeklyTrendswidget',
+            'weekly': 'SP_WeeklyTrendswidget', 'sales trends': 'SP_SalesTrend', 'month': 'SP_SalesTrend'
+        }
+    for name_pattern, expected_sp in direct_mappings.items():
+        if name_pattern in sheet_name and expected_sp in sp_name:
+            score += 0.8
+            break
+    pattern_matches = {
+        'monthly_trends': {'monthly_data', 'sales_data', 'year_comparison'},
+        'weekly_trends': {'weekly_data', 'sales_data', 'year_comparison'},
+        'weekday_weekend': {'weekday_weekend_data', 'sales_data'},
+        'product_sales': {'product_data', 'sales_data'},
+        'brand_sales': {'brand_data', 'sales_data'},
+        'store_sales': {'store_data', 'sales_data'},
+        'employee_performance': {'employee_data', 'sales_data'},
+        'metric_value_pairs': {'target_data', 'sales_data'},
+        'generic': {'sales_data'}
+    }
+    if pattern_matches.get(sp_pattern, set()).intersection(sheet_patterns):
+        score += 0.4
+    if 'SP_StorewiseActualVsTarget_Vertical_SortedByActual' in sp_name and ('store' in sheet_name and 'target_data' in sheet_patterns):
+        score += 0.9
+    elif 'SP_TopStoresbySales' in sp_name and ('store' in sheet_name and 'target_data' not in sheet_patterns):
+        score += 0.5
+    elif 'SP_TopBrandsBySales' in sp_name and 'brand' in sheet_name:
+        score += 0.5
+    elif 'SP_TopCategoriesBySaleswidget' in sp_name and 'categor' in sheet_name and 'sub' not in sheet_name:
+        score += 0.5
+    elif 'SP_TopSubCategoriesBySales' in sp_name and 'sub categor' in sheet_name:
+        score += 0.7
+    elif 'SP_TopProductsBySales' in sp_name and 'product' in sheet_name:
+        score += 0.5
+    elif 'SP_WeeklyTrendswidget' in sp_name and 'weekly trends' in sheet_name:
+        score += 0.9
+    elif 'SP_WeeklyTrendswidget' in sp_name and 'weekly' in sheet_name:
+        score += 0.7
+    elif 'SP_WeekwiseSalesComparison' in sp_name and 'weekly' in sheet_name and 'trends' not in sheet_name:
+        score += 0.6
+    elif 'SP_SalesTrend' in sp_name and ('sales trend' in sheet_name or ('trend' in sheet_name and 'weekly' not in sheet_name)):
+        score += 0.5
+    if sp_info['row_count'] > 0:
+        score += 0.1
+    if sheet_info['key_columns'] and sp_info['columns']:
+        score += 0.1
+    return min(score, 1.0)
+
+
+def build_inputs(matcher, copies):
+    analysis = {}
+    for i in range(copies):
+        for name, headers in SHEETS:
+            sheet_name = f"{name} {i}" if i else name
+            analysis[sheet_name] = {
+                'original_name': sheet_name,
+                'data_patterns': matcher.detect_data_patterns(headers),
+                'key_columns': {'identifier': 0},
+            }
+    working_sps = {
+        sp: {'sp_name': sp, 'output_pattern': pattern, 'row_count': 10, 'columns': ['a', 'b']}
+        for sp, pattern in SPS.items()
+    }
+    return analysis, working_sps
+
+
+def main(copies=50, repeats=20):
+    matcher = get_sp_matcher()
+    analysis, working_sps = build_inputs(matcher, copies)
+
+    # Equivalence check
+    matrix = matcher.score_all(analysis, working_sps)
+    for sheet_name, info in analysis.items():
+        for sp_name, sp_info in working_sps.items():
+            expected = legacy_score(info, sp_info, sheet_name.lower())
+            assert abs(matrix[sheet_name][sp_name] - expected) < 1e-9, (sheet_name, sp_name)
+    print(f"✅ Compiled scores identical to legacy for {len(analysis)} sheets x {len(working_sps)} SPs")
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for sheet_name, info in analysis.items():
+            for sp_info in working_sps.values():
+                legacy_score(info, sp_info, sheet_name.lower())
+    legacy_time = (time.perf_counter() - start) / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        matcher.score_all(analysis, working_sps)
+    compiled_time = (time.perf_counter() - start) / repeats
+
+    print(f"📊 Legacy scoring:   {legacy_time * 1000:.2f} ms per pass")
+    print(f"📊 Compiled scoring: {compiled_time * 1000:.2f} ms per pass")
+    print(f"🚀 Speedup: {legacy_time / compiled_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
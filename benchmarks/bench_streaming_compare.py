@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: in-memory vs streaming widget comparison
+===================================================
+Compares peak Python memory and wall time of the in-memory path (full
+load_workbook, list results, regular Workbook) against the streaming path
+(read_only source, row generators, per-sheet DB index, write_only report).
+
+Run from the repository root:
+    python benchmarks/bench_streaming_compare.py [sheets] [rows_per_sheet]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook, load_workbook
+
+from sheet_comparison import (
+    compare_sheet, iter_compare_sheet, iter_sheet, sheet_headers, build_db_index, db_key_prefixes
+)
+from bench_parallel_compare import build_workbook
+
+
+def in_memory(excel_path, db_data, output_path):
+    wb_source = load_workbook(excel_path, data_only=True)
+    wb_out = Workbook()
+    wb_out.remove(wb_out.active)
+    for sheet_name in wb_source.sheetnames:
+        ws = wb_source[sheet_name]
+        headers = sheet_headers(cell.value for cell in ws[1])
+        header, output = compare_sheet(sheet_name, headers, ws.iter_rows(min_row=2, values_only=True), db_data, "preserve")
+        ws_out = wb_out.create_sheet(title=sheet_name[:31])
+        ws_out.append(header)
+        for line in output:
+            ws_out.append(line)
+    wb_out.save(output_path)
+
+
+def streaming(excel_path, db_data, output_path):
+    wb_source = load_workbook(excel_path, read_only=True, data_only=True)
+    wb_out = Workbook(write_only=True)
+    for sheet_name in wb_source.sheetnames:
+        headers, rows = iter_sheet(wb_source[sheet_name])
+        db_index = build_db_index(db_data, db_key_prefixes(sheet_name, "preserve"))
+        header, output = iter_compare_sheet(sheet_name, headers, rows, db_index, "preserve")
+        ws_out = wb_out.create_sheet(title=sheet_name[:31])
+        ws_out.append(header)
+        for line in output:
+            ws_out.append(line)
+    wb_out.save(output_path)
+    wb_source.close()
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def dump(path):
+    wb = load_workbook(path, read_only=True)
+    data = {name: list(wb[name].iter_rows(values_only=True)) for name in wb.sheetnames}
+    wb.close()
+    return data
+
+
+def main(sheets=2, rows=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_widgets.xlsx")
+        _, db_data = build_workbook(path, sheets, rows)
+        print(f"📊 {sheets} sheets x {rows:,} rows ({os.path.getsize(path):,} bytes)")
+
+        results = {}
+        for name, func in (("in-memory", in_memory), ("streaming", streaming)):
+            output_path = os.path.join(tmp, f"{name}.xlsx")
+            elapsed, peak = measure(func, path, db_data, output_path)
+            results[name] = output_path
+            print(f"  {name:<10} {elapsed:7.2f} s   peak {peak / 1024 / 1024:8.1f} MiB")
+
+        assert dump(results["in-memory"]) == dump(results["streaming"])
+        print("  ✅ identical reports")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,177 @@
+"""
+SHARDED BROWSER SESSIONS
+========================
+Spread drillthroughs over several Chrome sessions. Besides the primary
+driver, performance.parallel_processing.browser_sessions - 1 extra
+sessions are opened in the background, each logged in, on the same
+dashboard with the same filters, and each downloading into its own
+directory (download/.sessions/session_N), because a drillthrough picks up
+the newest file in its session's download directory.
+
+The targets are dealt round-robin to one queue per session; a session
+whose queue runs dry steals from the back of the longest other queue, so
+a slow drillthrough, or a session that is still logging in (or failed to
+open), never leaves the others idle. Results land in the usual
+download/widgets/<widget>_<submenu>/ directories whichever session
+produced them.
+
+    pool = BrowserShardPool(open_dashboard_session, browser_sessions())
+    pool.open()                       # extra sessions log in in the background
+    pool.run(driver, drill_targets, lambda driver, download_dir, title: ...)
+    pool.close()
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from config_loader import config_loader
+
+SESSION_DOWNLOAD_ROOT = os.path.join("download", ".sessions")
+
+
+def browser_sessions() -> int:
+    """Browser sessions to use for drillthroughs (1 = the primary session only)"""
+    parallel_config = config_loader.get_dynamic_engine_config().get("performance", {}).get("parallel_processing", {})
+    return max(1, int(parallel_config.get("browser_sessions", 1) or 1))
+
+
+class WorkStealingQueue:
+    """Per-shard queues of targets; an empty shard steals from the back of the longest other queue"""
+
+    def __init__(self, items: Sequence[Hashable], shards: int):
+        self._queues = [deque(items[i::shards]) for i in range(shards)]
+        self._lock = threading.Lock()
+        self.stolen = 0
+
+    def take(self, shard: int) -> Tuple[Optional[Hashable], bool]:
+        """
+        Returns:
+            (item, stolen); item is None once every queue is empty
+        """
+        with self._lock:
+            own = self._queues[shard]
+            if own:
+                return own.popleft(), False
+            victim = max(self._queues, key=len)
+            if not victim:
+                return None, False
+            self.stolen += 1
+            return victim.pop(), True
+
+
+class BrowserShardPool:
+    """Extra dashboard sessions next to the primary driver, shared by the drillthrough loops of a run"""
+
+    def __init__(self, open_session: Callable[[str], Any], size: int):
+        """
+        Args:
+            open_session: open_session(download_dir) -> driver logged in, on the dashboard, filters applied
+            size: Sessions in total, the primary driver included
+        """
+        self.open_session = open_session
+        self.size = max(1, size)
+        self._sessions: List[Future] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def download_dir(index: int) -> str:
+        """Download directory of a session (0 is the primary driver's download/)"""
+        if index == 0:
+            return os.path.abspath("download")
+        return os.path.abspath(os.path.join(SESSION_DOWNLOAD_ROOT, f"session_{index}"))
+
+    def open(self):
+        """Start opening the extra sessions in the background (once); run() waits for each as it needs it"""
+        with self._lock:
+            if self._sessions or self.size == 1:
+                return
+            for index in range(1, self.size):
+                future = Future()
+                self._sessions.append(future)
+                threading.Thread(target=self._open, args=(index, future), name=f"browser-session-{index}",
+                                 daemon=True).start()
+        print(f"🌐 Opening {self.size - 1} extra browser sessions in the background...")
+
+    def _open(self, index: int, future: Future):
+        download_dir = self.download_dir(index)
+        os.makedirs(download_dir, exist_ok=True)
+        start = time.time()
+        try:
+            driver = self.open_session(download_dir)
+        except Exception as e:
+            print(f"❌ Browser session {index} could not be opened: {e}")
+            future.set_exception(e)
+            return
+        print(f"🌐 Browser session {index} ready in {time.time() - start:.1f}s ({download_dir})")
+        future.set_result(driver)
+
+    def run(self, primary_driver, targets: Sequence[Hashable],
+            work: Callable[[Any, str, Hashable], Any]) -> Dict[Hashable, Dict[str, Any]]:
+        """
+        Run work(driver, download_dir, target) for every target across the sessions
+
+        The primary driver is used from the calling thread; every extra session
+        works from its own thread once it is open.
+
+        Returns:
+            Per target: {'session', 'seconds', 'stolen', 'error'}
+        """
+        targets = list(targets)
+        shards = min(self.size, len(targets))
+        queue = WorkStealingQueue(targets, max(1, shards))
+        results: Dict[Hashable, Dict[str, Any]] = {}
+        start = time.time()
+
+        if shards > 1:
+            self.open()
+        threads = [threading.Thread(target=self._shard, args=(index, queue, work, results),
+                                    name=f"browser-shard-{index}") for index in range(1, shards)]
+        for thread in threads:
+            thread.start()
+        self._work(0, primary_driver, queue, work, results)
+        for thread in threads:
+            thread.join()
+
+        if shards > 1:
+            per_session = {}
+            for result in results.values():
+                per_session[result['session']] = per_session.get(result['session'], 0) + 1
+            print(f"🌐 {len(targets)} drillthroughs over {len(per_session)} sessions in {time.time() - start:.1f}s "
+                  f"({', '.join(f'session {s}: {n}' for s, n in sorted(per_session.items()))}; {queue.stolen} stolen)")
+        return results
+
+    def _shard(self, index: int, queue: WorkStealingQueue, work, results):
+        try:
+            driver = self._sessions[index - 1].result()
+        except Exception:
+            return  # The sessions that did open steal this shard's targets
+        self._work(index, driver, queue, work, results)
+
+    def _work(self, index: int, driver, queue: WorkStealingQueue, work, results):
+        download_dir = self.download_dir(index)
+        while True:
+            target, stolen = queue.take(index)
+            if target is None:
+                return
+            start = time.time()
+            error = None
+            try:
+                work(driver, download_dir, target)
+            except Exception as e:
+                error = e
+                print(f"❌ Session {index}: {target} failed: {e}")
+            results[target] = {'session': index, 'seconds': time.time() - start, 'stolen': stolen, 'error': error}
+
+    def close(self):
+        """Quit the extra sessions (waits for any still logging in)"""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for future in sessions:
+            try:
+                future.result().quit()
+            except Exception:
+                pass
@@ -0,0 +1,177 @@
+"""
+INCREMENTAL COMPARISON CACHE
+============================
+Per-sheet verdict cache so re-runs only re-compare sheets whose input changed.
+
+For each compared sheet the cache keeps a content hash of the Excel sheet
+(headers + cell values), a fingerprint of the DB values the sheet is looked
+up against, and the comparison rows produced last time. When both hashes
+match on the next run the previous verdict is reused instead of recomputed.
+
+Cache files live next to the source workbook:
+    <workbook dir>/.comparison_cache/<workbook name>.<mode>.json
+
+Cell values that JSON has no type for (datetime, date, time, timedelta,
+Decimal) are stored with a type tag and restored as the same type, so a
+reused verdict writes exactly the cells a fresh comparison would. A sheet
+whose rows hold any other type is not cached.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import time
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+# Bump when comparison logic or the cache encoding changes so older verdicts are not reused
+COMPARISON_CACHE_VERSION = 2
+
+# Tagged JSON encodings for cell types JSON cannot represent: {"$t": tag, "v": text}
+_TAGGED_TYPES = (
+    ("datetime", datetime.datetime, datetime.datetime.isoformat, datetime.datetime.fromisoformat),
+    ("date", datetime.date, datetime.date.isoformat, datetime.date.fromisoformat),
+    ("time", datetime.time, datetime.time.isoformat, datetime.time.fromisoformat),
+    ("timedelta", datetime.timedelta, lambda v: v.total_seconds(), lambda v: datetime.timedelta(seconds=v)),
+    ("decimal", Decimal, str, Decimal),
+)
+_DECODERS = {tag: decode for tag, _, _, decode in _TAGGED_TYPES}
+
+
+def encode_value(value):
+    """JSON-safe form of a cell value; raises TypeError for types that cannot round-trip"""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    # datetime before date: datetime is a date subclass
+    for tag, value_type, encode, _ in _TAGGED_TYPES:
+        if isinstance(value, value_type):
+            return {"$t": tag, "v": encode(value)}
+    raise TypeError(f"cannot cache a {type(value).__name__} cell")
+
+
+def decode_value(value):
+    """Inverse of encode_value"""
+    if isinstance(value, dict):
+        return _DECODERS[value["$t"]](value["v"])
+    return value
+
+CACHE_DIR_NAME = ".comparison_cache"
+
+
+def _trim(row) -> tuple:
+    """Drop trailing empty cells so full and read-only reads hash the same"""
+    row = tuple(row)
+    end = len(row)
+    while end and row[end - 1] is None:
+        end -= 1
+    return row[:end]
+
+
+def sheet_fingerprint(headers: List[str], rows: Iterable) -> str:
+    """Content hash of a sheet's headers and cell values"""
+    digest = hashlib.sha1(repr(tuple(headers)).encode("utf-8"))
+    for row in rows:
+        digest.update(repr(_trim(row)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def db_fingerprint(db_data: Dict[str, Any], key_prefixes: Tuple[str, ...]) -> str:
+    """Hash of the DB values a sheet can look up (keys starting with any prefix)"""
+    digest = hashlib.sha1()
+    for key in sorted(k for k in db_data if k.startswith(key_prefixes)):
+        digest.update(f"{key}\x1f{db_data[key]}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ComparisonCache:
+    """Sheet verdicts from the previous run of one workbook/comparison mode"""
+
+    def __init__(self, cache_path: str, mode: str):
+        """
+        Args:
+            cache_path: JSON file holding the cached verdicts
+            mode: Comparison layout ('rows' or 'preserve')
+        """
+        self.cache_path = cache_path
+        self.mode = mode
+        self.sheets = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @classmethod
+    def for_workbook(cls, excel_path: str, mode: str) -> "ComparisonCache":
+        directory = os.path.join(os.path.dirname(os.path.abspath(excel_path)), CACHE_DIR_NAME)
+        return cls(os.path.join(directory, f"{os.path.basename(excel_path)}.{mode}.json"), mode)
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == COMPARISON_CACHE_VERSION and data.get("mode") == self.mode:
+                self.sheets = data.get("sheets", {})
+                for entry in self.sheets.values():
+                    entry["header"] = [decode_value(v) for v in entry["header"]]
+                    entry["rows"] = [[decode_value(v) for v in row] for row in entry["rows"]]
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable comparison cache {self.cache_path}: {e}")
+
+    def sheet_hash(self, sheet_name: str) -> Optional[str]:
+        """Previous content hash for a sheet, if cached"""
+        entry = self.sheets.get(sheet_name)
+        return entry["sheet_hash"] if entry else None
+
+    def lookup(self, sheet_name: str, sheet_hash: str, db_hash: str) -> Optional[Tuple[List[str], List[list]]]:
+        """
+        Previous verdict when neither the sheet nor its DB values changed
+
+        Returns:
+            (header_row, output_rows) or None
+        """
+        entry = self.sheets.get(sheet_name)
+        if entry and entry["sheet_hash"] == sheet_hash and entry["db_hash"] == db_hash:
+            self.hits += 1
+            return entry["header"], entry["rows"]
+        self.misses += 1
+        return None
+
+    def store(self, sheet_name: str, sheet_hash: str, db_hash: str, header: List[str], rows: List[list]):
+        """Remember a sheet's verdict (dropped when a cell value could not be restored as the same type)"""
+        try:
+            for value in header:
+                encode_value(value)
+            for row in rows:
+                for value in row:
+                    encode_value(value)
+        except TypeError as e:
+            print(f"⚠️ Not caching sheet '{sheet_name}': {e}")
+            self.sheets.pop(sheet_name, None)
+            return
+        self.sheets[sheet_name] = {
+            "sheet_hash": sheet_hash,
+            "db_hash": db_hash,
+            "header": header,
+            "rows": rows,
+            "compared_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def save(self, keep_sheets: Optional[Iterable[str]] = None):
+        """Persist the cache (optionally dropping sheets not seen this run)"""
+        if keep_sheets is not None:
+            keep = set(keep_sheets)
+            self.sheets = {name: entry for name, entry in self.sheets.items() if name in keep}
+
+        sheets = {
+            name: dict(entry, header=[encode_value(v) for v in entry["header"]],
+                       rows=[[encode_value(v) for v in row] for row in entry["rows"]])
+            for name, entry in self.sheets.items()
+        }
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": COMPARISON_CACHE_VERSION, "mode": self.mode, "sheets": sheets}, f)
+        os.replace(tmp_path, self.cache_path)
+        print(f"♻️ Comparison cache: {self.hits} sheets reused, {self.misses} re-compared")
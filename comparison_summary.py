@@ -0,0 +1,203 @@
+"""
+SUMMARY-ONLY COMPARISON OUTPUT
+==============================
+Compact JSON verdicts for gating runs: pass/fail counts per widget sheet or
+KPI, the keys that failed and timing, without building Excel workbooks.
+
+A comparison writes a summary instead of a workbook when its output path
+ends with SUMMARY_SUFFIX (see summary_path_for). Full Excel reports can be
+produced later, on demand, for the failed widgets/KPIs only with
+generate_failed_reports().
+"""
+
+import json
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+SUMMARY_SUFFIX = "_summary.json"
+DB_SIDECAR_SUFFIX = "_summary.db.json"
+
+
+def summary_path_for(output_path: str) -> str:
+    """Summary JSON path for a report path (report.xlsx -> report_summary.json)"""
+    if is_summary_path(output_path):
+        return output_path
+    return os.path.splitext(output_path)[0] + SUMMARY_SUFFIX
+
+
+def is_summary_path(output_path: str) -> bool:
+    """True when the comparison should emit a summary instead of a workbook"""
+    return str(output_path).endswith(SUMMARY_SUFFIX)
+
+
+def report_path_for(summary_path: str, extension: str = ".xlsx") -> str:
+    """Full report path corresponding to a summary path"""
+    return summary_path[:-len(SUMMARY_SUFFIX)] + extension
+
+
+def _status_cells(header: List[str], row: list):
+    """Yield (metric, excel_value, db_value, status) for each status column of an output row"""
+    if len(header) > 1 and header[1] == "Metric":
+        yield row[1], row[2], row[3], row[4]
+        return
+    for i, name in enumerate(header):
+        if name.endswith("Status") and i >= 2:
+            metric = name[:-len("Status")].strip() or "Actual Sales"
+            yield metric, row[i - 2], row[i - 1], row[i]
+
+
+def summarize_sheet(sheet_name: str, header: List[str], rows: List[list]) -> Dict[str, Any]:
+    """Counts and failing keys for one compared sheet"""
+    counts = {"total": 0, "match": 0, "mismatch": 0, "not_found": 0}
+    mismatch_keys = []
+    for row in rows:
+        for metric, _, _, status in _status_cells(header, row):
+            counts["total"] += 1
+            if status == "Match":
+                counts["match"] += 1
+                continue
+            if status == "Not Found":
+                counts["not_found"] += 1
+            else:
+                counts["mismatch"] += 1
+            mismatch_keys.append(f"{sheet_name} - {row[0]} {metric}")
+    counts["passed"] = counts["total"] == counts["match"]
+    if header and header[-1] == "Provenance" and rows:
+        counts["provenance"] = rows[0][-1]
+    counts["mismatch_keys"] = mismatch_keys
+    return counts
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, default=str)
+
+
+def write_widget_summary(output_path: str, excel_path: str, results, db_data: Dict[str, str],
+                         mode: str, widget_sp_map: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+    """
+    Write the compact summary for a widget comparison
+
+    Args:
+        results: [(sheet_name, header_row, output_rows), ...]
+        mode: 'rows' (compare_widget_data) or 'preserve' (compare_widget_data_preserve_structure)
+    """
+    widgets = {name: summarize_sheet(name, header, rows) for name, header, rows in results}
+    failed = [name for name, info in widgets.items() if not info["passed"]]
+    summary = {
+        "kind": "widget",
+        "mode": mode,
+        "source": os.path.abspath(excel_path),
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "elapsed_seconds": round(elapsed, 3),
+        "passed": not failed,
+        "totals": {
+            key: sum(info[key] for info in widgets.values())
+            for key in ("total", "match", "mismatch", "not_found")
+        },
+        "failed_widgets": failed,
+        "widgets": widgets,
+        "widget_sp_map": {k: str(v) for k, v in (widget_sp_map or {}).items()},
+    }
+    _write_json(output_path, summary)
+
+    # DB values are kept next to the summary only when a full report may be needed
+    if failed:
+        _write_json(output_path[:-len(SUMMARY_SUFFIX)] + DB_SIDECAR_SUFFIX, db_data)
+
+    print(f"🧾 Summary: {summary['totals']['match']}/{summary['totals']['total']} matched, "
+          f"{len(failed)} failed widgets ({elapsed:.2f}s) -> {output_path}")
+    return summary
+
+
+def write_kpi_summary(output_path: str, rows: List[list], elapsed: float) -> Dict[str, Any]:
+    """
+    Write the compact summary for a KPI comparison
+
+    Args:
+        rows: [[kpi_name, excel_value, db_value, status, notes], ...]
+    """
+    statuses = {}
+    failed = {}
+    for kpi_name, excel_value, db_value, status, _ in rows:
+        statuses[status] = statuses.get(status, 0) + 1
+        if status != "Match":
+            failed[kpi_name] = {"status": status, "excel_value": excel_value, "db_value": db_value}
+
+    summary = {
+        "kind": "kpi",
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "elapsed_seconds": round(elapsed, 3),
+        "passed": not failed,
+        "totals": {"total": len(rows), **statuses},
+        "mismatch_keys": list(failed.keys()),
+        "failed_kpis": failed,
+    }
+    _write_json(output_path, summary)
+    print(f"🧾 KPI summary: {statuses.get('Match', 0)}/{len(rows)} matched ({elapsed:.2f}s) -> {output_path}")
+    return summary
+
+
+def load_summary(summary_path: str) -> Dict[str, Any]:
+    with open(summary_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def generate_failed_reports(summary_path: str, output_path: Optional[str] = None) -> Optional[str]:
+    """
+    Build the full Excel report on demand, for failed widgets/KPIs only
+
+    Returns:
+        Path of the generated report, or None when everything passed
+    """
+    summary = load_summary(summary_path)
+    if summary.get("passed"):
+        print(f"✅ Nothing failed in {os.path.basename(summary_path)}, no report needed")
+        return None
+
+    output_path = output_path or report_path_for(summary_path, "_failed.xlsx")
+
+    if summary["kind"] == "kpi":
+        from kpistoreprocedures import compare_kpi_data
+        failed = summary["failed_kpis"]
+        compare_kpi_data(
+            {name: info["excel_value"] for name, info in failed.items()},
+            {name: info["db_value"] for name, info in failed.items()},
+            output_path
+        )
+        return output_path
+
+    from widgetstoreprocedures import compare_widget_data, compare_widget_data_preserve_structure
+    with open(summary_path[:-len(SUMMARY_SUFFIX)] + DB_SIDECAR_SUFFIX, "r", encoding="utf-8") as f:
+        db_data = json.load(f)
+
+    compare = compare_widget_data if summary["mode"] == "rows" else compare_widget_data_preserve_structure
+    compare(summary["source"], db_data, output_path, summary["widget_sp_map"], sheets=summary["failed_widgets"])
+    return output_path
+
+
+def aggregate_summaries(summary_paths: List[str], output_path: str) -> Dict[str, Any]:
+    """Combine task summaries into one run-level gating verdict"""
+    entries = {}
+    for path in summary_paths:
+        if os.path.exists(path):
+            data = load_summary(path)
+            entries[path] = {
+                "kind": data["kind"],
+                "passed": data["passed"],
+                "totals": data["totals"],
+                "elapsed_seconds": data["elapsed_seconds"],
+                "failed": data.get("failed_widgets") or data.get("mismatch_keys", []),
+            }
+    run_summary = {
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "passed": bool(entries) and all(e["passed"] for e in entries.values()),
+        "comparisons": entries,
+    }
+    _write_json(output_path, run_summary)
+    print(f"🧾 Run summary ({len(entries)} comparisons, passed={run_summary['passed']}): {output_path}")
+    return run_summary
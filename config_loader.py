@@ -139,7 +139,16 @@ class ConfigLoader:
             )
         
         # Return default parameters
-        default_params = filter_config.get("default_parameters", {})
+        return self.get_default_parameters()
+    
+    def get_default_parameters(self) -> tuple:
+        """
+        Get the default (landing page) parameters
+        
+        Returns:
+            Tuple containing the parameters (year, month, store, state, channel, fromdate, todate)
+        """
+        default_params = self.get_drillthrough_filters().get("default_parameters", {})
         return (
             default_params.get("year", 2024),
             default_params.get("month"),
@@ -0,0 +1,408 @@
+"""
+PER-WIDGET DOWNLOAD DIRECTORIES
+===============================
+Route each widget's browser download into a directory of its own through
+the Chrome DevTools Protocol (Browser.setDownloadBehavior, falling back to
+Page.setDownloadBehavior), instead of letting every download land in the
+shared download/ directory and guessing which file belongs to which
+widget from name prefixes, modification times or directory diffs.
+
+Before a widget's Download click, route(key) points the session's
+downloads at <session download dir>/.widgets/<key>/ and empties it, so
+the widget's file is the only one there and keeps the name the dashboard
+suggests (no " (1)" suffixes from earlier downloads). Two widgets, or two
+browser sessions, downloading at once can then never pick up each
+other's files.
+
+Download completion is event driven: the router opens its own DevTools
+connection to the session's browser (websocket-client) and subscribes to
+Browser.downloadWillBegin / Browser.downloadProgress. Each download is
+tracked by its GUID and mapped to the key routed when it began; it
+resolves the moment Chrome reports it completed (or canceled), and is
+then renamed from its GUID to the suggested file name. Without that
+connection the routed directories are scanned instead. Downloads are
+attributed to the key routed when they begin, so route() and reset() first
+give the previous key's download up to DOWNLOAD_BEGIN_TIMEOUT seconds to
+begin (abandon(key) when its click never happened). on_complete
+handlers run one at a time on a thread of their own, never on the reader
+thread, which must keep delivering command replies.
+
+    router = DownloadRouter.for_driver(driver, download_dir)
+    router.route("Top Stores by Sales")
+    ...click Download...
+    path = router.wait_for("Top Stores by Sales", max_wait=10)
+
+Configured with performance.parallel_processing.isolated_downloads and
+download_events; with routing off, or no CDP on the driver, downloads go
+to the session's download directory and wait_for() picks the newest file
+that appeared after route().
+"""
+
+import itertools
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.request import urlopen
+
+from config_loader import config_loader
+
+try:
+    import websocket  # websocket-client
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
+ROUTED_DIR_NAME = ".widgets"
+# Seconds route()/reset() wait for the previous key's download to begin before re-pointing downloads
+DOWNLOAD_BEGIN_TIMEOUT = 5
+
+
+def _parallel_config():
+    return config_loader.get_dynamic_engine_config().get("performance", {}).get("parallel_processing", {})
+
+
+def isolated_downloads_enabled() -> bool:
+    return bool(_parallel_config().get("isolated_downloads", True))
+
+
+def download_events_enabled() -> bool:
+    return bool(_parallel_config().get("download_events", True))
+
+
+def safe_key(key: str) -> str:
+    """Directory name for a routing key; "/" separates nested levels (page/widget)"""
+    parts = [re.sub(r'[^\w\-. ]', '_', part).strip(" .") or "_" for part in key.split("/")]
+    return os.path.join(*parts)
+
+
+def completed_downloads(directory: str) -> List[str]:
+    """Finished .xlsx downloads in directory (Chrome writes .crdownload and renames when done)"""
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, f) for f in os.listdir(directory)
+            if f.endswith(".xlsx") and not f.startswith("~$")]
+
+
+class DevToolsConnection:
+    """Browser-level DevTools websocket next to chromedriver's own, for commands and events"""
+
+    def __init__(self, ws_url: str, on_event: Callable[[str, Dict], None]):
+        # Chrome rejects DevTools websockets sending an Origin it does not allow
+        self._ws = websocket.create_connection(ws_url, suppress_origin=True, timeout=10)
+        self._ws.settimeout(None)  # The reader waits for events indefinitely
+        self.on_event = on_event
+        self.closed = False
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._read, name="devtools-events", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def open(cls, driver, on_event: Callable[[str, Dict], None]) -> Optional["DevToolsConnection"]:
+        """Connect to the driver's browser; None when it exposes no DevTools endpoint"""
+        if not WEBSOCKET_AVAILABLE:
+            return None
+        try:
+            address = driver.capabilities["goog:chromeOptions"]["debuggerAddress"]
+            with urlopen(f"http://{address}/json/version", timeout=5) as response:
+                ws_url = json.load(response)["webSocketDebuggerUrl"]
+            return cls(ws_url, on_event)
+        except Exception as e:
+            print(f"⚠️ DevTools download events unavailable ({e}); scanning download directories instead")
+            return None
+
+    def send(self, method: str, params: Optional[Dict] = None, timeout: float = 10,
+             session_id: Optional[str] = None) -> Dict:
+        """Send a command (to an attached target when session_id is given) and wait for its result"""
+        future = Future()
+        message = {"method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        with self._lock:
+            if self.closed:
+                raise ConnectionError("DevTools connection closed")
+            message["id"] = next(self._ids)
+            self._pending[message["id"]] = future
+            self._ws.send(json.dumps(message))
+        response = future.result(timeout)
+        if "error" in response:
+            raise RuntimeError(f"{method}: {response['error'].get('message')}")
+        return response.get("result", {})
+
+    def _read(self):
+        while True:
+            try:
+                message = json.loads(self._ws.recv())
+            except Exception:
+                break  # Browser quit or connection closed
+            if "id" in message:
+                with self._lock:
+                    future = self._pending.pop(message["id"], None)
+                if future is not None:
+                    future.set_result(message)
+            elif "method" in message:
+                try:
+                    self.on_event(message["method"], message.get("params", {}))
+                except Exception as e:
+                    print(f"❌ DevTools event handler failed for {message['method']}: {e}")
+        with self._lock:
+            self.closed = True
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(ConnectionError("DevTools connection closed"))
+
+    def close(self):
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+
+
+class DownloadRouter:
+    """Per-widget download directories and download completion events for one browser session"""
+
+    _by_driver = weakref.WeakKeyDictionary()
+    _by_driver_lock = threading.Lock()
+
+    def __init__(self, driver, download_dir: Optional[str] = None, enabled: Optional[bool] = None,
+                 events: Optional[bool] = None):
+        """
+        Args:
+            driver: The session's WebDriver
+            download_dir: The session's download directory (default download/)
+            enabled: Override performance.parallel_processing.isolated_downloads
+            events: Override performance.parallel_processing.download_events
+        """
+        self.driver = driver
+        self.download_dir = os.path.abspath(download_dir or "download")
+        self.root = os.path.join(self.download_dir, ROUTED_DIR_NAME)
+        self.enabled = isolated_downloads_enabled() if enabled is None else enabled
+        self.routes: Dict[str, str] = {}
+        self.on_complete: Optional[Callable[[str, str], None]] = None
+        self._routed_at: Dict[str, float] = {}
+        self._changed = threading.Condition()
+        self._current = (None, self.download_dir)
+        self._downloads: Dict[str, Dict] = {}  # GUID -> key, directory, filename, state, path, handled
+        # on_complete handlers block (file moves, queueing comparisons), so they are kept off the reader thread
+        self._handlers = ThreadPoolExecutor(max_workers=1, thread_name_prefix="download-handlers")
+        self._latest: Dict[str, str] = {}  # key -> GUID of its most recent download
+        self._expected = set()  # Routed keys whose download has not begun yet
+        use_events = self.enabled and (download_events_enabled() if events is None else events)
+        self.events = DevToolsConnection.open(driver, self._on_event) if use_events else None
+
+    @classmethod
+    def for_driver(cls, driver, download_dir: Optional[str] = None) -> "DownloadRouter":
+        """The session's router, shared by every handler using the same driver (one DevTools connection)"""
+        with cls._by_driver_lock:
+            router = cls._by_driver.get(driver)
+            if router is None:
+                router = cls._by_driver[driver] = cls(driver, download_dir)
+            return router
+
+    def _set_download_path(self, path: str) -> bool:
+        if self.events is not None:
+            try:
+                # allowAndName: the file is written as <path>/<GUID> and renamed when it completes
+                self.events.send("Browser.setDownloadBehavior",
+                                 {"behavior": "allowAndName", "downloadPath": path, "eventsEnabled": True})
+                return True
+            except Exception as e:
+                print(f"⚠️ DevTools download events lost ({e}); scanning download directories instead")
+                self.events = None
+        for command in ("Browser.setDownloadBehavior", "Page.setDownloadBehavior"):
+            try:
+                self.driver.execute_cdp_cmd(command, {"behavior": "allow", "downloadPath": path})
+                return True
+            except Exception:
+                continue
+        return False
+
+    def route(self, key: str) -> str:
+        """
+        Send the session's next downloads to key's own (emptied) directory
+
+        Returns:
+            The directory the download will land in
+        """
+        if not self.enabled:
+            self._routed_at[key] = time.time()
+            self.routes[key] = self.download_dir
+            return self.download_dir
+
+        if self._current[0] != key:
+            self._await_begin(self._current[0])
+        self._routed_at[key] = time.time()
+        directory = os.path.join(self.root, safe_key(key))
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+        with self._changed:
+            # Downloads beginning from now on belong to key
+            self._current = (key, directory)
+            self._latest.pop(key, None)
+            self._expected.add(key)
+        if not self._set_download_path(directory):
+            print(f"⚠️ Could not route downloads through CDP; using {self.download_dir}")
+            self.enabled = False
+            directory = self.download_dir
+        self.routes[key] = directory
+        return directory
+
+    def reset(self):
+        """Send downloads back to the session's download directory"""
+        if self.enabled:
+            self._await_begin(self._current[0])
+            with self._changed:
+                self._current = (None, self.download_dir)
+            self._set_download_path(self.download_dir)
+
+    def abandon(self, key: str):
+        """No download is coming for key (its Download click failed): routing on need not wait for it"""
+        with self._changed:
+            self._expected.discard(key)
+            self._changed.notify_all()
+
+    def _begun(self, key: str) -> bool:
+        if key not in self._expected:
+            return True
+        if self.events is None:
+            # Chrome creates the (partial) file as soon as the download starts
+            directory = self.routes.get(key)
+            return bool(directory and os.path.isdir(directory) and os.listdir(directory))
+        return False
+
+    def _await_begin(self, key: Optional[str]):
+        """Keep downloads pointed at key's directory until its download has begun (or DOWNLOAD_BEGIN_TIMEOUT)"""
+        if key is None:
+            return
+        deadline = time.time() + DOWNLOAD_BEGIN_TIMEOUT
+        with self._changed:
+            # Without events nothing notifies, so the directory is re-checked every 0.1s
+            while not self._begun(key):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    print(f"⚠️ No download began for {key} within {DOWNLOAD_BEGIN_TIMEOUT}s; routing on")
+                    break
+                self._changed.wait(remaining if self.events is not None else min(remaining, 0.1))
+            self._expected.discard(key)
+
+    # Download events
+
+    def _on_event(self, method: str, params: Dict):
+        if method == "Browser.downloadWillBegin":
+            with self._changed:
+                key, directory = self._current
+                self._downloads[params["guid"]] = {
+                    'key': key, 'directory': directory, 'filename': params.get("suggestedFilename") or params["guid"],
+                    'state': 'inProgress', 'path': None, 'handled': True
+                }
+                if key is not None:
+                    self._latest[key] = params["guid"]
+                    self._expected.discard(key)
+                    self._changed.notify_all()
+        elif method == "Browser.downloadProgress" and params.get("state") in ("completed", "canceled"):
+            with self._changed:
+                record = self._downloads.get(params["guid"])
+            if record is None:
+                return
+            if params["state"] == "completed":
+                path = os.path.join(record['directory'], record['filename'])
+                try:
+                    os.replace(os.path.join(record['directory'], params["guid"]), path)
+                    record['path'] = path
+                except OSError as e:
+                    print(f"⚠️ Could not name download {record['filename']}: {e}")
+            else:
+                print(f"⚠️ Download canceled: {record['filename']}")
+            handler = self.on_complete if record['path'] and record['key'] is not None else None
+            with self._changed:
+                record['state'] = params["state"]
+                record['handled'] = handler is None
+                self._changed.notify_all()
+            if handler is not None:
+                self._handlers.submit(self._handle, handler, record)
+
+    def _handle(self, handler: Callable[[str, str], None], record: Dict):
+        """Run on_complete for a finished download; its waiters wake once the handler is done"""
+        try:
+            handler(record['key'], record['path'])
+        except Exception as e:
+            print(f"❌ Download handler failed for {record['filename']}: {e}")
+        finally:
+            with self._changed:
+                record['handled'] = True
+                self._changed.notify_all()
+
+    def _resolved(self, key: str) -> bool:
+        record = self._downloads.get(self._latest.get(key))
+        return record is not None and record['state'] != 'inProgress' and record['handled']
+
+    def downloaded_file(self, key: str) -> Optional[str]:
+        """The finished download for key, if it has landed (where it landed, even if on_complete moved it)"""
+        if self.events is not None:
+            with self._changed:
+                record = self._downloads.get(self._latest.get(key))
+                return record['path'] if record and record['state'] == 'completed' else None
+
+        directory = self.routes.get(key)
+        if directory is None:
+            return None
+        files = completed_downloads(directory)
+        if directory == self.download_dir:
+            # Shared directory: only files that appeared after route() can be key's
+            since = self._routed_at.get(key, 0)
+            files = [f for f in files if os.path.getmtime(f) >= since]
+        files = [f for f in files if os.path.getsize(f) > 0]
+        return max(files, key=os.path.getmtime) if files else None
+
+    def wait_for(self, key: str, max_wait: float = 10, check_interval: float = 0.2) -> Optional[str]:
+        """Path of key's download once it is complete, or None after max_wait seconds"""
+        return self.wait_for_all([key], max_wait, check_interval).get(key)
+
+    def wait_for_all(self, keys: Iterable[str], max_wait: float = 10,
+                     check_interval: float = 0.2) -> Dict[str, str]:
+        """
+        Wait until every key's download is complete (or max_wait elapsed)
+
+        With download events this returns as soon as Chrome reports the last one
+        and its on_complete handler has run; otherwise the routed directories are
+        scanned every check_interval seconds.
+
+        Returns:
+            {key: file path} for the downloads that completed
+        """
+        keys = list(keys)
+        found: Dict[str, str] = {}
+        if self.events is not None:
+            with self._changed:
+                self._changed.wait_for(lambda: all(self._resolved(key) for key in keys), timeout=max_wait)
+            for key in keys:
+                path = self.downloaded_file(key)
+                if path:
+                    found[key] = path
+        else:
+            start = time.time()
+            while True:
+                for key in keys:
+                    if key not in found:
+                        path = self.downloaded_file(key)
+                        if path:
+                            found[key] = path
+                if len(found) == len(keys) or time.time() - start >= max_wait:
+                    break
+                time.sleep(check_interval)
+        if len(found) < len(keys):
+            missing = [key for key in keys if key not in found]
+            print(f"⚠️ {len(found)}/{len(keys)} downloads completed (waited up to {max_wait}s); missing: {missing}")
+        return found
+
+    def close(self):
+        if self.events is not None:
+            self.events.close()
+        self._handlers.shutdown(wait=False)
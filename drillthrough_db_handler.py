@@ -3,6 +3,9 @@ from widgetstoreprocedures import widget_sp_map, fetch_db_widget_values, compare
 from dynamic_comparison_engine import DynamicComparisonEngine
 import traceback
 from config_loader import config_loader
+from sidecar_tables import report_exists, report_size
+from sp_batch import execute_sp
+from sp_parameters import landing_params, drillthrough_params, drillthrough_store_id
 
 # Drillthrough widget stored procedure mapping
 # ONE SP per drillthrough - each SP matches one specific sheet in the Excel
@@ -37,49 +40,12 @@ class DrillthroughDBHandler:
     def __init__(self):
         # Drillthrough might need different parameters than landing page
         # You may need to adjust these based on your drillthrough requirements
-        self.base_params = (2024, None, None, None, None, None, None)  # year, month, store, state, channel, fromdate, todate
+        self.base_params = landing_params()  # year, month, store, state, channel, fromdate, todate
         
         # Initialize dynamic comparison engine
         self.dynamic_engine = DynamicComparisonEngine()
         print("🧠 Dynamic comparison engine initialized")
         
-        # Store name to ID mapping (as string for nvarchar parameter)
-        self.store_name_to_id = {
-            "Love Library": "717",
-            "717": "717",  # Allow direct ID input as well
-            # Add more store mappings as needed
-        }
-        
-        # Brand/Channel name to ID mapping (if needed)
-        self.brand_name_to_id = {
-            "Routledge Publications": "Routledge Publications",  # Keep as string if that's what SP expects
-            # Add more brand mappings as needed
-        }
-        
-        # Alternative parameter sets for different drillthrough scenarios
-        # IMPORTANT: These parameters should match the drillthrough context
-        self.drillthrough_params = {
-            # Store drillthrough - filter by specific store
-            "Love Library": (2024, None, "717", None, None, None, None),  # Store 717
-            
-            # Brand drillthrough - currently not supported by SPs, use generic
-            "Routledge Publications": (2024, None, None, None, None, None, None),  # Generic for now
-            
-            # Category drillthrough - SPs don't have category parameter, use generic
-            "E-Books": (2024, None, None, None, None, None, None),  # Generic for now
-            
-            # Sub-category drillthrough - SPs don't have subcategory parameter
-            "Non-Fiction": (2024, None, None, None, None, None, None),  # Generic for now
-            
-            # Product drillthrough - SPs don't have product parameter
-            "MATLAB": (2024, None, None, None, None, None, None),  # Generic for now
-            
-            # Time-based drillthrough - SPs don't have week parameter
-            "Week1": (2024, None, None, None, None, None, None),  # Generic for now
-            
-            "default": (2024, None, None, None, None, None, None)
-        }
-        
         # Track which drillthrough types have proper parameter support
         self.supported_filters = {
             "Love Library": "store",  # Store filter works
@@ -92,27 +58,12 @@ class DrillthroughDBHandler:
     
     def get_store_id(self, store_name):
         """Convert store name to store ID (as string for nvarchar parameter)"""
-        if store_name in self.store_name_to_id:
-            return self.store_name_to_id[store_name]
-        
-        # If it's already a number string, return as is
-        if str(store_name).isdigit():
-            return str(store_name)
-        
-        return None
+        return drillthrough_store_id(store_name)
     
     def get_drillthrough_params(self, submenu_selection):
         """Get appropriate parameters for drillthrough based on submenu selection"""
-        if submenu_selection in self.drillthrough_params:
-            return self.drillthrough_params[submenu_selection]
-        
-        # Dynamic parameter generation based on submenu selection
-        store_id = self.get_store_id(submenu_selection)
-        if store_id:
-            return (2024, None, store_id, None, None, None, None)  # store_id is now a string
-        
-        # Default fallback
-        return self.base_params
+        # Shared with the background processor's SP batch coalescing (sp_parameters.py)
+        return drillthrough_params(submenu_selection)
     
     def get_drillthrough_sp_map(self, widget_title, submenu_selection):
         """Get the appropriate stored procedure map for drillthrough"""
@@ -218,15 +169,13 @@ class DrillthroughDBHandler:
                 @Year=?, @Month=?, @Store=?, @State=?, @Channel=?, @FromDate=?, @ToDate=?
                 """
                 print(f"🔍 Executing {sp_name} with named parameters...")
-                cursor.execute(sql_query, (year, month, store, state, channel, fromdate, todate))
-                result = cursor.fetchall()
-                columns = [desc[0] for desc in cursor.description]
+                columns, result = execute_sp(cursor, sp_name, params, sql=sql_query,
+                                             sql_params=(year, month, store, state, channel, fromdate, todate))
                 
             except Exception as named_error:
                 print(f"⚠️ Named parameters failed for {sp_name}, trying positional...")
-                cursor.execute(f"EXEC [{sp_name}] ?, ?, ?, ?, ?, ?, ?", params)
-                result = cursor.fetchall()
-                columns = [desc[0] for desc in cursor.description]
+                # Own batch key: the named call's failure is what the batch holds for (sp_name, params)
+                columns, result = execute_sp(cursor, f"{sp_name}#positional", params, sql=f"EXEC [{sp_name}] ?, ?, ?, ?, ?, ?, ?")
             
             print(f"📊 SP {sp_name} returned {len(result)} rows with columns: {columns}")
             
@@ -416,7 +365,7 @@ class DrillthroughDBHandler:
             )
             
             if success:
-                file_size = os.path.getsize(output_path)
+                file_size = report_size(output_path)
                 print(f"✅ DYNAMIC drillthrough comparison completed!")
                 print(f"📄 Output: {os.path.basename(output_path)} ({file_size:,} bytes)")
                 print(f"🎉 No hardcoded mappings needed - automatically detected patterns!")
@@ -447,7 +396,7 @@ class DrillthroughDBHandler:
             }
             
             # Get Love Library parameters (Store 717)
-            params = (2024, None, "717", None, None, None, None)
+            params = drillthrough_params("Love Library")
             all_data = {}
             
             for sp_name, sheet_name in love_library_sps.items():
@@ -473,8 +422,8 @@ class DrillthroughDBHandler:
             dummy_sp_map = {"Love Library Drillthrough": "Multiple_Love_Library_SPs"}
             compare_widget_data(excel_path, all_data, output_path, dummy_sp_map)
             
-            if os.path.exists(output_path):
-                file_size = os.path.getsize(output_path)
+            if report_exists(output_path):
+                file_size = report_size(output_path)
                 print(f"✅ Love Library comparison completed!")
                 print(f"📄 Output: {os.path.basename(output_path)} ({file_size:,} bytes)")
                 return True
@@ -533,8 +482,8 @@ class DrillthroughDBHandler:
             print(f"✅ Legacy drillthrough comparison completed: {output_path}")
             
             # Verify comparison file was created
-            if os.path.exists(output_path):
-                file_size = os.path.getsize(output_path)
+            if report_exists(output_path):
+                file_size = report_size(output_path)
                 print(f"📄 Legacy comparison file created: {os.path.basename(output_path)} ({file_size:,} bytes)")
                 return True
             else:
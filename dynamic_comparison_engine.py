@@ -6,17 +6,32 @@ Eliminates hardcoded sheet-to-SP mappings through intelligent analysis
 
 import re
 import os
+import threading
+import time
 from openpyxl import load_workbook, Workbook
 from dataBase import DatabaseConnector
 from collections import defaultdict
 from config_loader import config_loader
+from sp_matcher import get_sp_matcher
+from sp_formatters import format_sp_data
+from sheet_comparison import iter_sheet
+from virtual_workbook import open_workbook
+from sidecar_tables import report_exists, report_size
+from sp_batch import execute_sp
 
 class DynamicComparisonEngine:
+    # SP compatibility results shared by all engines in the process, keyed by params.
+    # Pipelined runs queue one comparison per widget, each of which would otherwise
+    # re-execute every SP just to build its mapping.
+    _compatibility_cache = {}
+    _compatibility_lock = threading.Lock()
+
     def __init__(self):
         self.db_connector = DatabaseConnector()
         
-        # Auto-discoverable stored procedures
-        self.available_sps = [
+        # Auto-discoverable stored procedures (config driven, legacy list as fallback)
+        engine_config = config_loader.get_dynamic_engine_config()
+        self.available_sps = engine_config.get("available_sps") or [
             "SP_SalesTrend",
             "SP_TopPerformingEmployee", 
             "SP_TopProductsBySales",
@@ -30,18 +45,8 @@ class DynamicComparisonEngine:
             "SP_StorewiseActualVsTarget_Vertical_SortedByActual"
         ]
         
-        # Pattern-based SP suggestions (can be learned/updated)
-        self.sp_patterns = {
-            r'sales.*trend|trend.*sales|month.*sales': 'SP_SalesTrend',
-            r'week.*sales|weekly.*sales|weekwise': 'SP_WeekwiseSalesComparison',
-            r'weekday|weekend|day.*type': 'SP_WeekdayWeekendSales',
-            r'product.*sales|sales.*product': 'SP_TopProductsBySales',
-            r'brand.*sales|sales.*brand': 'SP_TopBrandsBySales',
-            r'store.*sales|sales.*store': 'SP_TopStoresbySales',
-            r'employee|performing': 'SP_TopPerformingEmployee',
-            r'categor.*sales|sales.*categor': 'SP_TopCategoriesBySaleswidget',
-            r'target.*actual|actual.*target': 'SP_StorewiseActualVsTarget_Vertical_SortedByActual'
-        }
+        # Compiled pattern/scoring tables from dynamic_engine_config.yaml
+        self.matcher = get_sp_matcher()
     
     def analyze_excel_structure(self, excel_path):
         """
@@ -52,19 +57,20 @@ class DynamicComparisonEngine:
             print(f"❌ Excel file not found: {excel_path}")
             return {}
         
-        wb = load_workbook(excel_path, data_only=True)
+        wb = open_workbook(excel_path, read_only=True, data_only=True)
         analysis = {}
         
         print(f"🔍 Analyzing Excel structure: {os.path.basename(excel_path)}")
         
         for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            
-            # Get headers
-            headers = []
-            for cell in ws[1]:
-                header = str(cell.value).strip().lower() if cell.value else ""
-                headers.append(header)
+            # Single read-only pass: headers, first samples and row count
+            headers, rows = iter_sheet(wb[sheet_name])
+            sample_rows = []
+            data_volume = 0
+            for row in rows:
+                data_volume += 1
+                if len(sample_rows) < 3 and any(cell is not None for cell in row):
+                    sample_rows.append(row)
             
             # Analyze sheet structure
             sheet_analysis = {
@@ -73,14 +79,15 @@ class DynamicComparisonEngine:
                 'headers': headers,
                 'data_patterns': self._detect_data_patterns(headers),
                 'key_columns': self._identify_key_columns(headers),
-                'sample_data': self._extract_sample_data(ws, headers),
+                'sample_data': self._extract_sample_data(sample_rows, headers),
                 'suggested_sps': self._suggest_stored_procedures(sheet_name, headers),
-                'data_volume': ws.max_row - 1  # Exclude header row
+                'data_volume': data_volume  # Excludes header row
             }
             
             analysis[sheet_name] = sheet_analysis
             print(f"  📄 {sheet_name}: {sheet_analysis['data_patterns']} ({sheet_analysis['data_volume']} rows)")
         
+        wb.close()
         return analysis
     
     def _normalize_name(self, name):
@@ -89,39 +96,7 @@ class DynamicComparisonEngine:
     
     def _detect_data_patterns(self, headers):
         """Detect data patterns from headers"""
-        header_text = ' '.join(headers).lower()
-        
-        patterns = []
-        
-        # Time-based patterns
-        if any(x in header_text for x in ['month', 'monthly']):
-            patterns.append('monthly_data')
-        if any(x in header_text for x in ['week', 'weekly']):
-            patterns.append('weekly_data')
-        if any(x in header_text for x in ['weekday', 'weekend']):
-            patterns.append('weekday_weekend_data')
-        
-        # Entity patterns
-        if 'product' in header_text:
-            patterns.append('product_data')
-        if 'brand' in header_text:
-            patterns.append('brand_data')
-        if 'store' in header_text:
-            patterns.append('store_data')
-        if 'employee' in header_text:
-            patterns.append('employee_data')
-        if 'category' in header_text:
-            patterns.append('category_data')
-        
-        # Value patterns
-        if any(x in header_text for x in ['sales', 'revenue']):
-            patterns.append('sales_data')
-        if 'target' in header_text:
-            patterns.append('target_data')
-        if any(x in header_text for x in ['current year', 'previous year']):
-            patterns.append('year_comparison')
-        
-        return patterns if patterns else ['generic_data']
+        return self.matcher.detect_data_patterns(headers)
     
     def _identify_key_columns(self, headers):
         """Identify key columns for data extraction"""
@@ -158,12 +133,12 @@ class DynamicComparisonEngine:
         
         return key_columns
     
-    def _extract_sample_data(self, worksheet, headers, max_samples=3):
+    def _extract_sample_data(self, rows, headers, max_samples=3):
         """Extract sample data for pattern analysis"""
         samples = []
         row_count = 0
         
-        for row in worksheet.iter_rows(min_row=2, values_only=True):
+        for row in rows:
             if row_count >= max_samples:
                 break
             
@@ -179,35 +154,32 @@ class DynamicComparisonEngine:
     
     def _suggest_stored_procedures(self, sheet_name, headers):
         """Suggest stored procedures based on sheet analysis"""
-        suggestions = []
-        sheet_text = sheet_name.lower()
-        header_text = ' '.join(headers).lower()
-        combined_text = f"{sheet_text} {header_text}"
-        
-        # Pattern-based matching
-        for pattern, sp_name in self.sp_patterns.items():
-            if re.search(pattern, combined_text):
-                suggestions.append({
-                    'sp_name': sp_name,
-                    'confidence': 0.8,
-                    'reason': f'Pattern match: {pattern}'
-                })
-        
-        # Fallback suggestions based on keywords
-        if not suggestions:
-            if 'sales' in combined_text:
-                suggestions.append({
-                    'sp_name': 'SP_TopProductsBySales',
-                    'confidence': 0.5,
-                    'reason': 'Generic sales data'
-                })
-        
-        return suggestions
+        return self.matcher.suggest_stored_procedures(sheet_name, headers)
     
     def test_sp_compatibility(self, params, max_test_sps=None):
         """
         Test stored procedures to find which ones work with given parameters
+
+        Results are reused for performance.caching.cache_duration seconds when
+        performance.caching is enabled.
         """
+        caching = config_loader.get_dynamic_engine_config().get("performance", {}).get("caching", {})
+        if not caching.get("enabled", False):
+            return self._run_sp_compatibility(params, max_test_sps)
+
+        key = (tuple(params), max_test_sps, tuple(self.available_sps))
+        with DynamicComparisonEngine._compatibility_lock:
+            cached = DynamicComparisonEngine._compatibility_cache.get(key)
+            if cached and time.time() - cached[0] < caching.get("cache_duration", 300):
+                print(f"♻️ Reusing SP compatibility results for params: {params}")
+                return cached[1]
+            # Tested under the lock so concurrent tasks wait for one run instead of repeating it
+            compatibility = self._run_sp_compatibility(params, max_test_sps)
+            DynamicComparisonEngine._compatibility_cache[key] = (time.time(), compatibility)
+            return compatibility
+
+    def _run_sp_compatibility(self, params, max_test_sps=None):
+        """Execute each available SP once with params and classify its output"""
         print(f"🧪 Testing SP compatibility with params: {params}")
         
         conn = self.db_connector.connect()
@@ -219,9 +191,7 @@ class DynamicComparisonEngine:
         for sp_name in test_sps:
             try:
                 # Test with positional parameters
-                cursor.execute(f"EXEC [{sp_name}] ?, ?, ?, ?, ?, ?, ?", params)
-                result = cursor.fetchall()
-                columns = [desc[0] for desc in cursor.description]
+                columns, result = execute_sp(cursor, sp_name, params)
                 
                 compatibility[sp_name] = {
                     'works': True,
@@ -320,11 +290,12 @@ class DynamicComparisonEngine:
         
         print(f"✅ Found {len(working_sps)} working SPs")
         
-        # Step 3: Create intelligent mappings
+        # Step 3: Create intelligent mappings (all sheets x all SPs scored in one pass)
         mappings = {}
+        score_matrix = self.matcher.score_all(excel_analysis, working_sps)
         
         for sheet_name, sheet_info in excel_analysis.items():
-            best_mapping = self._find_best_sp_match(sheet_info, working_sps)
+            best_mapping = self._find_best_sp_match(sheet_info, working_sps, score_matrix[sheet_name])
             
             if best_mapping:
                 mappings[sheet_name] = best_mapping
@@ -334,126 +305,31 @@ class DynamicComparisonEngine:
         
         return mappings
     
-    def _find_best_sp_match(self, sheet_info, working_sps):
-        """Find the best SP match for a sheet using improved logic"""
-        best_match = None
-        best_score = 0
-        
-        sheet_name = sheet_info['original_name'].lower()
+    def _find_best_sp_match(self, sheet_info, working_sps, scores=None):
+        """Find the best SP match for a sheet using the compiled matcher"""
         sheet_patterns = set(sheet_info['data_patterns'])
         
         print(f"🔍 Finding best SP match for: {sheet_info['original_name']}")
         print(f"   Sheet patterns: {sheet_patterns}")
         
-        # Enhanced pattern matching with sheet name analysis
-        for sp_name, sp_info in working_sps.items():
-            score = self._calculate_enhanced_match_score(sheet_info, sp_info, sheet_name)
-            
-            print(f"   {sp_name}: score={score:.2f}, pattern={sp_info['output_pattern']}")
-            
-            if score > best_score:
-                best_score = score
-                best_match = {
-                    'sp_name': sp_name,
-                    'confidence': score,
-                    'output_pattern': sp_info['output_pattern'],
-                    'key_columns': sheet_info['key_columns'],
-                    'data_patterns': sheet_info['data_patterns']
-                }
+        if scores is None:
+            scores = self.matcher.score_all({sheet_info['original_name']: sheet_info}, working_sps)[sheet_info['original_name']]
+        
+        for sp_name, score in scores.items():
+            print(f"   {sp_name}: score={score:.2f}, pattern={working_sps[sp_name]['output_pattern']}")
+        
+        best_match = self.matcher.best_match(sheet_info, scores, working_sps)
         
         if best_match:
             print(f"   ✅ Best match: {best_match['sp_name']} (confidence: {best_match['confidence']:.2f})")
         else:
             print(f"   ❌ No suitable match found")
         
-        return best_match if best_score > 0.3 else None  # Minimum confidence threshold
+        return best_match
     
     def _calculate_enhanced_match_score(self, sheet_info, sp_info, sheet_name):
-        """Enhanced match score calculation with sheet name analysis"""
-        score = 0.0
-        
-        sheet_patterns = set(sheet_info['data_patterns'])
-        sp_pattern = sp_info['output_pattern']
-        sp_name = sp_info.get('sp_name', '')
-        
-        # Direct sheet name to SP mapping (highest priority)
-        # Special handling for store sales with targets
-        if 'store sales' in sheet_name and 'target_data' in sheet_patterns:
-            direct_mappings = {
-                'store sales': 'SP_StorewiseActualVsTarget_Vertical_SortedByActual',
-            }
-        else:
-            direct_mappings = {
-                'store sales': 'SP_TopStoresbySales',
-                'top stores': 'SP_TopStoresbySales',
-                'brands': 'SP_TopBrandsBySales',
-                'top brands': 'SP_TopBrandsBySales',
-                'categories': 'SP_TopCategoriesBySaleswidget',
-                'top categories': 'SP_TopCategoriesBySaleswidget',
-                'sub categories': 'SP_TopSubCategoriesBySales',
-                'products': 'SP_TopProductsBySales',
-                'top products': 'SP_TopProductsBySales',
-                'weekly trends': 'SP_WeeklyTrendswidget',  # Exact match for Weekly Trends
-                'weekly': 'SP_WeeklyTrendswidget',
-                'sales trends': 'SP_SalesTrend',
-                'month': 'SP_SalesTrend'
-            }
-        
-        # Check for direct name matches
-        for name_pattern, expected_sp in direct_mappings.items():
-            if name_pattern in sheet_name and expected_sp in sp_name:
-                score += 0.8
-                print(f"     Direct name match: {name_pattern} -> {expected_sp}")
-                break
-        
-        # Pattern matching scores (secondary priority)
-        pattern_matches = {
-            'monthly_trends': {'monthly_data', 'sales_data', 'year_comparison'},
-            'weekly_trends': {'weekly_data', 'sales_data', 'year_comparison'},
-            'weekday_weekend': {'weekday_weekend_data', 'sales_data'},
-            'product_sales': {'product_data', 'sales_data'},
-            'brand_sales': {'brand_data', 'sales_data'},
-            'store_sales': {'store_data', 'sales_data'},
-            'employee_performance': {'employee_data', 'sales_data'},
-            'metric_value_pairs': {'target_data', 'sales_data'},
-            'generic': {'sales_data'}  # Generic can match basic sales data
-        }
-        
-        expected_patterns = pattern_matches.get(sp_pattern, set())
-        if expected_patterns.intersection(sheet_patterns):
-            score += 0.4
-        
-        # SP-specific pattern matching with improved logic
-        if 'SP_StorewiseActualVsTarget_Vertical_SortedByActual' in sp_name and ('store' in sheet_name and 'target_data' in sheet_patterns):
-            score += 0.9  # Strongly prefer this for store data with targets
-        elif 'SP_TopStoresbySales' in sp_name and ('store' in sheet_name and 'target_data' not in sheet_patterns):
-            score += 0.5  # Use this for store data without targets
-        elif 'SP_TopBrandsBySales' in sp_name and 'brand' in sheet_name:
-            score += 0.5
-        elif 'SP_TopCategoriesBySaleswidget' in sp_name and 'categor' in sheet_name and 'sub' not in sheet_name:
-            score += 0.5  # Only for main categories, not sub-categories
-        elif 'SP_TopSubCategoriesBySales' in sp_name and 'sub categor' in sheet_name:
-            score += 0.7  # Prefer this for sub-categories
-        elif 'SP_TopProductsBySales' in sp_name and 'product' in sheet_name:
-            score += 0.5
-        elif 'SP_WeeklyTrendswidget' in sp_name and 'weekly trends' in sheet_name:
-            score += 0.9  # Strongly prefer this for "Weekly Trends" sheets
-        elif 'SP_WeeklyTrendswidget' in sp_name and 'weekly' in sheet_name:
-            score += 0.7  # Prefer this for weekly trends
-        elif 'SP_WeekwiseSalesComparison' in sp_name and 'weekly' in sheet_name and 'trends' not in sheet_name:
-            score += 0.6  # Alternative for weekly data (but not for "Weekly Trends")
-        elif 'SP_SalesTrend' in sp_name and ('sales trend' in sheet_name or ('trend' in sheet_name and 'weekly' not in sheet_name)):
-            score += 0.5  # Only for non-weekly trends
-        
-        # Data volume consideration (lower priority)
-        if sp_info['row_count'] > 0:
-            score += 0.1
-        
-        # Column compatibility (lower priority)
-        if sheet_info['key_columns'] and sp_info['columns']:
-            score += 0.1
-        
-        return min(score, 1.0)
+        """Enhanced match score calculation (delegates to the compiled matcher)"""
+        return self.matcher.score(sheet_info, sp_info.get('sp_name', ''), sp_info)
     
     def fetch_dynamic_db_data(self, mappings, params):
         """
@@ -471,9 +347,8 @@ class DynamicComparisonEngine:
             output_pattern = mapping['output_pattern']
             
             try:
-                cursor.execute(f"EXEC [{sp_name}] ?, ?, ?, ?, ?, ?, ?", params)
-                result = cursor.fetchall()
-                columns = [desc[0] for desc in cursor.description]
+                # Coalesced with other comparisons of the same batch needing this SP and params
+                columns, result = execute_sp(cursor, sp_name, params)
                 
                 # Format data based on output pattern
                 formatted_data = self._format_sp_data(
@@ -490,291 +365,8 @@ class DynamicComparisonEngine:
         return all_db_data
     
     def _format_sp_data(self, result, columns, sheet_name, output_pattern):
-        """Format SP data based on detected output pattern"""
-        formatted_data = {}
-        
-        if output_pattern == 'monthly_trends':
-            formatted_data.update(self._format_monthly_trends(result, columns, sheet_name))
-        elif output_pattern == 'weekly_trends':
-            formatted_data.update(self._format_weekly_trends(result, columns, sheet_name))
-        elif output_pattern == 'weekday_weekend':
-            formatted_data.update(self._format_weekday_weekend(result, columns, sheet_name))
-        elif output_pattern == 'product_sales':
-            formatted_data.update(self._format_product_sales(result, columns, sheet_name))
-        elif output_pattern == 'brand_sales':
-            formatted_data.update(self._format_brand_sales(result, columns, sheet_name))
-        elif output_pattern == 'store_sales':
-            formatted_data.update(self._format_store_sales(result, columns, sheet_name))
-        elif output_pattern == 'employee_performance':
-            formatted_data.update(self._format_employee_performance(result, columns, sheet_name))
-        elif output_pattern == 'metric_value_pairs':
-            formatted_data.update(self._format_metric_value_pairs(result, columns, sheet_name))
-        elif output_pattern == 'category_sales':
-            formatted_data.update(self._format_category_sales(result, columns, sheet_name))
-        elif output_pattern == 'generic_sales':
-            formatted_data.update(self._format_generic_sales(result, columns, sheet_name))
-        else:
-            # Generic formatting
-            formatted_data.update(self._format_generic(result, columns, sheet_name))
-        
-        return formatted_data
-    
-    def _format_monthly_trends(self, result, columns, sheet_name):
-        """Format monthly trends data"""
-        data = {}
-        month_abbrev = {
-            'January': 'Jan', 'February': 'Feb', 'March': 'Mar', 'April': 'Apr',
-            'May': 'May', 'June': 'Jun', 'July': 'Jul', 'August': 'Aug',
-            'September': 'Sep', 'October': 'Oct', 'November': 'Nov', 'December': 'Dec'
-        }
-        
-        for row in result:
-            row_dict = dict(zip(columns, row))
-            month = str(row_dict.get('Month', 'Unknown')).strip()
-            month = month_abbrev.get(month, month)
-            
-            if 'CurrentYearSales' in row_dict and row_dict['CurrentYearSales'] is not None:
-                data[f"{sheet_name} - {month} Current Year"] = str(row_dict['CurrentYearSales']).strip()
-            if 'PreviousYearSales' in row_dict and row_dict['PreviousYearSales'] is not None:
-                data[f"{sheet_name} - {month} Previous Year"] = str(row_dict['PreviousYearSales']).strip()
-        
-        return data
-    
-    def _format_weekly_trends(self, result, columns, sheet_name):
-        """Format weekly trends data"""
-        data = {}
-        
-        print(f"🔍 Formatting weekly trends for {sheet_name}")
-        print(f"   Columns: {columns}")
-        
-        for row in result:
-            row_dict = dict(zip(columns, row))
-            week = str(row_dict.get('Week') or row_dict.get('WeekCategory', 'Unknown')).strip()
-            
-            if 'CurrentYearSales' in row_dict and row_dict['CurrentYearSales'] is not None:
-                # Clean the value - remove commas
-                current_value = str(row_dict['CurrentYearSales']).replace(',', '').strip()
-                key = f"{sheet_name} - {week} Current Year"
-                data[key] = current_value
-                print(f"   Added: {key} = {current_value}")
-                
-            if 'PreviousYearSales' in row_dict and row_dict['PreviousYearSales'] is not None:
-                # Clean the value - remove commas
-                previous_value = str(row_dict['PreviousYearSales']).replace(',', '').strip()
-                key = f"{sheet_name} - {week} Previous Year"
-                data[key] = previous_value
-                print(f"   Added: {key} = {previous_value}")
-        
-        print(f"   Total formatted: {len(data)} values")
-        return data
-    
-    def _format_weekday_weekend(self, result, columns, sheet_name):
-        """Format weekday/weekend data"""
-        data = {}
-        for row in result:
-            row_dict = dict(zip(columns, row))
-            day_type = str(row_dict.get('DayType') or row_dict.get('WeekCategory', 'Unknown')).strip().upper()
-            
-            if 'CurrentYearSales' in row_dict and row_dict['CurrentYearSales'] is not None:
-                data[f"{sheet_name} - {day_type} SALES Current Year"] = str(row_dict['CurrentYearSales']).strip()
-            if 'PreviousYearSales' in row_dict and row_dict['PreviousYearSales'] is not None:
-                data[f"{sheet_name} - {day_type} SALES Previous Year"] = str(row_dict['PreviousYearSales']).strip()
-        
-        return data
-    
-    def _format_product_sales(self, result, columns, sheet_name):
-        """Format product sales data"""
-        data = {}
-        for row in result:
-            row_dict = dict(zip(columns, row))
-            product = str(row_dict.get('ProductName', 'Unknown')).strip()
-            sales = row_dict.get('Sales')
-            
-            if sales is not None:
-                data[f"{sheet_name} - {product}"] = str(sales).strip()
-        
-        return data
-    
-    def _format_brand_sales(self, result, columns, sheet_name):
-        """Format brand sales data"""
-        data = {}
-        for row in result:
-            row_dict = dict(zip(columns, row))
-            brand = str(row_dict.get('BrandName', 'Unknown')).strip()
-            sales = row_dict.get('Sales')
-            
-            if sales is not None:
-                data[f"{sheet_name} - {brand}"] = str(sales).strip()
-        
-        return data
-    
-    def _format_store_sales(self, result, columns, sheet_name):
-        """Format store sales data"""
-        data = {}
-        
-        print(f"🔍 Formatting store sales data for {sheet_name}")
-        print(f"   Columns: {columns}")
-        
-        # Handle different column name variations
-        identifier_col = None
-        sales_col = None
-        target_col = None
-        
-        for col in columns:
-            col_lower = col.lower()
-            if any(x in col_lower for x in ['storename', 'store', 'identifier']):
-                identifier_col = col
-            elif any(x in col_lower for x in ['actual sales', 'sales', 'actual']):
-                sales_col = col
-            elif 'target' in col_lower:
-                target_col = col
-        
-        print(f"   Identifier column: {identifier_col}")
-        print(f"   Sales column: {sales_col}")
-        print(f"   Target column: {target_col}")
-        
-        if identifier_col and sales_col:
-            for row in result:
-                row_dict = dict(zip(columns, row))
-                identifier = str(row_dict.get(identifier_col, 'Unknown')).strip()
-                sales = row_dict.get(sales_col)
-                
-                if sales is not None:
-                    key = f"{sheet_name} - {identifier}"
-                    data[key] = str(sales).strip()
-                    print(f"   Added: {key} = {sales}")
-                
-                # Handle target data if available
-                if target_col and row_dict.get(target_col) is not None:
-                    target_value = row_dict.get(target_col)
-                    target_key = f"{sheet_name} - {identifier} Target"
-                    data[target_key] = str(target_value).strip()
-                    print(f"   Added: {target_key} = {target_value}")
-        else:
-            print(f"   ❌ Could not identify columns, using generic formatting")
-            # Fallback to generic formatting
-            return self._format_generic_sales(result, columns, sheet_name)
-        
-        print(f"   Total formatted: {len(data)} values")
-        return data
-    
-    def _format_employee_performance(self, result, columns, sheet_name):
-        """Format employee performance data"""
-        data = {}
-        for row in result:
-            row_dict = dict(zip(columns, row))
-            employee = str(row_dict.get('EmployeeName', 'Unknown')).strip()
-            sales = row_dict.get('Sales')
-            
-            if sales is not None:
-                data[f"{sheet_name} - {employee}"] = str(sales).strip()
-        
-        return data
-    
-    def _format_metric_value_pairs(self, result, columns, sheet_name):
-        """Format metric-value pair data"""
-        data = {}
-        
-        print(f"🔍 Formatting metric-value pairs for {sheet_name}")
-        print(f"   Columns: {columns}")
-        
-        for row in result:
-            row_dict = dict(zip(columns, row))
-            identifier = str(row_dict.get('Identifier', 'Unknown')).strip()
-            metric = str(row_dict.get('Metric', '')).strip()
-            value = row_dict.get('Excel Value')
-            
-            if value is not None:
-                # Clean the value - remove commas and convert to proper format
-                clean_value = str(value).replace(',', '').strip()
-                
-                # Create key based on metric type
-                if metric.lower() == 'actual sales':
-                    key = f"{sheet_name} - {identifier}"
-                elif metric.lower() == 'target':
-                    key = f"{sheet_name} - {identifier} Target"
-                else:
-                    key = f"{sheet_name} - {identifier} {metric}"
-                
-                data[key] = clean_value
-                print(f"   Added: {key} = {clean_value}")
-        
-        print(f"   Total formatted: {len(data)} values")
-        return data
-    
-    def _format_category_sales(self, result, columns, sheet_name):
-        """Format category sales data"""
-        data = {}
-        for row in result:
-            row_dict = dict(zip(columns, row))
-            category = str(row_dict.get('CategoryName', 'Unknown')).strip()
-            sales = row_dict.get('Sales')
-            
-            if sales is not None:
-                data[f"{sheet_name} - {category}"] = str(sales).strip()
-        
-        return data
-    
-    def _format_generic_sales(self, result, columns, sheet_name):
-        """Format generic sales data with identifier and sales columns"""
-        data = {}
-        
-        print(f"🔍 Formatting generic sales data for {sheet_name}")
-        print(f"   Columns: {columns}")
-        
-        # Try to find identifier and sales columns
-        identifier_col = None
-        sales_col = None
-        target_col = None
-        
-        for col in columns:
-            col_lower = col.lower()
-            if 'identifier' in col_lower:
-                identifier_col = col
-            elif any(x in col_lower for x in ['name', 'store', 'product', 'brand']) and not identifier_col:
-                identifier_col = col
-            elif any(x in col_lower for x in ['actual sales', 'sales', 'actual']):
-                sales_col = col
-            elif 'target' in col_lower:
-                target_col = col
-        
-        print(f"   Identifier column: {identifier_col}")
-        print(f"   Sales column: {sales_col}")
-        print(f"   Target column: {target_col}")
-        
-        if identifier_col and sales_col:
-            for row in result:
-                row_dict = dict(zip(columns, row))
-                identifier = str(row_dict.get(identifier_col, 'Unknown')).strip()
-                sales = row_dict.get(sales_col)
-                
-                if sales is not None:
-                    key = f"{sheet_name} - {identifier}"
-                    data[key] = str(sales).strip()
-                    print(f"   Added: {key} = {sales}")
-                
-                # Handle target data if available
-                if target_col and row_dict.get(target_col) is not None:
-                    target_value = row_dict.get(target_col)
-                    target_key = f"{sheet_name} - {identifier} Target"
-                    data[target_key] = str(target_value).strip()
-                    print(f"   Added: {target_key} = {target_value}")
-        else:
-            print(f"   ❌ Could not identify identifier or sales columns")
-        
-        print(f"   Total formatted: {len(data)} values")
-        return data
-    
-    def _format_generic(self, result, columns, sheet_name):
-        """Generic data formatting (fallback)"""
-        data = {}
-        if result and len(columns) >= 2:
-            for row in result:
-                identifier = str(row[0]).strip() if row[0] else "Unknown"
-                value = str(row[1]).strip() if row[1] is not None else "0"
-                data[f"{sheet_name} - {identifier}"] = value
-        
-        return data
+        """Format SP data based on detected output pattern (see sp_formatters registry)"""
+        return format_sp_data(result, columns, sheet_name, output_pattern)
     
     def dynamic_compare_data(self, excel_path, params, output_path):
         """
@@ -806,8 +398,8 @@ class DynamicComparisonEngine:
             # Use existing comparison logic
             self._perform_comparison(excel_path, db_data, output_path, mappings)
             
-            if os.path.exists(output_path):
-                file_size = os.path.getsize(output_path)
+            if report_exists(output_path):
+                file_size = report_size(output_path)
                 print(f"✅ Dynamic comparison completed!")
                 print(f"📊 Output file: {os.path.basename(output_path)} ({file_size:,} bytes)")
                 return True
@@ -837,8 +429,9 @@ def test_dynamic_engine():
     """Test the dynamic comparison engine"""
     engine = DynamicComparisonEngine()
     
-    # Test with sample parameters
-    params = (2024, None, "717", None, None, None, None)
+    # Test with sample parameters (Love Library drillthrough, store 717)
+    from sp_parameters import drillthrough_params
+    params = drillthrough_params("Love Library")
     excel_path = "sample_widgets.xlsx"  # Replace with actual path
     output_path = "dynamic_comparison_result.xlsx"
     
@@ -1,7 +1,7 @@
 import os
 import time
 import logging
-from openpyxl import Workbook
+from report_writer import ReportWriter
 
 class ErrorHandler:
     """Centralized error handling and reporting"""
@@ -63,69 +63,62 @@ class ErrorHandler:
     def generate_error_report(self, output_path="errors/error_report.xlsx"):
         """Generate comprehensive error report"""
         try:
-            wb = Workbook()
-            
-            # Error sheet
-            if self.errors:
-                ws_errors = wb.active
-                ws_errors.title = "Errors"
-                ws_errors.append(["Timestamp", "Component", "Widget Name", "Error Type", "Error Message", "Screenshot Path"])
+            with ReportWriter(output_path) as report:
+                # Error sheet
+                if self.errors:
+                    report.write_sheet(
+                        "Errors",
+                        ["Timestamp", "Component", "Widget Name", "Error Type", "Error Message", "Screenshot Path"],
+                        ([
+                            error["timestamp"],
+                            error["component"],
+                            error["widget_name"],
+                            error["error_type"],
+                            error["error_message"],
+                            error.get("screenshot_path", "")
+                        ] for error in self.errors)
+                    )
+                
+                # Warning sheet
+                if self.warnings:
+                    report.write_sheet(
+                        "Warnings",
+                        ["Timestamp", "Component", "Widget Name", "Warning Type", "Warning Message"],
+                        ([
+                            warning["timestamp"],
+                            warning["component"],
+                            warning["widget_name"],
+                            warning["warning_type"],
+                            warning["warning_message"]
+                        ] for warning in self.warnings)
+                    )
+                
+                # Summary sheet
+                ws_summary = report.add_sheet("Summary", ["Metric", "Count"])
+                ws_summary.append(["Total Errors", len(self.errors)])
+                ws_summary.append(["Total Warnings", len(self.warnings)])
                 
+                # Error breakdown by component
+                error_by_component = {}
                 for error in self.errors:
-                    ws_errors.append([
-                        error["timestamp"],
-                        error["component"],
-                        error["widget_name"],
-                        error["error_type"],
-                        error["error_message"],
-                        error.get("screenshot_path", "")
-                    ])
-            
-            # Warning sheet
-            if self.warnings:
-                ws_warnings = wb.create_sheet("Warnings")
-                ws_warnings.append(["Timestamp", "Component", "Widget Name", "Warning Type", "Warning Message"])
+                    component = error["component"]
+                    error_by_component[component] = error_by_component.get(component, 0) + 1
+                
+                ws_summary.append([])
+                ws_summary.append(["Errors by Component", ""])
+                for component, count in error_by_component.items():
+                    ws_summary.append([component, count])
                 
+                # Warning breakdown by component
+                warning_by_component = {}
                 for warning in self.warnings:
-                    ws_warnings.append([
-                        warning["timestamp"],
-                        warning["component"],
-                        warning["widget_name"],
-                        warning["warning_type"],
-                        warning["warning_message"]
-                    ])
-            
-            # Summary sheet
-            ws_summary = wb.create_sheet("Summary")
-            ws_summary.append(["Metric", "Count"])
-            ws_summary.append(["Total Errors", len(self.errors)])
-            ws_summary.append(["Total Warnings", len(self.warnings)])
-            
-            # Error breakdown by component
-            error_by_component = {}
-            for error in self.errors:
-                component = error["component"]
-                error_by_component[component] = error_by_component.get(component, 0) + 1
-            
-            ws_summary.append([])
-            ws_summary.append(["Errors by Component", ""])
-            for component, count in error_by_component.items():
-                ws_summary.append([component, count])
-            
-            # Warning breakdown by component
-            warning_by_component = {}
-            for warning in self.warnings:
-                component = warning["component"]
-                warning_by_component[component] = warning_by_component.get(component, 0) + 1
-            
-            ws_summary.append([])
-            ws_summary.append(["Warnings by Component", ""])
-            for component, count in warning_by_component.items():
-                ws_summary.append([component, count])
-            
-            # Save report
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            wb.save(output_path)
+                    component = warning["component"]
+                    warning_by_component[component] = warning_by_component.get(component, 0) + 1
+                
+                ws_summary.append([])
+                ws_summary.append(["Warnings by Component", ""])
+                for component, count in warning_by_component.items():
+                    ws_summary.append([component, count])
             
             print(f"📊 Error report generated: {output_path}")
             print(f"📈 Summary: {len(self.errors)} errors, {len(self.warnings)} warnings")
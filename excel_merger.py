@@ -1,35 +1,80 @@
 import os
+import time
 import pandas as pd
+from config_loader import config_loader
+from xlsx_sheet_copy import merge_first_sheets, unique_sheet_titles
+from sidecar_tables import write_workbook_tables
 
 class ExcelMerger:
     def __init__(self, folder_path):
         self.folder_path = folder_path
 
     @staticmethod
-    def merge_specific_files(file_paths, output_path, one_sheet=True):
+    def merge_specific_files(file_paths, output_path, one_sheet=True, backend=None):
+        """
+        Merge the first sheet of each file into one workbook
+
+        Args:
+            backend: 'zip' (copy worksheet XML parts between the xlsx containers)
+                or 'pandas' (original read_excel/ExcelWriter round trip); defaults to
+                reporting.merge_backend in dynamic_engine_config.yaml. The zip copy
+                falls back to pandas for one_sheet merges or unexpected packages.
+                With reporting.extract_sidecars set, the merged sheets are also
+                written as sidecar tables (<output>_tables/).
+
+        Returns:
+            Throughput stats {'backend', 'sheets', 'bytes', 'seconds'} or None on failure
+        """
         try:
             if not file_paths:
                 print("⚠️ No files to merge.")
                 return
 
-            writer = pd.ExcelWriter(output_path, engine='openpyxl')
+            backend = backend or (config_loader.get_dynamic_engine_config().get("reporting", {}) or {}).get("merge_backend", "zip")
             print(f"📁 Merging files into: {output_path}")
+            start = time.perf_counter()
 
-            for file_path in file_paths:
-                sheet_name = os.path.splitext(os.path.basename(file_path))[0][:31]
-                df = pd.read_excel(file_path)
+            if backend == "zip" and not one_sheet:
+                try:
+                    titles = unique_sheet_titles([os.path.splitext(os.path.basename(f))[0] for f in file_paths])
+                    merge_first_sheets(list(zip(file_paths, titles)), output_path)
+                except Exception as copy_error:
+                    print(f"⚠️ Sheet part copy failed ({copy_error}), merging with pandas instead")
+                    backend = "pandas"
+            elif backend == "zip":
+                backend = "pandas"
 
-                if one_sheet:
-                    df.to_excel(writer, index=False, sheet_name='MergedData')
-                else:
-                    df.to_excel(writer, index=False, sheet_name=sheet_name)
+            if backend == "pandas":
+                ExcelMerger._merge_with_pandas(file_paths, output_path, one_sheet)
 
-            writer.close()
+            write_workbook_tables(output_path)
+
+            elapsed = max(time.perf_counter() - start, 1e-9)
+            total_bytes = sum(os.path.getsize(f) for f in file_paths)
             print(f"✅ Merged file created at: {output_path}")
+            print(f"⚡ Merge throughput ({backend}): {len(file_paths) / elapsed:.1f} sheets/s, "
+                  f"{total_bytes / elapsed / 1024 / 1024:.2f} MB/s ({len(file_paths)} files, {elapsed:.2f}s)")
+            return {'backend': backend, 'sheets': len(file_paths), 'bytes': total_bytes, 'seconds': elapsed}
 
         except Exception as e:
             print(f"❌ Error during merging files: {e}")
 
+    @staticmethod
+    def _merge_with_pandas(file_paths, output_path, one_sheet):
+        """Original implementation: full DataFrame parse and serialize per file"""
+        writer = pd.ExcelWriter(output_path, engine='openpyxl')
+
+        for file_path in file_paths:
+            sheet_name = os.path.splitext(os.path.basename(file_path))[0][:31]
+            df = pd.read_excel(file_path)
+
+            if one_sheet:
+                df.to_excel(writer, index=False, sheet_name='MergedData')
+            else:
+                df.to_excel(writer, index=False, sheet_name=sheet_name)
+
+        writer.close()
+
     def merge_files(self, output_filename):
         """Merge all Excel files in the folder into a single file"""
         try:
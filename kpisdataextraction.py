@@ -2,9 +2,48 @@ from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-from openpyxl import Workbook
+from selenium.common.exceptions import TimeoutException, WebDriverException
+import json
 import os
 import time
+from config_loader import config_loader
+from report_writer import ReportWriter
+from sidecar_tables import extract_table_formats
+
+# Every KPI card's name, value and tooltip in one round trip (JSON, see KPidataextract.read_kpis)
+BULK_KPI_SCRIPT = """
+return JSON.stringify(Array.from(document.getElementsByClassName('kpiCardParent')).map(function (card) {
+    var cardText = card.querySelector('.cardText') || card;
+    var name = cardText.querySelector('.title-label');
+    var value = cardText.querySelector('.kpi-data-value');
+    var tooltip = '';
+    for (var el = name; el && !tooltip; el = el === card ? null : el.parentElement) {
+        tooltip = el.getAttribute('mattooltip') || el.getAttribute('ng-reflect-message') || '';
+    }
+    if (!tooltip) {
+        var tipped = card.querySelector('[mattooltip]');
+        tooltip = tipped ? tipped.getAttribute('mattooltip') : '';
+    }
+    return {
+        name: name ? name.innerText.trim() : null,
+        value: value ? value.innerText.trim() : null,
+        tooltip: tooltip.trim()
+    };
+}));
+"""
+
+
+def _parallel_config():
+    return config_loader.get_dynamic_engine_config().get("performance", {}).get("parallel_processing", {})
+
+
+def bulk_kpi_extraction_enabled():
+    return bool(_parallel_config().get("bulk_kpi_extraction", True))
+
+
+def kpi_tooltip_check_enabled():
+    return bool(_parallel_config().get("kpi_tooltip_check", False))
+
 
 class KPidataextract:
     def __init__(self, driver, kpi_dir):
@@ -13,11 +52,46 @@ class KPidataextract:
         self.download_dir = kpi_dir
         self.action = ActionChains(driver)
 
+    def read_kpis(self, timeout=10):
+        """Read every KPI card with a single script call
+
+        Polls (one script call per 0.1s) until every card shows a name and a value,
+        instead of sleeping a fixed 2s; returns what is there after timeout.
+
+        Returns:
+            [{'name', 'value', 'tooltip'}] in page order ('tooltip' is the mattooltip attribute)
+        """
+        cards = []
+
+        def all_rendered(driver):
+            nonlocal cards
+            cards = json.loads(driver.execute_script(BULK_KPI_SCRIPT))
+            return bool(cards) and all(card['name'] and card['value'] for card in cards)
+
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(all_rendered)
+        except TimeoutException:
+            print(f"⚠️ KPI cards still incomplete after {timeout}s; using what rendered")
+        return [card for card in cards if card['name']]
+
     def kpidata(self, custom_filename="kpi_data.xlsx"):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = 'kpi_data'
-        ws.append(["kpi name", "kpi_dashboard_value"]) 
+        # Extracted KPIs also go to kpi_data_tables/ when reporting.extract_sidecars is set
+        excel_path = os.path.join(self.download_dir, custom_filename)
+        report = ReportWriter(excel_path, backend="openpyxl", sidecars=extract_table_formats(), xlsx=True)
+        ws = report.add_sheet('kpi_data')
+        ws.append(["kpi name", "kpi_dashboard_value"])
+
+        if bulk_kpi_extraction_enabled():
+            # One script call for all cards; hover checks run separately (verify_tooltips)
+            start = time.time()
+            kpis = self.read_kpis()
+            for kpi in kpis:
+                print(f"{kpi['name']} | {kpi['value']} | Tooltip: {kpi['tooltip'] or '❌ Not set'}")
+                ws.append([kpi['name'], kpi['value'] or ""])
+            print(f"⚡ {len(kpis)} KPIs read in {(time.time() - start) * 1000:.0f}ms")
+            report.save()
+            print(f"\n✅ KPI data saved to: {excel_path}")
+            return
 
         kpis = self.wait.until(EC.presence_of_all_elements_located((By.CLASS_NAME, 'kpiCardParent')))
         time.sleep(2)
@@ -51,8 +125,56 @@ class KPidataextract:
                 print(f"❌ Error with KPI: {e}")
 
         # Save Excel
-        excel_path = os.path.join(self.download_dir, custom_filename)
-        os.makedirs(os.path.dirname(excel_path), exist_ok=True)  
-        wb.save(excel_path)
+        report.save()
         print(f"\n✅ KPI data saved to: {excel_path}")
 
+    def verify_tooltips(self, hover_wait=3):
+        """Hover each KPI title and check the tooltip that appears against its mattooltip attribute
+
+        The slow part of the old per-card extraction, kept as a separately scheduled check.
+
+        A tooltip that never appears fails its check; a WebDriver error while
+        hovering (stale card, lost session) is reported as an error instead.
+        After each hover the previous card's tooltip has to disappear first, so
+        its text is never read as the next card's.
+
+        Returns:
+            {kpi name: (ok, tooltip text shown)}
+        """
+        expected = {kpi['name']: kpi['tooltip'] for kpi in self.read_kpis(timeout=5)}
+        results = {}
+        errors = []
+        previous = None  # Tooltip shown for the card hovered before
+        for title in self.driver.find_elements(By.CSS_SELECTOR, ".kpiCardParent .cardText .title-label"):
+            name = title.text.strip()
+            shown = ""
+            try:
+                self.action.move_to_element(title).perform()
+                wait = WebDriverWait(self.driver, hover_wait, poll_frequency=0.1)
+                if previous is not None:
+                    # Leaving the previous title hides its tooltip (detached, so stale, or invisible)
+                    try:
+                        wait.until(EC.invisibility_of_element(previous))
+                    except TimeoutException:
+                        print(f"⚠️ Tooltip check {name}: previous tooltip still shown after {hover_wait}s")
+                        results[name] = (False, shown)
+                        continue
+                    previous = None
+                tooltip = wait.until(EC.visibility_of_element_located((By.CLASS_NAME, "mat-tooltip")))
+                shown = tooltip.text.strip()
+                previous = tooltip
+            except TimeoutException:
+                pass
+            except WebDriverException as e:
+                print(f"❌ Tooltip check {name}: hover failed: {e.msg or e}")
+                results[name] = (False, shown)
+                errors.append(name)
+                continue
+            ok = bool(shown) and (not expected.get(name) or shown == expected[name])
+            results[name] = (ok, shown)
+            print(f"{'✅' if ok else '⚠️'} Tooltip check {name}: {shown or 'no tooltip shown'}")
+        failed = [name for name, (ok, _) in results.items() if not ok and name not in errors]
+        print(f"🔎 KPI tooltips: {len(results) - len(failed) - len(errors)}/{len(results)} OK"
+              + (f"; failed: {failed}" if failed else "")
+              + (f"; errors: {errors}" if errors else ""))
+        return results
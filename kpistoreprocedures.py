@@ -1,8 +1,13 @@
 from openpyxl import load_workbook, Workbook
 import os
+import time
 from dataBase import DatabaseConnector
 from dotenv import load_dotenv
 from config_loader import config_loader
+from comparison_summary import is_summary_path, write_kpi_summary
+from report_writer import ReportWriter
+from virtual_workbook import open_workbook
+from sp_batch import execute_sp
 
 load_dotenv()
 
@@ -49,7 +54,7 @@ print(f"📊 Loaded {len(LANDING_SP_MAP)} landing KPI procedures from YAML")
 print(f"🎯 Loaded {len(DRILLTHROUGH_SP_MAP)} drillthrough KPI procedures from YAML")
 
 def read_kpi_from_excel(filepath):
-    wb = load_workbook(filepath)
+    wb = open_workbook(filepath)
     ws = wb.active
     kpi_dict = {}
     for row in ws.iter_rows(min_row=2, values_only=True):  # Skip header
@@ -57,6 +62,36 @@ def read_kpi_from_excel(filepath):
         kpi_dict[kpi_name.strip()] = str(kpi_value).strip()
     return kpi_dict
 
+def kpi_sp_calls(is_drillthrough=False, extra_params=None):
+    """
+    The stored procedure calls behind one KPI comparison
+
+    Returns:
+        [(kpi_label, proc_name, params, exec_string)]; params is the
+        (name, value) tuple identifying the call for batching
+    """
+    # Choose map based on drillthrough
+    sp_map = DRILLTHROUGH_SP_MAP if is_drillthrough else LANDING_SP_MAP
+    base_params = LANDING_PARAMS.copy()
+
+    if is_drillthrough:
+        # Add extra drillthrough param like Store
+        base_params.update(extra_params or {})
+
+    # Build EXEC string
+    param_list = []
+    for key, value in base_params.items():
+        if value is None:
+            param_list.append(f"@{key}=NULL")
+        elif isinstance(value, str):
+            param_list.append(f"@{key}='{value}'")
+        else:
+            param_list.append(f"@{key}={value}")
+
+    params = tuple(base_params.items())
+    return [(kpi_label, proc_name, params, f"EXEC {proc_name} " + ", ".join(param_list))
+            for kpi_label, proc_name in sp_map.items()]
+
 class Data:
     def __init__(self, is_drillthrough=False, extra_params=None):
         self.cursor = conn.cursor()
@@ -66,31 +101,13 @@ class Data:
     def fetch_db_kpi_values(self):
         db_kpi_data = {}
 
-        # Choose map based on drillthrough
-        sp_map = DRILLTHROUGH_SP_MAP if self.is_drillthrough else LANDING_SP_MAP
-        base_params = LANDING_PARAMS.copy()
-
-        if self.is_drillthrough:
-            # Add extra drillthrough param like Store
-            base_params.update(self.extra_params)
-
-        for kpi_label, proc_name in sp_map.items():
-            # Build EXEC string
-            param_list = []
-            for key, value in base_params.items():
-                if value is None:
-                    param_list.append(f"@{key}=NULL")
-                elif isinstance(value, str):
-                    param_list.append(f"@{key}='{value}'")
-                else:
-                    param_list.append(f"@{key}={value}")
-
-            exec_string = f"EXEC {proc_name} " + ", ".join(param_list)
+        for kpi_label, proc_name, params, exec_string in kpi_sp_calls(self.is_drillthrough, self.extra_params):
             print(f"🧪 Executing: {exec_string}")
 
             try:
-                self.cursor.execute(exec_string)
-                result = self.cursor.fetchone()
+                # Coalesced with other KPI comparisons of the same batch (e.g. shared DR_* procedures)
+                _, rows = execute_sp(self.cursor, proc_name, params, sql=exec_string, sql_params=())
+                result = rows[0] if rows else None
                 if result and len(result) >= 1:
                     db_kpi_data[kpi_label.strip()] = str(result[0]).strip()
                     print(f"✅ {kpi_label}: {str(result[0]).strip()}")
@@ -112,12 +129,9 @@ def compare_kpi_data(excel_data, db_data, output_path):
     def normalize_key(key):
         return key.strip().lower().replace(".", "").replace("  ", " ")
 
+    start = time.perf_counter()
     normalized_db_data = {normalize_key(k): v for k, v in db_data.items()}
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "KPI Comparison"
-    ws.append(["KPI Name", "Excel Value", "DB Value", "Status", "Notes"])
+    rows = []
 
     matches = 0
     mismatches = 0
@@ -151,7 +165,7 @@ def compare_kpi_data(excel_data, db_data, output_path):
             notes = "Values do not match"
             mismatches += 1
         
-        ws.append([kpi_name, excel_value, db_value, status, notes])
+        rows.append([kpi_name, excel_value, db_value, status, notes])
         
         # Color-coded console output
         if status == "Match":
@@ -161,17 +175,22 @@ def compare_kpi_data(excel_data, db_data, output_path):
         else:
             print(f"❌ {kpi_name} -> Excel: {excel_value} | DB: {db_value} => {status}")
 
-    # Add summary sheet
-    ws_summary = wb.create_sheet("Summary")
-    ws_summary.append(["Metric", "Count"])
-    ws_summary.append(["Total KPIs", len(excel_data)])
-    ws_summary.append(["Matches", matches])
-    ws_summary.append(["Mismatches", mismatches])
-    ws_summary.append(["No SP Mapping", not_found])
-    ws_summary.append(["SP Errors", sp_errors])
-    ws_summary.append(["Success Rate", f"{(matches/(len(excel_data)))*100:.1f}%" if excel_data else "0%"])
-
-    wb.save(output_path)
+    # Gating runs: compact JSON verdict instead of a workbook
+    if is_summary_path(output_path):
+        return write_kpi_summary(output_path, rows, time.perf_counter() - start)
+
+    with ReportWriter(output_path) as report:
+        report.write_sheet("KPI Comparison", ["KPI Name", "Excel Value", "DB Value", "Status", "Notes"], rows)
+
+        # Add summary sheet
+        report.write_sheet("Summary", ["Metric", "Count"], [
+            ["Total KPIs", len(excel_data)],
+            ["Matches", matches],
+            ["Mismatches", mismatches],
+            ["No SP Mapping", not_found],
+            ["SP Errors", sp_errors],
+            ["Success Rate", f"{(matches/(len(excel_data)))*100:.1f}%" if excel_data else "0%"]
+        ])
     
     print(f"\n📊 KPI Comparison Summary:")
     print(f"  ✅ Matches: {matches}")
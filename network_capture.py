@@ -0,0 +1,352 @@
+"""
+WIDGET DATA FROM NETWORK RESPONSES
+==================================
+The dashboard's Angular app fetches every widget's data as JSON over XHR
+before drawing it. In network-capture mode that JSON is recorded while the
+page renders (Chrome DevTools Protocol Network.requestWillBeSent /
+responseReceived / loadingFinished, bodies via Network.getResponseBody)
+and turned into the same one-sheet widget workbook the Download menu
+item produces, so the widget menu, the Download click and the download
+wait are skipped altogether.
+
+A widget whose payload was not captured (or could not be turned into a
+table) still goes through the Download menu. With cross_check on, every
+widget is downloaded as usual and the captured table is compared with the
+Excel export instead of replacing it.
+
+    capture = NetworkCapture.start_for(driver)   # before the dashboard renders
+    ...
+    capture = NetworkCapture.active(driver)
+    if capture and capture.settle():
+        path = capture.write_widget_workbook("Top Stores by Sales", out_dir)
+
+Configured under performance.parallel_processing.network_capture in
+dynamic_engine_config.yaml (enabled, cross_check, url_patterns, widgets,
+headers). Needs websocket-client and a driver exposing its DevTools
+address, like the download events in download_routing.py.
+"""
+
+import base64
+import json
+import os
+import re
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from openpyxl import Workbook
+
+from config_loader import config_loader
+from download_routing import DevToolsConnection, safe_key
+from sheet_comparison import list_sheet_names, normalize, read_sheet_values, safe_round
+
+NETWORK_DIR_NAME = ".network"
+
+# Keys whose string value names the widget a payload belongs to
+TITLE_KEYS = ("title", "name", "widgetName", "widgetTitle", "chartTitle", "widget")
+# Keys holding a table's column definitions / row values
+COLUMN_KEYS = ("columns", "headers", "fields")
+ROW_KEYS = ("rows", "data", "values", "records", "items", "result")
+
+
+def network_capture_config() -> Dict[str, Any]:
+    parallel_config = config_loader.get_dynamic_engine_config().get("performance", {}).get("parallel_processing", {})
+    return parallel_config.get("network_capture") or {}
+
+
+def network_capture_enabled() -> bool:
+    return bool(network_capture_config().get("enabled", False))
+
+
+def field_label(key: str, headers: Optional[Dict[str, str]] = None) -> str:
+    """Column header for a JSON field: configured name, else "actualSales"/"actual_sales" -> "Actual Sales\""""
+    if headers and key in headers:
+        return headers[key]
+    words = re.sub(r'(?<=[a-z0-9])(?=[A-Z])', ' ', str(key)).replace("_", " ").split()
+    return " ".join(word[:1].upper() + word[1:] for word in words)
+
+
+def _column_name(column) -> str:
+    if isinstance(column, dict):
+        for key in ("label", "title", "header", "displayName", "name", "field", "key"):
+            if column.get(key):
+                return str(column[key])
+    return str(column)
+
+
+def _column_field(column):
+    if isinstance(column, dict):
+        for key in ("field", "key", "name", "dataField"):
+            if column.get(key):
+                return column[key]
+    return column
+
+
+def payload_table(payload, headers: Optional[Dict[str, str]] = None) -> Optional[Tuple[List[str], List[list]]]:
+    """
+    Find the widget table in a JSON payload
+
+    Understands a list of records ([{field: value}, ...]), a columns + rows pair
+    ({"columns": [...], "rows": [[...], ...]}), and either of them nested in
+    wrapper objects ({"data": {"result": [...]}}); the first table found wins.
+
+    Returns:
+        (headers, rows), or None when the payload holds no table
+    """
+    pending = [payload]
+    while pending:
+        node = pending.pop(0)
+        if isinstance(node, list) and node and all(isinstance(item, dict) for item in node):
+            fields = []
+            for record in node:
+                fields.extend(key for key in record if key not in fields)
+            if all(not isinstance(record.get(field), (dict, list)) for record in node for field in fields):
+                return [field_label(f, headers) for f in fields], [[record.get(f) for f in fields] for record in node]
+        if isinstance(node, dict):
+            columns = next((node[key] for key in COLUMN_KEYS if isinstance(node.get(key), list)), None)
+            rows = next((node[key] for key in ROW_KEYS if isinstance(node.get(key), list)), None)
+            if columns and rows is not None:
+                if all(isinstance(row, (list, tuple)) for row in rows):
+                    return [_column_name(c) for c in columns], [list(row) for row in rows]
+                if all(isinstance(row, dict) for row in rows):
+                    fields = [_column_field(c) for c in columns]
+                    return [_column_name(c) for c in columns], [[row.get(f) for f in fields] for row in rows]
+            pending.extend(value for value in node.values() if isinstance(value, (dict, list)))
+        elif isinstance(node, list):
+            pending.extend(item for item in node if isinstance(item, (dict, list)))
+    return None
+
+
+def _names_widget(payload, title_key: str) -> bool:
+    """Whether a payload carries the widget's title in one of its top-level TITLE_KEYS"""
+    if isinstance(payload, dict):
+        for key in TITLE_KEYS:
+            if isinstance(payload.get(key), str) and normalize(payload[key]) == title_key:
+                return True
+    return False
+
+
+def cross_check(headers: List[str], rows: List[list], excel_path: str, max_differences: int = 20) -> List[str]:
+    """
+    Compare a captured table with the widget's Excel export (first sheet)
+
+    Columns are aligned by header name; values compare after safe_round, so
+    "1,234.5" and 1234.5 are equal.
+
+    Returns:
+        Descriptions of the differences found (empty when the tables agree)
+    """
+    excel_headers, excel_rows = read_sheet_values(excel_path, list_sheet_names(excel_path)[0])
+    captured = {normalize(h): i for i, h in enumerate(headers)}
+    exported = {normalize(h): i for i, h in enumerate(excel_headers) if h}
+    differences = [f"column '{excel_headers[i]}' only in the Excel export" for h, i in exported.items() if h not in captured]
+    differences += [f"column '{headers[i]}' only in the network response" for h, i in captured.items() if h not in exported]
+    if len(rows) != len(excel_rows):
+        differences.append(f"{len(rows)} rows captured, {len(excel_rows)} exported")
+
+    shared = [h for h in exported if h in captured]
+    for index, (row, excel_row) in enumerate(zip(rows, excel_rows), start=1):
+        for header in shared:
+            value, excel_value = row[captured[header]], excel_row[exported[header]]
+            if safe_round(value) != safe_round(excel_value) and str(value).strip() != str(excel_value).strip():
+                differences.append(f"row {index} '{excel_headers[exported[header]]}': "
+                                   f"{value!r} captured, {excel_value!r} exported")
+                if len(differences) >= max_differences:
+                    return differences
+    return differences
+
+
+class NetworkCapture:
+    """Records the JSON responses of one browser session's page and maps them to widgets"""
+
+    _by_driver = weakref.WeakKeyDictionary()
+    _by_driver_lock = threading.Lock()
+
+    def __init__(self, driver, config: Optional[Dict[str, Any]] = None):
+        config = network_capture_config() if config is None else config
+        self.driver = driver
+        self.cross_check = bool(config.get("cross_check", False))
+        self.url_patterns: List[str] = list(config.get("url_patterns") or [])
+        self.widget_urls: Dict[str, str] = {normalize(k): v for k, v in (config.get("widgets") or {}).items()}
+        self.headers: Dict[str, str] = dict(config.get("headers") or {})
+        self.responses: List[Dict[str, Any]] = []
+        self.connection: Optional[DevToolsConnection] = None
+        self._session_id = None
+        self._requests: Dict[str, Dict[str, Any]] = {}  # requestId -> url, post_data, mime_type
+        self._sequence = 0
+        self._changed = threading.Condition()
+        self._bodies = ThreadPoolExecutor(max_workers=1, thread_name_prefix="network-capture")
+
+    @classmethod
+    def start_for(cls, driver) -> Optional["NetworkCapture"]:
+        """Start recording the driver's page (once per driver); None when disabled or unavailable"""
+        if not network_capture_enabled():
+            return None
+        with cls._by_driver_lock:
+            capture = cls._by_driver.get(driver)
+            if capture is None:
+                capture = cls(driver)
+                if not capture.start():
+                    return None
+                cls._by_driver[driver] = capture
+            return capture
+
+    @classmethod
+    def active(cls, driver) -> Optional["NetworkCapture"]:
+        """The driver's running capture, if start_for() succeeded for it"""
+        with cls._by_driver_lock:
+            return cls._by_driver.get(driver)
+
+    def start(self) -> bool:
+        self.connection = DevToolsConnection.open(self.driver, self._on_event)
+        if self.connection is None:
+            print("⚠️ Network capture unavailable; widgets are downloaded through the menu")
+            return False
+        try:
+            targets = self.connection.send("Target.getTargets")["targetInfos"]
+            pages = [t for t in targets if t.get("type") == "page"]
+            # chromedriver window handles are DevTools target ids
+            handle = self.driver.current_window_handle
+            target = next((t for t in pages if t["targetId"] == handle), pages[0])
+            self._session_id = self.connection.send(
+                "Target.attachToTarget", {"targetId": target["targetId"], "flatten": True})["sessionId"]
+            self.connection.send("Network.enable", {"maxResourceBufferSize": 16 * 1024 * 1024,
+                                                    "maxTotalBufferSize": 128 * 1024 * 1024},
+                                 session_id=self._session_id)
+        except Exception as e:
+            print(f"⚠️ Network capture could not attach to the page: {e}")
+            self.close()
+            return False
+        print("📡 Network capture recording widget responses")
+        return True
+
+    def mark(self) -> int:
+        """Position in the response log; pass as since= to only match later responses (a new page)"""
+        with self._changed:
+            return self._sequence
+
+    # Network events (DevTools reader thread)
+
+    def _on_event(self, method: str, params: Dict):
+        if method == "Network.requestWillBeSent":
+            request = params.get("request", {})
+            url = request.get("url", "")
+            if params.get("type") in ("XHR", "Fetch") and (
+                    not self.url_patterns or any(pattern in url for pattern in self.url_patterns)):
+                with self._changed:
+                    self._requests[params["requestId"]] = {'url': url, 'post_data': request.get("postData") or "",
+                                                           'mime_type': ""}
+        elif method == "Network.responseReceived":
+            with self._changed:
+                record = self._requests.get(params["requestId"])
+                if record is not None:
+                    record['mime_type'] = params.get("response", {}).get("mimeType", "")
+        elif method == "Network.loadingFinished":
+            with self._changed:
+                record = self._requests.get(params["requestId"])
+            if record is not None:
+                # Commands cannot be awaited on the reader thread that delivers their results
+                self._bodies.submit(self._fetch_body, params["requestId"], record)
+        elif method == "Network.loadingFailed":
+            with self._changed:
+                if self._requests.pop(params["requestId"], None) is not None:
+                    self._changed.notify_all()
+
+    def _fetch_body(self, request_id: str, record: Dict[str, Any]):
+        try:
+            if "json" in record['mime_type']:
+                body = self.connection.send("Network.getResponseBody", {"requestId": request_id},
+                                            session_id=self._session_id)
+                text = base64.b64decode(body["body"]).decode("utf-8") if body.get("base64Encoded") else body["body"]
+                payload = json.loads(text)
+                with self._changed:
+                    self._sequence += 1
+                    self.responses.append({'sequence': self._sequence, 'url': record['url'],
+                                           'post_data': record['post_data'], 'payload': payload})
+        except Exception as e:
+            print(f"⚠️ Could not read response of {record['url']}: {e}")
+        finally:
+            with self._changed:
+                self._requests.pop(request_id, None)
+                self._changed.notify_all()
+
+    # Widget tables
+
+    def settle(self, max_wait: float = 5) -> bool:
+        """Wait until no recorded request is still loading; True if the page went quiet in time"""
+        with self._changed:
+            return self._changed.wait_for(lambda: not self._requests, timeout=max_wait)
+
+    def payload_for(self, title: str, since: int = 0):
+        """Newest captured payload belonging to the widget (configured URL, title in the request, or in the payload)"""
+        title_key = normalize(title)
+        url_fragment = self.widget_urls.get(title_key)
+        with self._changed:
+            responses = [r for r in self.responses if r['sequence'] > since]
+        for response in reversed(responses):
+            if url_fragment is not None:
+                if url_fragment in response['url']:
+                    return response['payload']
+            elif (title_key in normalize(response['url']) or title_key in normalize(response['post_data'])
+                  or _names_widget(response['payload'], title_key)):
+                return response['payload']
+        return None
+
+    def table_for(self, title: str, since: int = 0) -> Optional[Tuple[List[str], List[list]]]:
+        payload = self.payload_for(title, since)
+        return payload_table(payload, self.headers) if payload is not None else None
+
+    def write_widget_workbook(self, title: str, directory: str, since: int = 0) -> Optional[str]:
+        """
+        Write the widget's captured table as the one-sheet workbook its Download would produce
+
+        Returns:
+            The workbook path, or None when nothing usable was captured for the widget
+        """
+        table = self.table_for(title, since)
+        if table is None:
+            return None
+        headers, rows = table
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"Sales Summary_{safe_key(title.replace('/', '_'))}.xlsx")
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(re.sub(r'[\[\]:*?/\\]', '_', title)[:31] or "Sheet1")
+        ws.append(headers)
+        for row in rows:
+            ws.append(row)
+        wb.save(path)
+        print(f"📡 {title}: {len(rows)} rows from the network response")
+        return path
+
+    def check_export(self, title: str, excel_path: str, since: int = 0) -> Optional[List[str]]:
+        """
+        Cross-check the widget's captured table against its downloaded Excel export
+
+        Returns:
+            The differences (empty list = identical), or None when nothing was captured
+        """
+        table = self.table_for(title, since)
+        if table is None:
+            print(f"⚠️ Cross-check: no network response captured for {title}")
+            return None
+        try:
+            differences = cross_check(*table, excel_path)
+        except Exception as e:
+            print(f"⚠️ Cross-check failed for {title}: {e}")
+            return None
+        if differences:
+            print(f"⚠️ Cross-check: {title} differs from its Excel export ({len(differences)} differences)")
+            for difference in differences[:5]:
+                print(f"   • {difference}")
+        else:
+            print(f"✅ Cross-check: {title} network response matches its Excel export")
+        return differences
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+        self._bodies.shutdown(wait=False)
+        with self._by_driver_lock:
+            if self._by_driver.get(self.driver) is self:
+                del self._by_driver[self.driver]
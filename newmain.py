@@ -1,26 +1,20 @@
 import os
 import time
+import asyncio
+import functools
 import logging
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import WebDriverException, TimeoutException
 from login import Authenticator
 from dashboardSelection import DashboardManager
-from kpisdataextraction import KPidataextract
+from kpisdataextraction import KPidataextract, kpi_tooltip_check_enabled
 from widgetsdataextract import WidgetExtractor
-from excel_merger import ExcelMerger
-from kpistoreprocedures import Data, compare_kpi_data, read_kpi_from_excel
+from virtual_workbook import run_scheduled_archives
 from filters import FilterAutomation
-from drillthrough_db_handler import DrillthroughDBHandler
+from network_capture import NetworkCapture
 from error_handler import error_handler
-from widgetstoreprocedures import (
-    read_widget_values,
-    fetch_db_widget_values,
-    compare_widget_data,
-    normalize,
-    widget_sp_map
-)
-# Basic imports only
+# Basic imports only: comparison modules (and their DB connections) load when first needed
 
 # Configure logging with UTF-8 encoding
 logging.basicConfig(
@@ -158,8 +152,8 @@ def setup_selenium_fallback(download_dir):
         logging.error(f"Failed to initialize Chrome driver: {str(e)}")
         raise
 
-def process_kpis(driver, kpi_dir):
-    """Process KPI extraction and submit comparison to background"""
+def extract_kpis(driver, kpi_dir):
+    """Extract the landing page KPIs; returns the KPI workbook path (None if it was not written)"""
     try:
         logging.info("🔍 Starting KPI processing...")
         
@@ -167,37 +161,58 @@ def process_kpis(driver, kpi_dir):
         kpi_extractor = KPidataextract(driver, kpi_dir)
         kpi_extractor.kpidata()
         logging.info("✅ KPI data extraction completed")
-
-        # Submit KPI comparison to background processing
-        excel_kpi_path = os.path.join(kpi_dir, "kpi_data.xlsx")
-        
-        if os.path.exists(excel_kpi_path):
-            try:
-                from background_processor import submit_kpi_comparison_bg
-                
-                comparison_report_path = os.path.join(kpi_dir, "landing_kpi_comparison_report.xlsx")
-                task_id = submit_kpi_comparison_bg(excel_kpi_path, comparison_report_path)
-                
-                logging.info(f"✅ KPI comparison submitted to background (ID: {task_id})")
-                print("✅ KPI comparison submitted to background - continuing with widgets...")
-                
-            except Exception as kpi_comp_error:
-                error_handler.log_error("KPI Comparison", "Landing Page", "Background Submission", str(kpi_comp_error))
-                logging.error(f"❌ KPI background submission failed: {str(kpi_comp_error)}")
-                print(f"❌ KPI background submission failed: {str(kpi_comp_error)}")
-                # Continue with workflow
-        else:
-            error_handler.log_warning("KPI Processing", "Landing Page", "File Not Found", f"KPI Excel file not found: {excel_kpi_path}")
-            logging.warning(f"❌ KPI Excel file not found: {excel_kpi_path}")
-            print("❌ KPI Excel file not found")
-            
     except Exception as e:
         error_handler.log_error("KPI Processing", "Landing Page", "General Error", str(e))
         logging.error(f"❌ Error in KPI processing: {str(e)}")
         print(f"❌ KPI Processing Error: {str(e)}")
-        # Continue with workflow
+        return None  # Continue with workflow
 
-def process_landing_widgets(driver, widget_dir):
+    excel_kpi_path = os.path.join(kpi_dir, "kpi_data.xlsx")
+    if not os.path.exists(excel_kpi_path):
+        error_handler.log_warning("KPI Processing", "Landing Page", "File Not Found", f"KPI Excel file not found: {excel_kpi_path}")
+        logging.warning(f"❌ KPI Excel file not found: {excel_kpi_path}")
+        print("❌ KPI Excel file not found")
+        return None
+    return excel_kpi_path
+
+def check_kpi_tooltips(driver, kpi_dir):
+    """Hover-check the landing KPI tooltips when performance.parallel_processing.kpi_tooltip_check is set"""
+    if not kpi_tooltip_check_enabled():
+        return None
+    return KPidataextract(driver, kpi_dir).verify_tooltips()
+
+def fetch_landing_kpis_from_db():
+    """Fetch the landing page KPI values from the database (needs no browser, so it overlaps extraction)"""
+    from kpistoreprocedures import Data
+    return Data().fetch_db_kpi_values()
+
+async def compare_kpis(kpi_excel, db_kpis, kpi_dir):
+    """Submit the KPI comparison to background processing and await its result"""
+    if not kpi_excel:
+        return None
+    try:
+        from background_processor import submit_kpi_comparison_bg, current_background_processor
+        
+        comparison_report_path = os.path.join(kpi_dir, "landing_kpi_comparison_report.xlsx")
+        # db_kpis is None when the prefetch failed: the comparison then fetches them itself.
+        # Submitting can block under queue backpressure, so it runs off the event loop
+        task_id = await asyncio.to_thread(submit_kpi_comparison_bg, kpi_excel, comparison_report_path, db_kpis=db_kpis)
+        
+        logging.info(f"✅ KPI comparison submitted to background (ID: {task_id})")
+        print("✅ KPI comparison submitted to background - continuing with widgets...")
+        
+    except Exception as kpi_comp_error:
+        error_handler.log_error("KPI Comparison", "Landing Page", "Background Submission", str(kpi_comp_error))
+        logging.error(f"❌ KPI background submission failed: {str(kpi_comp_error)}")
+        print(f"❌ KPI background submission failed: {str(kpi_comp_error)}")
+        return None
+
+    # Awaited on the event loop (no thread held); makes the comparison visible on the critical path.
+    # Shielded: timing out must not cancel the processor's shared Future
+    future = current_background_processor().get_future(task_id)
+    return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=300)
+
+def process_landing_widgets(driver, widget_dir, shard_pool=None):
     """Process landing page widgets with error handling"""
     try:
         logging.info("🧩 Starting landing page widget processing...")
@@ -205,7 +220,7 @@ def process_landing_widgets(driver, widget_dir):
         
         # Extract Widget Data (includes landing page comparison)
         print("🔄 Creating WidgetExtractor...")
-        widget_extractor = WidgetExtractor(driver)
+        widget_extractor = WidgetExtractor(driver, shard_pool)
         
         print("🔄 Calling widgetdata()...")
         result = widget_extractor.widgetdata()
@@ -224,53 +239,282 @@ def process_landing_widgets(driver, widget_dir):
         print(f"❌ Traceback: {traceback.format_exc()}")
         return False
 
-def process_drillthrough_widgets(driver, drill_targets):
-    """Process drillthrough for each widget with error handling"""
-    drillthrough_handler = DrillthroughDBHandler()
-    
-    for widget_title in drill_targets:
-        try:
-            logging.info(f"🔄 Starting drillthrough for: {widget_title}")
-            print(f"🔄 Processing drillthrough for: {widget_title}")
-            
-            # Simple drillthrough processing
-            
-            # Import here to avoid circular imports
-            from widget_components.drillthrough_handler import DrillthroughHandler
-            drill_handler = DrillthroughHandler(driver)
-            
-            # Perform drillthrough with retry logic
-            max_retries = 2
-            success = False
+def drillthrough_widget_with_retry(driver, widget_title, download_dir=None):
+    """Drill through one widget (retried once); errors are logged, not raised"""
+    try:
+        logging.info(f"🔄 Starting drillthrough for: {widget_title}")
+        print(f"🔄 Processing drillthrough for: {widget_title}")
+        
+        # Simple drillthrough processing
+        
+        # Import here to avoid circular imports
+        from widget_components.drillthrough_handler import DrillthroughHandler
+        drill_handler = DrillthroughHandler(driver, download_dir)
+        
+        # Perform drillthrough with retry logic
+        max_retries = 2
+        success = False
+        
+        for retry in range(max_retries):
+            try:
+                drill_handler.drillthrough_widget(widget_title)
+                success = True
+                break
+            except Exception as drill_error:
+                print(f"❌ Drillthrough attempt {retry + 1} failed: {str(drill_error)}")
+                if retry < max_retries - 1:
+                    print("🔄 Retrying drillthrough...")
+                    time.sleep(2)
+                else:
+                    raise drill_error
+        
+        if success:
+            # Get the submenu text for database comparison
+            from widget_components.drillthrough_handler import DRILLTHROUGH_MAP
+            submenu_text = DRILLTHROUGH_MAP.get(widget_title, widget_title.split()[-1])
             
-            for retry in range(max_retries):
-                try:
-                    drill_handler.drillthrough_widget(widget_title)
-                    success = True
-                    break
-                except Exception as drill_error:
-                    print(f"❌ Drillthrough attempt {retry + 1} failed: {str(drill_error)}")
-                    if retry < max_retries - 1:
-                        print("🔄 Retrying drillthrough...")
-                        time.sleep(2)
-                    else:
-                        raise drill_error
+            # Drillthrough comparison is handled automatically by the background processor
+            # in the drillthrough_handler.py (step 4), so no additional comparison needed here
             
-            if success:
-                # Get the submenu text for database comparison
-                from widget_components.drillthrough_handler import DRILLTHROUGH_MAP
-                submenu_text = DRILLTHROUGH_MAP.get(widget_title, widget_title.split()[-1])
-                
-                # Drillthrough comparison is handled automatically by the background processor
-                # in the drillthrough_handler.py (step 4), so no additional comparison needed here
-                
-                logging.info(f"✅ Drillthrough completed for: {widget_title}")
-                print(f"✅ Drillthrough completed for: {widget_title}")
+            logging.info(f"✅ Drillthrough completed for: {widget_title}")
+            print(f"✅ Drillthrough completed for: {widget_title}")
+        
+    except Exception as e:
+        logging.error(f"❌ Error in drillthrough for {widget_title}: {str(e)}")
+        print(f"❌ Drillthrough Error for {widget_title}: {str(e)}")
+        # Continue with next widget
+
+def process_drillthrough_widgets(driver, drill_targets, shard_pool=None):
+    """Process drillthrough for each widget with error handling, over the shard pool's sessions if given"""
+    if not drill_targets:
+        return
+
+    if shard_pool is not None and shard_pool.size > 1:
+        shard_pool.run(driver, drill_targets,
+                       lambda session_driver, download_dir, widget_title:
+                       drillthrough_widget_with_retry(session_driver, widget_title, download_dir))
+        return
+
+    for widget_title in drill_targets:
+        drillthrough_widget_with_retry(driver, widget_title)
+
+def login_to_dashboard(driver):
+    """Log in; raises so that every stage needing the session is skipped"""
+    try:
+        login = Authenticator(driver)
+        login.login()
+        logging.info("✅ Login completed successfully")
+        print("✅ Login successful")
+    except Exception as e:
+        logging.error(f"❌ Login failed: {str(e)}")
+        print(f"❌ Login failed: {str(e)}")
+        raise
+    return True
+
+def select_dashboard(driver):
+    """Open the Sales Summary dashboard; raises so that the dashboard stages are skipped"""
+    try:
+        # Network-capture mode records the widgets' data responses from the first render on
+        NetworkCapture.start_for(driver)
+        dashboard = DashboardManager(driver)
+        dashboard.choose_dashboard("Sales Summary")
+        logging.info("✅ Dashboard selected successfully")
+        print("✅ Sales Summary dashboard opened")
+    except Exception as e:
+        logging.error(f"❌ Dashboard selection failed: {str(e)}")
+        print(f"❌ Dashboard selection failed: {str(e)}")
+        raise
+    return "Sales Summary"
+
+def apply_filters(driver):
+    """Apply the configured filters (the run continues unfiltered if this fails)"""
+    try:
+        filter_automation = FilterAutomation(driver)
+        filter_automation.run()
+        logging.info("✅ Filters applied successfully")
+        print("✅ Filters applied")
+        return True
+    except Exception as e:
+        logging.error(f"❌ Filter application failed: {str(e)}")
+        print(f"❌ Filter application failed: {str(e)}")
+        return False  # Continue without filters
+
+def open_dashboard_session(download_dir):
+    """Open an extra browser session on the filtered dashboard (for sharded drillthroughs)"""
+    driver = setup_chrome_driver(download_dir)
+    try:
+        login_to_dashboard(driver)
+        select_dashboard(driver)
+        apply_filters(driver)
+    except Exception:
+        driver.quit()
+        raise
+    return driver
+
+def find_drill_targets(driver, landing_widgets):
+    """Titles of the landing page widgets to drill through (none if the widget stage failed)"""
+    if not landing_widgets:
+        print("❌ Widget processing failed, skipping drillthrough...")
+        print("🔄 Continuing to background processing completion...")
+        return []
+
+    print("✅ Widget processing succeeded, proceeding to drillthrough...")
+    try:
+        # Get widget titles for drillthrough
+        from widget_components.widget_loader import WidgetLoader
+        loader = WidgetLoader(driver)
+        widgets = loader.get_widgets()
+        
+        drill_targets = []
+        for widget in widgets:
+            title = loader.get_widget_title(widget)
+            if title:
+                drill_targets.append(title)
+        
+        if drill_targets:
+            print(f"📋 Found {len(drill_targets)} widgets for drillthrough: {drill_targets}")
+        else:
+            print("⚠️ No widgets found for drillthrough")
+        return drill_targets
             
-        except Exception as e:
-            logging.error(f"❌ Error in drillthrough for {widget_title}: {str(e)}")
-            print(f"❌ Drillthrough Error for {widget_title}: {str(e)}")
-            # Continue with next widget
+    except Exception as e:
+        logging.error(f"❌ Error getting drill targets: {str(e)}")
+        print(f"❌ Error getting drill targets: {str(e)}")
+        return []
+
+async def wait_for_comparisons(kpi_comparison=None, drillthroughs=None):
+    """
+    Await all background comparisons once every stage that queues them is done
+
+    Returns:
+        True when every comparison finished in time
+    """
+    print("\n" + "="*60)
+    print("⏳ Waiting for background data comparisons to complete...")
+    print("="*60)
+
+    from background_processor import wait_for_all_comparisons_async, get_background_status
+
+    # Show progress while waiting; returns as soon as the last comparison finishes
+    def show_progress(event):
+        if event['status'] != 'active':
+            print(f"📈 {event['finished']}/{event['total']} comparisons done "
+                  f"({event['type']}: waited {event['queue_wait']:.1f}s, ran {event['duration']:.1f}s)")
+
+    if await wait_for_all_comparisons_async(timeout=300, progress_callback=show_progress):  # 5 minute timeout
+        print("✅ All background data comparisons completed successfully")
+        return True
+
+    print("⚠️ Some background comparisons may still be running")
+    status = get_background_status()
+    print(f"📊 Final status: {status}")
+    return False
+
+def write_run_reports(comparisons_done):
+    """Summarise the background comparisons and write the run reports once they all finished"""
+    if not comparisons_done:
+        return None
+
+    from background_processor import current_background_processor
+
+    # Show final results (no processor was started if nothing was queued)
+    processor = current_background_processor()
+    results = processor.get_completed_results() if processor else []
+    successful = len([r for r in results if r.get('status') == 'completed'])
+    failed = len([r for r in results if r.get('status') == 'failed'])
+    
+    print(f"📊 Background processing summary:")
+    print(f"  ✅ Successful comparisons: {successful}")
+    print(f"  ❌ Failed comparisons: {failed}")
+
+    if processor:
+        # Summary-only gating runs: one combined verdict for the whole run
+        if processor.summary_only:
+            processor.write_run_summary(
+                os.path.join("download", "comparison_run_summary.json")
+            )
+
+        # Queue wait / run time per comparison
+        processor.write_scheduling_report(
+            os.path.join("download", "background_schedule.xlsx")
+        )
+
+    # Virtual workbooks: merge the downloads for archival now that nothing reads them
+    run_scheduled_archives()
+    return successful, failed
+
+def build_validation_pipeline(kpi_dir, widget_dir, shard_pool=None):
+    """
+    Validation run as a task graph: stages start as soon as their inputs exist
+
+    Browser stages share the primary browser session and run one at a time in the
+    order below; the landing KPI DB fetch needs no browser and overlaps them.
+    With a shard_pool, the drillthroughs are spread over its extra sessions.
+    """
+    from config_loader import config_loader
+    from task_graph import TaskGraph
+
+    parallel_config = config_loader.get_dynamic_engine_config().get("performance", {}).get("parallel_processing", {})
+    graph = TaskGraph("validation", max_workers=parallel_config.get("pipeline_workers", 4),
+                      resources={"browser": 1, "db": parallel_config.get("pipeline_db_workers", 2)})
+
+    graph.add_stage("login", login_to_dashboard, inputs=["driver"], outputs=["session"],
+                    kind="browser", resource="browser")
+    graph.add_stage("dashboard", lambda driver, session: select_dashboard(driver), inputs=["driver", "session"],
+                    outputs=["dashboard"], kind="browser", resource="browser")
+    graph.add_stage("filters", lambda driver, dashboard: apply_filters(driver), inputs=["driver", "dashboard"],
+                    outputs=["filters"], kind="browser", resource="browser")
+    graph.add_stage("kpi_db_fetch", fetch_landing_kpis_from_db, outputs=["db_kpis"], kind="db", resource="db",
+                    optional=True)
+    graph.add_stage("kpi_extract", lambda driver, filters: extract_kpis(driver, kpi_dir), inputs=["driver", "filters"],
+                    outputs=["kpi_excel"], kind="browser", resource="browser", optional=True)
+    # Tooltip hovering is kept out of the extraction; it only runs when enabled
+    graph.add_stage("kpi_tooltips", lambda driver, kpi_excel: check_kpi_tooltips(driver, kpi_dir),
+                    inputs=["driver", "kpi_excel"], outputs=["kpi_tooltips"], kind="browser", resource="browser",
+                    optional=True)
+    graph.add_stage("kpi_compare", functools.partial(compare_kpis, kpi_dir=kpi_dir),
+                    inputs=["kpi_excel", "db_kpis"], outputs=["kpi_comparison"], kind="compare", optional=True)
+    # Landing widgets queue their own comparisons in the background as they are downloaded
+    graph.add_stage("landing_widgets", lambda driver, filters: process_landing_widgets(driver, widget_dir, shard_pool),
+                    inputs=["driver", "filters"], outputs=["landing_widgets"], kind="browser", resource="browser",
+                    optional=True)
+    graph.add_stage("drill_targets", find_drill_targets, inputs=["driver", "landing_widgets"], outputs=["drill_targets"],
+                    kind="browser", resource="browser", optional=True)
+    # Drillthrough navigates away from the landing page, so it also waits for the KPI extraction and checks
+    graph.add_stage("drillthrough",
+                    lambda driver, drill_targets, kpi_excel, kpi_tooltips:
+                        process_drillthrough_widgets(driver, drill_targets, shard_pool),
+                    inputs=["driver", "drill_targets", "kpi_excel", "kpi_tooltips"], outputs=["drillthroughs"],
+                    kind="browser", resource="browser", optional=True)
+    graph.add_stage("comparisons", wait_for_comparisons,
+                    inputs=["kpi_comparison", "drillthroughs"], outputs=["comparisons_done"], kind="compare")
+    graph.add_stage("reports", write_run_reports, inputs=["comparisons_done"], outputs=["run_summary"], kind="report")
+    return graph
+
+async def run_validation(driver, kpi_dir, widget_dir):
+    """
+    Coroutine graph of the run: login, dashboard, KPIs, widgets, drillthrough,
+    comparisons and reports; DB work overlaps the browser stages wherever the inputs allow
+
+    Returns:
+        The finished TaskGraph
+    """
+    from browser_shards import BrowserShardPool, browser_sessions
+
+    # Extra sessions for the drillthroughs log in while the primary one works the landing page
+    sessions = browser_sessions()
+    shard_pool = BrowserShardPool(open_dashboard_session, sessions) if sessions > 1 else None
+    if shard_pool is not None:
+        shard_pool.open()
+    try:
+        pipeline = build_validation_pipeline(kpi_dir, widget_dir, shard_pool)
+        await pipeline.run_async(driver=driver)
+    finally:
+        if shard_pool is not None:
+            await asyncio.to_thread(shard_pool.close)
+    await asyncio.to_thread(pipeline.write_critical_path_report,
+                            os.path.join("download", "pipeline_critical_path.xlsx"))
+    return pipeline
 
 def main():
     """Main automation workflow with comprehensive error handling"""
@@ -281,122 +525,22 @@ def main():
         
         # Setup directories and driver
         download_dir, kpi_dir, widget_dir = setup_directories()
+
+        # Finish comparisons an interrupted run left behind while the browser starts
+        from task_journal import journal_config
+        if journal_config().get("resume_on_start", False):
+            from background_processor import resume_comparisons_bg
+            resume_comparisons_bg()
+
         driver = setup_chrome_driver(download_dir)
-        
-        # Login
-        try:
-            login = Authenticator(driver)
-            login.login()
-            logging.info("✅ Login completed successfully")
-            print("✅ Login successful")
-        except Exception as e:
-            logging.error(f"❌ Login failed: {str(e)}")
-            print(f"❌ Login failed: {str(e)}")
-            return
 
-        # Select Dashboard
-        try:
-            dashboard = DashboardManager(driver)
-            dashboard.choose_dashboard("Sales Summary")
-            logging.info("✅ Dashboard selected successfully")
-            print("✅ Sales Summary dashboard opened")
-        except Exception as e:
-            logging.error(f"❌ Dashboard selection failed: {str(e)}")
-            print(f"❌ Dashboard selection failed: {str(e)}")
+        pipeline = asyncio.run(run_validation(driver, kpi_dir, widget_dir))
+
+        failed_stages = pipeline.failed_stages()
+        if failed_stages:
+            logging.error(f"❌ Automation workflow stopped at: {', '.join(s.name for s in failed_stages)}")
+            print(f"❌ Automation workflow stopped at: {', '.join(s.name for s in failed_stages)}")
             return
-        
-        # Apply filters
-        try:
-            filter_automation = FilterAutomation(driver)
-            filter_automation.run()
-            logging.info("✅ Filters applied successfully")
-            print("✅ Filters applied")
-        except Exception as e:
-            logging.error(f"❌ Filter application failed: {str(e)}")
-            print(f"❌ Filter application failed: {str(e)}")
-            # Continue without filters
-        
-        # Process KPIs
-        print("🔄 Starting KPI processing...")
-        process_kpis(driver, kpi_dir)
-        print("✅ KPI processing completed, continuing to widgets...")
-        
-        # Process Landing Page Widgets
-        try:
-            print("🔄 About to start widget processing...")
-            widget_result = process_landing_widgets(driver, widget_dir)
-            print(f"📊 Widget processing result: {widget_result}")
-            
-            if widget_result:
-                print("✅ Widget processing succeeded, proceeding to drillthrough...")
-                # Get drill targets from widget extractor
-                try:
-                    from widgetsdataextract import WidgetExtractor
-                    widget_extractor = WidgetExtractor(driver)
-                    
-                    # Get widget titles for drillthrough
-                    from widget_components.widget_loader import WidgetLoader
-                    loader = WidgetLoader(driver)
-                    widgets = loader.get_widgets()
-                    
-                    drill_targets = []
-                    for widget in widgets:
-                        title = loader.get_widget_title(widget)
-                        if title:
-                            drill_targets.append(title)
-                    
-                    if drill_targets:
-                        print(f"📋 Found {len(drill_targets)} widgets for drillthrough: {drill_targets}")
-                        process_drillthrough_widgets(driver, drill_targets)
-                    else:
-                        print("⚠️ No widgets found for drillthrough")
-                        
-                except Exception as e:
-                    logging.error(f"❌ Error getting drill targets: {str(e)}")
-                    print(f"❌ Error getting drill targets: {str(e)}")
-            else:
-                print("❌ Widget processing failed, skipping drillthrough...")
-                print("🔄 Continuing to background processing completion...")
-                
-        except Exception as widget_section_error:
-            print(f"🚨 CRITICAL ERROR in widget section: {widget_section_error}")
-            print(f"🚨 Error type: {type(widget_section_error).__name__}")
-            import traceback
-            print(f"🚨 Full traceback: {traceback.format_exc()}")
-            print("🔄 Continuing to background processing despite widget error...")
-
-        # Wait for all background comparisons to complete
-        print("\n" + "="*60)
-        print("⏳ Waiting for background data comparisons to complete...")
-        print("="*60)
-        
-        try:
-            from background_processor import wait_for_all_comparisons, get_background_status, shutdown_background_processor
-            
-            # Show status while waiting
-            if wait_for_all_comparisons(timeout=300):  # 5 minute timeout
-                print("✅ All background data comparisons completed successfully")
-                
-                # Show final results
-                import background_processor
-                results = background_processor.background_processor.get_completed_results()
-                successful = len([r for r in results if r.get('status') == 'completed'])
-                failed = len([r for r in results if r.get('status') == 'failed'])
-                
-                print(f"📊 Background processing summary:")
-                print(f"  ✅ Successful comparisons: {successful}")
-                print(f"  ❌ Failed comparisons: {failed}")
-                
-            else:
-                print("⚠️ Some background comparisons may still be running")
-                status = get_background_status()
-                print(f"📊 Final status: {status}")
-            
-            # Shutdown background processor
-            shutdown_background_processor()
-            
-        except Exception as bg_error:
-            print(f"⚠️ Background processing error: {str(bg_error)}")
 
         logging.info("🎉 Automation workflow completed successfully")
         print("🎉 Automation workflow completed successfully!")
@@ -414,6 +558,10 @@ def main():
         if driver:
             error_handler.take_screenshot(driver, "System", "Unexpected_Error")
     finally:
+        # Stop background threads/pools even when the workflow failed (no-op if already stopped)
+        from background_processor import shutdown_background_processor
+        shutdown_background_processor()
+
         # Generate comprehensive error report
         error_handler.generate_error_report()
         error_handler.print_summary()
@@ -0,0 +1,308 @@
+"""
+REPORT WRITERS
+==============
+Shared low-allocation writer for all comparison and error reports.
+
+Rows are streamed straight to disk: openpyxl write-only mode by default, or
+xlsxwriter in constant_memory mode when installed and selected. Each sheet
+can also be mirrored to CSV or Parquet sidecar tables for downstream tools,
+alongside or instead of the .xlsx. The tables directory gets a _sheets.json
+index (sheet titles, header, width, files) so sidecar_tables.py can read
+the tables back as a workbook.
+
+    with ReportWriter(output_path) as report:
+        report.write_sheet("KPI Comparison", header, rows)
+
+Backend, sidecars and xlsx output default to reporting.writer_backend /
+reporting.sidecars / reporting.report_xlsx in config/dynamic_engine_config.yaml.
+"""
+
+import csv
+import json
+import os
+import re
+from typing import List, Optional, Iterable
+
+from openpyxl import Workbook
+
+from config_loader import config_loader
+
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+PARQUET_BATCH_ROWS = 10000
+SIDECAR_INDEX = "_sheets.json"
+
+# Cell text that would read back as a number; stored with a leading ' to stay text
+NUMERIC_TEXT_RE = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?$|-?\.\d+(?:[eE][-+]?\d+)?$')
+
+
+def _reporting_config():
+    return config_loader.get_dynamic_engine_config().get("reporting", {}) or {}
+
+
+def sidecar_dir_for(output_path: str) -> str:
+    """Directory holding the sidecar tables of a report (report.xlsx -> report_tables/)"""
+    return os.path.splitext(output_path)[0] + "_tables"
+
+
+def encode_cell(value):
+    """
+    Sidecar table text for a cell value
+
+    Numbers are written as text and read back as numbers; text that looks
+    numeric, is empty or starts with ' gets a leading ' (as Excel shows text
+    numbers) so sidecar_tables.restore_value returns it unchanged.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        if value == "" or value.startswith("'") or NUMERIC_TEXT_RE.match(value):
+            return "'" + value
+        return value
+    return str(value)
+
+
+def _safe_name(title: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', title).strip('_') or "sheet"
+
+
+class _OpenpyxlBackend:
+    """openpyxl write-only workbook (rows go to temp files, not cell objects)"""
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.wb = Workbook(write_only=True)
+
+    def add_sheet(self, title: str):
+        return self.wb.create_sheet(title=title).append
+
+    def save(self):
+        self.wb.save(self.output_path)
+
+
+class _XlsxwriterBackend:
+    """xlsxwriter in constant_memory mode (one row buffered per sheet)"""
+
+    def __init__(self, output_path: str):
+        self.wb = xlsxwriter.Workbook(output_path, {'constant_memory': True, 'nan_inf_to_errors': True})
+
+    def add_sheet(self, title: str):
+        ws = self.wb.add_worksheet(title)
+        next_row = [0]
+
+        def append(row):
+            ws.write_row(next_row[0], 0, list(row))
+            next_row[0] += 1
+
+        return append
+
+    def save(self):
+        self.wb.close()
+
+
+class _CsvSidecar:
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+
+    def append(self, row):
+        self.writer.writerow([encode_cell(v) for v in row])
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetSidecar:
+    """Parquet table written in batches; all columns stored as strings (comparison cells are mixed-type)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.columns = None
+        self.batch = []
+        self.writer = None
+
+    def append(self, row):
+        if self.columns is None:
+            self.columns = [str(c) if c not in (None, "") else f"column_{i}" for i, c in enumerate(row)]
+            return
+        width = len(self.columns)
+        row = list(row)[:width] + [None] * (width - len(row))
+        self.batch.append([encode_cell(v) for v in row])
+        if len(self.batch) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self.columns is None:
+            return
+        table = pyarrow.table(
+            {name: [row[i] for row in self.batch] for i, name in enumerate(self.columns)},
+            schema=pyarrow.schema([(name, pyarrow.string()) for name in self.columns])
+        )
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+        self.batch = []
+
+    def close(self):
+        self._flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _NoWorkbookBackend:
+    """Sidecar-only output: no .xlsx is written"""
+
+    def add_sheet(self, title: str):
+        return lambda row: None
+
+    def save(self):
+        pass
+
+
+class ReportSheet:
+    """A report sheet; rows are forwarded to the workbook backend and any sidecars"""
+
+    def __init__(self, title: str, append, sidecars: List):
+        self.title = title
+        self._append = append
+        self._sidecars = sidecars
+        self.row_count = 0
+        self.header = None
+        self.width = 0
+
+    def append(self, row):
+        self._append(row)
+        for sidecar in self._sidecars:
+            sidecar.append(row)
+        if self.row_count == 0:
+            self.header = list(row)
+        self.width = max(self.width, len(row))
+        self.row_count += 1
+
+    def extend(self, rows: Iterable) -> int:
+        for row in rows:
+            self.append(row)
+        return self.row_count
+
+
+class ReportWriter:
+    """Streaming Excel report with optional CSV/Parquet sidecar tables per sheet"""
+
+    def __init__(self, output_path: str, backend: Optional[str] = None, sidecars: Optional[List[str]] = None,
+                 xlsx: Optional[bool] = None):
+        """
+        Args:
+            output_path: Report .xlsx path
+            backend: 'openpyxl' (write-only) or 'xlsxwriter' (constant memory);
+                falls back to openpyxl when xlsxwriter is not installed
+            sidecars: Table formats to mirror each sheet to ('csv', 'parquet');
+                parquet falls back to csv when pyarrow is not installed
+            xlsx: Write the .xlsx itself; when False only the sidecar tables are
+                written (csv if no sidecar format is configured)
+        """
+        reporting = _reporting_config()
+        backend = backend or reporting.get("writer_backend", "openpyxl")
+        sidecars = reporting.get("sidecars", []) if sidecars is None else sidecars
+        xlsx = reporting.get("report_xlsx", True) if xlsx is None else xlsx
+        if not xlsx and not sidecars:
+            sidecars = ["csv"]
+
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if backend == "xlsxwriter" and not XLSXWRITER_AVAILABLE:
+            print("⚠️ xlsxwriter not installed, using openpyxl write-only reports")
+            backend = "openpyxl"
+        if "parquet" in sidecars and not PYARROW_AVAILABLE:
+            print("⚠️ pyarrow not installed, writing CSV sidecars instead of Parquet")
+            sidecars = ["csv" if fmt == "parquet" else fmt for fmt in sidecars]
+
+        self.output_path = output_path
+        self.backend_name = backend
+        self.sidecar_formats = list(dict.fromkeys(sidecars or []))
+        if not xlsx:
+            self.backend = _NoWorkbookBackend()
+        elif backend == "xlsxwriter":
+            self.backend = _XlsxwriterBackend(output_path)
+        else:
+            self.backend = _OpenpyxlBackend(output_path)
+        self.xlsx = xlsx
+        self.sheets = []
+        self._sidecars = []
+        self._sidecar_files = {}
+
+    def add_sheet(self, title: str, header: Optional[list] = None) -> ReportSheet:
+        """Create a sheet (title truncated to Excel's 31 characters) and write its header"""
+        title = title[:31]
+        sidecars = []
+        if self.sidecar_formats:
+            sidecar_dir = sidecar_dir_for(self.output_path)
+            os.makedirs(sidecar_dir, exist_ok=True)
+            # Distinct titles can share a safe file name ('A/B' and 'A_B')
+            base = name = _safe_name(title)
+            used = {os.path.splitext(f)[0] for files in self._sidecar_files.values() for f in files.values()}
+            suffix = 2
+            while name in used:
+                name, suffix = f"{base}_{suffix}", suffix + 1
+            self._sidecar_files[title] = {fmt: f"{name}.{fmt}" for fmt in self.sidecar_formats}
+            for fmt, file_name in self._sidecar_files[title].items():
+                path = os.path.join(sidecar_dir, file_name)
+                sidecars.append(_ParquetSidecar(path) if fmt == "parquet" else _CsvSidecar(path))
+            self._sidecars.extend(sidecars)
+
+        sheet = ReportSheet(title, self.backend.add_sheet(title), sidecars)
+        self.sheets.append(sheet)
+        if header is not None:
+            sheet.append(header)
+        return sheet
+
+    def write_sheet(self, title: str, header: list, rows: Iterable) -> int:
+        """Write a whole sheet; returns the number of data rows"""
+        return self.add_sheet(title, header).extend(rows) - 1
+
+    def save(self):
+        if not self.sheets:
+            self.add_sheet("Report", ["No data"])
+        self.backend.save()
+        for sidecar in self._sidecars:
+            sidecar.close()
+        if self.sidecar_formats:
+            self._write_index()
+
+    def _write_index(self):
+        """Describe the sidecar tables so they can be read back as a workbook"""
+        index = {
+            'source': os.path.basename(self.output_path),
+            'sheets': [
+                {'title': sheet.title, 'header': sheet.header, 'width': sheet.width,
+                 'rows': sheet.row_count, 'files': self._sidecar_files[sheet.title]}
+                for sheet in self.sheets
+            ]
+        }
+        index_path = os.path.join(sidecar_dir_for(self.output_path), SIDECAR_INDEX)
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2, default=str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.save()
+        else:
+            for sidecar in self._sidecars:
+                sidecar.close()
+        return False
@@ -0,0 +1,349 @@
+"""
+SHEET-LEVEL COMPARISON CORE
+===========================
+Pure per-sheet comparison functions shared by the widget comparison
+entry points in widgetstoreprocedures.py.
+
+This module deliberately has no database or Selenium imports so that sheet
+comparisons can run in worker processes: payloads are plain dicts (Excel
+path, sheet name, DB values) and results are plain lists.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Iterable, Iterator
+
+from comparison_cache import sheet_fingerprint
+from virtual_workbook import open_workbook
+
+# Process-wide executor used for sheet-level work when set (see set_sheet_executor)
+_sheet_executor = None
+
+
+def set_sheet_executor(executor):
+    """Register the executor used to schedule sheet comparisons (None = run inline)"""
+    global _sheet_executor
+    _sheet_executor = executor
+
+
+def get_sheet_executor():
+    """Get the registered sheet executor, if any"""
+    return _sheet_executor
+
+
+def create_process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Create a process pool for CPU-bound sheet comparisons"""
+    workers = max_workers or os.cpu_count() or 1
+    print(f"🧮 Starting sheet comparison process pool with {workers} workers")
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def safe_round(value):
+    try:
+        clean_val = str(value).replace(",", "").replace("$", "").replace("₹", "").replace("K", "").replace("M", "")
+        return round(float(clean_val), 2)
+    except:
+        return value
+
+
+def normalize(name: str) -> str:
+    return ''.join(str(name).lower().strip().replace("_", "").replace(" ", ""))
+
+
+def sheet_headers(header_row) -> List[str]:
+    """Lowercased, stripped header names from the first row values"""
+    return [str(value).strip().lower() if value else "" for value in header_row]
+
+
+def iter_sheet(ws):
+    """
+    Stream a (read-only) worksheet in a single pass
+
+    Returns:
+        (headers, rows) where rows is a generator of value tuples padded to the header width
+    """
+    rows = ws.iter_rows(values_only=True)
+    header_row = next(rows, ())
+    width = len(header_row)
+    return sheet_headers(header_row), (row + (None,) * (width - len(row)) if len(row) < width else row for row in rows)
+
+
+def read_sheet_values(excel_path: str, sheet_name: str):
+    """
+    Read one sheet with openpyxl read-only mode
+
+    Returns:
+        (headers, rows) where rows are value tuples padded to the header width
+    """
+    wb = open_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        headers, rows = iter_sheet(wb[sheet_name])
+        return headers, list(rows)
+    finally:
+        wb.close()
+
+
+def list_sheet_names(excel_path: str) -> List[str]:
+    """Sheet names without parsing sheet contents"""
+    wb = open_workbook(excel_path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def resolve_widget_name(sheet_name: str, widget_sp_map: Dict[str, str]) -> Optional[str]:
+    """Resolve the widget display key for a sheet (partial normalized match)"""
+    normalized_sheet = normalize(sheet_name)
+    for norm_key, display_key in ((normalize(k), k) for k in widget_sp_map.keys()):
+        if norm_key in normalized_sheet:
+            return display_key
+    return None
+
+
+def iter_compare_sheet_rows(sheet_name: str, headers: List[str], rows: Iterable, db_data: Dict[str, str],
+                            widget_name: str) -> Iterator[list]:
+    """
+    Row-per-metric comparison of one sheet (compare_widget_data layout), one output row at a time
+
+    Yields:
+        [identifier, metric, excel_value, db_value, status]
+    """
+    col_indices = {h: i for i, h in enumerate(headers)}
+
+    id_idx = col_indices.get("identifier") or col_indices.get("identifier/label") or 0
+    actual_idx = col_indices.get("actual sales")
+    target_idx = col_indices.get("targets") or col_indices.get("target")
+    prev_idx = col_indices.get("previous year")
+    curr_idx = col_indices.get("current year")
+    metric_idx = col_indices.get("metric")
+    excelval_idx = col_indices.get("excel value")
+
+    metrics = (
+        ("Actual Sales", actual_idx, ""),
+        ("Target", target_idx, "Target"),
+        ("Previous Year", prev_idx, "Previous Year"),
+        ("Current Year", curr_idx, "Current Year"),
+    )
+
+    def compare_metric(row, identifier, label, col_index, suffix):
+        excel_val = row[col_index]
+        key = f"{widget_name} - {identifier}" if label == "Actual Sales" else f"{widget_name} - {identifier} {suffix}"
+        db_val = db_data.get(key, "Not Found")
+
+        # Debug: If not found, try alternative key formats for drillthrough data
+        if db_val == "Not Found":
+            alternative_keys = [
+                f"Weekly Trends - {identifier} {suffix}",
+                f"Sales Summary_Weekday Weekend - {identifier} {suffix}",
+                f"Weekly Trends - {identifier.replace(' SALES', '')} {suffix}",
+                f"Weekly Trends - {identifier.replace(' SALES', '')} SALES {suffix}"
+            ]
+
+            for alt_key in alternative_keys:
+                if alt_key in db_data:
+                    print(f"✅ Found alternative key: {alt_key} (was looking for: {key})")
+                    db_val = db_data[alt_key]
+                    break
+
+            if db_val == "Not Found":
+                print(f"❌ DB value not found for key: {key}")
+                print(f"🔍 Available keys containing '{identifier}': {[k for k in db_data.keys() if identifier in k][:3]}")
+
+        excel_rounded = safe_round(excel_val)
+        db_rounded = safe_round(db_val)
+        status = "Match" if excel_rounded == db_rounded else "Mismatch"
+        return [identifier, label, excel_rounded, db_rounded, status]
+
+    for row in rows:
+        identifier = str(row[id_idx]).strip() if row[id_idx] else "Unknown"
+
+        for label, col_index, suffix in metrics:
+            if col_index is not None and row[col_index] is not None:
+                yield compare_metric(row, identifier, label, col_index, suffix)
+
+        if metric_idx is not None and excelval_idx is not None:
+            metric = str(row[metric_idx]).strip() if row[metric_idx] else ""
+            excel_val = row[excelval_idx]
+            key = f"{widget_name} - {identifier} {metric}"
+            db_val = db_data.get(key, "Not Found")
+            excel_rounded = safe_round(excel_val)
+            db_rounded = safe_round(db_val)
+            status = "Match" if excel_rounded == db_rounded else "Mismatch"
+            if db_val == "Not Found":
+                print(f"❌ DB value not found for key: {key}")
+            yield [identifier, metric, excel_rounded, db_rounded, status]
+
+
+def compare_sheet_rows(sheet_name: str, headers: List[str], rows: Iterable, db_data: Dict[str, str],
+                       widget_name: str) -> List[list]:
+    """
+    Row-per-metric comparison of one sheet (compare_widget_data layout)
+
+    Returns:
+        [[identifier, metric, excel_value, db_value, status], ...]
+    """
+    return list(iter_compare_sheet_rows(sheet_name, headers, rows, db_data, widget_name))
+
+
+def db_key_prefixes(sheet_name: str, mode: str, widget_name: Optional[str] = None) -> tuple:
+    """DB key prefixes a sheet comparison can look up (rows mode includes the alternative keys)"""
+    if mode == 'rows':
+        return (f"{widget_name} - ", "Weekly Trends - ", "Sales Summary_Weekday Weekend - ")
+    return (f"{sheet_name} - ",)
+
+
+def _compare_value(excel_value, db_value):
+    """Status for one Excel/DB value pair in the structure-preserving layout"""
+    if excel_value is None:
+        return "Match"
+    if db_value == "Not Found":
+        return "Not Found"
+    return "Match" if safe_round(excel_value) == safe_round(db_value) else "Mismatch"
+
+
+def iter_compare_sheet_preserve_structure(sheet_name: str, headers: List[str], rows: Iterable,
+                                          db_data: Dict[str, str]):
+    """
+    Structure-preserving comparison of one sheet, one output row at a time
+
+    Returns:
+        (header_row, output_row_generator)
+    """
+    col_indices = {h: i for i, h in enumerate(headers)}
+
+    has_targets = "targets" in headers or "target" in headers
+    has_prev_curr = "previous year" in headers and "current year" in headers
+
+    def cell(row, idx):
+        return row[idx] if idx is not None and len(row) > idx else None
+
+    id_idx = col_indices.get("identifier", 0)
+
+    if has_targets:
+        header = ["Identifier", "Excel Actual Sales", "DB Actual Sales", "Actual Sales Status", "Excel Targets", "DB Targets", "Target Status"]
+        first_idx = col_indices.get("actual sales")
+        second_idx = col_indices.get("targets") or col_indices.get("target")
+        suffixes = ("", " Target")
+    elif has_prev_curr:
+        header = ["Identifier", "Excel Previous Year", "DB Previous Year", "Previous Year Status", "Excel Current Year", "DB Current Year", "Current Year Status"]
+        first_idx = col_indices.get("previous year")
+        second_idx = col_indices.get("current year")
+        suffixes = (" Previous Year", " Current Year")
+    else:
+        header = ["Identifier", "Excel Actual Sales", "DB Actual Sales", "Status"]
+        first_idx = col_indices.get("actual sales")
+        second_idx = None
+        suffixes = ("",)
+
+    def generate():
+        for row in rows:
+            identifier = str(row[id_idx]).strip() if row[id_idx] else "Unknown"
+
+            excel_first = cell(row, first_idx)
+            db_first = db_data.get(f"{sheet_name} - {identifier}{suffixes[0]}", "Not Found")
+            line = [identifier, excel_first, db_first, _compare_value(excel_first, db_first)]
+
+            if len(suffixes) > 1:
+                excel_second = cell(row, second_idx)
+                db_second = db_data.get(f"{sheet_name} - {identifier}{suffixes[1]}", "Not Found")
+                line.extend([excel_second, db_second, _compare_value(excel_second, db_second)])
+
+            yield line
+
+    return header, generate()
+
+
+def compare_sheet_preserve_structure(sheet_name: str, headers: List[str], rows: Iterable,
+                                     db_data: Dict[str, str]):
+    """
+    Structure-preserving comparison of one sheet
+
+    Returns:
+        (header_row, output_rows)
+    """
+    header, output = iter_compare_sheet_preserve_structure(sheet_name, headers, rows, db_data)
+    return header, list(output)
+
+
+ROWS_HEADER = ["Identifier/Label", "Metric", "Excel Value", "DB Value", "Status"]
+
+
+def iter_compare_sheet(sheet_name: str, headers: List[str], rows: Iterable, db_data: Dict[str, str],
+                       mode: str, widget_name: Optional[str] = None):
+    """
+    Streaming compare of one sheet in the given layout ('rows' or 'preserve')
+
+    Returns:
+        (header_row, output_row_generator)
+    """
+    if mode == 'rows':
+        return ROWS_HEADER, iter_compare_sheet_rows(sheet_name, headers, rows, db_data, widget_name)
+    return iter_compare_sheet_preserve_structure(sheet_name, headers, rows, db_data)
+
+
+def compare_sheet(sheet_name: str, headers: List[str], rows: Iterable, db_data: Dict[str, str],
+                  mode: str, widget_name: Optional[str] = None):
+    """
+    Compare one sheet in the given layout ('rows' or 'preserve')
+
+    Returns:
+        (header_row, output_rows)
+    """
+    if mode == 'rows':
+        return ROWS_HEADER, compare_sheet_rows(sheet_name, headers, rows, db_data, widget_name)
+    return compare_sheet_preserve_structure(sheet_name, headers, rows, db_data)
+
+
+def compare_sheet_task(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Process-pool entry point: read one sheet and compare it
+
+    Payload keys: excel_path, sheet_name, db_data, mode ('preserve' or 'rows'),
+    widget_name (rows mode only), cached_sheet_hash (optional; when the sheet
+    content still hashes to it the comparison is skipped and 'reused' is set).
+    Everything in and out is picklable.
+    """
+    start = time.perf_counter()
+    headers, rows = read_sheet_values(payload['excel_path'], payload['sheet_name'])
+
+    result = {
+        'sheet_name': payload['sheet_name'],
+        'row_count': len(rows),
+        'pid': os.getpid(),
+        'reused': False
+    }
+
+    if 'cached_sheet_hash' in payload:
+        result['sheet_hash'] = sheet_fingerprint(headers, rows)
+        if result['sheet_hash'] == payload['cached_sheet_hash']:
+            result.update(reused=True, header=None, rows=None, elapsed=time.perf_counter() - start)
+            return result
+
+    result['header'], result['rows'] = compare_sheet(
+        payload['sheet_name'], headers, rows, payload['db_data'],
+        payload.get('mode', 'preserve'), payload.get('widget_name')
+    )
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def sheet_db_subset(db_data: Dict[str, str], sheet_name: str) -> Dict[str, str]:
+    """DB values keyed for one sheet, to keep per-sheet payloads small"""
+    prefix = f"{sheet_name} - "
+    return {k: v for k, v in db_data.items() if k.startswith(prefix)}
+
+
+def build_db_index(db_data: Dict[str, str], key_prefixes: tuple) -> Dict[str, str]:
+    """Prebuilt per-sheet lookup index: only the DB keys a sheet can reference"""
+    return {k: v for k, v in db_data.items() if k.startswith(key_prefixes)}
+
+
+def run_sheet_tasks(payloads: List[Dict[str, Any]], executor=None) -> List[Dict[str, Any]]:
+    """Run sheet payloads on the executor (or inline) and return results in payload order"""
+    executor = executor or get_sheet_executor()
+    if executor is None:
+        return [compare_sheet_task(payload) for payload in payloads]
+    futures = [executor.submit(compare_sheet_task, payload) for payload in payloads]
+    return [future.result() for future in futures]
@@ -0,0 +1,246 @@
+"""
+SIDECAR TABLES
+==============
+Columnar copies (Parquet, or CSV without pyarrow) of extracted data and
+reports, written next to the .xlsx as <name>_tables/<sheet>.<fmt> plus a
+_sheets.json index (see report_writer.py).
+
+Writing:
+    - reports: ReportWriter mirrors every sheet when reporting.sidecars is set
+    - extracted data (kpi_data.xlsx, merged widget workbooks):
+      write_workbook_tables(), formats from reporting.extract_sidecars
+
+Reading:
+    - open_workbook() (virtual_workbook.py) returns a SidecarWorkbook for an
+      .xlsx whose tables are at least as new as the file when
+      reporting.read_sidecars is set, so comparisons skip the xlsx parse
+    - collect_tables() concatenates a sheet across many runs for history
+
+Tables store cell values as text (see report_writer.encode_cell): numbers
+and text round-trip exactly, other values (dates, booleans) come back as
+their text.
+"""
+
+import csv
+import json
+import os
+import re
+from typing import Dict, Any, List, Optional
+
+from openpyxl import load_workbook
+
+from config_loader import config_loader
+from report_writer import (
+    ReportWriter, SIDECAR_INDEX, PYARROW_AVAILABLE, NUMERIC_TEXT_RE, encode_cell, sidecar_dir_for, _CsvSidecar, _ParquetSidecar
+)
+
+if PYARROW_AVAILABLE:
+    import pyarrow.parquet as pq
+
+_INT_RE = re.compile(r'-?(?:0|[1-9]\d*)$')
+
+
+def _reporting_config():
+    return config_loader.get_dynamic_engine_config().get("reporting", {}) or {}
+
+
+def extract_table_formats() -> List[str]:
+    """Sidecar formats for extracted data (reporting.extract_sidecars)"""
+    return list(_reporting_config().get("extract_sidecars", []) or [])
+
+
+def read_sidecars_enabled() -> bool:
+    return bool(_reporting_config().get("read_sidecars", False))
+
+
+def tables_available(excel_path: str) -> bool:
+    """True when excel_path has a sidecar index at least as new as the workbook itself"""
+    index_path = os.path.join(sidecar_dir_for(excel_path), SIDECAR_INDEX)
+    if not os.path.exists(index_path):
+        return False
+    return not os.path.exists(excel_path) or os.path.getmtime(index_path) >= os.path.getmtime(excel_path)
+
+
+def report_exists(output_path: str) -> bool:
+    """A report exists as .xlsx or, with reporting.report_xlsx off, as sidecar tables only"""
+    return os.path.exists(output_path) or tables_available(output_path)
+
+
+def report_size(output_path: str) -> int:
+    """Bytes of the .xlsx, or of its sidecar tables when no .xlsx was written"""
+    if os.path.exists(output_path):
+        return os.path.getsize(output_path)
+    tables_dir = sidecar_dir_for(output_path)
+    if not os.path.isdir(tables_dir):
+        return 0
+    return sum(os.path.getsize(os.path.join(tables_dir, f)) for f in os.listdir(tables_dir))
+
+
+def restore_value(text):
+    """Table text back to a cell value (inverse of report_writer.encode_cell)"""
+    if text is None or text == "":
+        return None
+    if text.startswith("'"):
+        return text[1:]
+    if _INT_RE.match(text):
+        return int(text)
+    if NUMERIC_TEXT_RE.match(text):
+        return float(text)
+    return text
+
+
+class _Cell:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class SidecarSheet:
+    """Worksheet stand-in over one sidecar table (values only)"""
+
+    def __init__(self, tables_dir: str, entry: Dict[str, Any]):
+        self.title = entry['title']
+        self._entry = entry
+        self._tables_dir = tables_dir
+        self.max_column = entry.get('width', 0)
+        self.max_row = entry.get('rows', 0)
+
+    def _raw_rows(self):
+        files = self._entry['files']
+        if "csv" in files:
+            with open(os.path.join(self._tables_dir, files['csv']), newline="", encoding="utf-8") as f:
+                yield from csv.reader(f)
+        elif "parquet" in files and PYARROW_AVAILABLE:
+            # Parquet column names replace empty header cells; the index keeps the original header
+            yield [encode_cell(v) for v in (self._entry.get('header') or [])]
+            for batch in pq.ParquetFile(os.path.join(self._tables_dir, files['parquet'])).iter_batches():
+                columns = batch.to_pydict()
+                yield from zip(*columns.values())
+        else:
+            raise FileNotFoundError(f"No readable table for sheet '{self.title}' in {self._tables_dir}")
+
+    def iter_rows(self, min_row: int = 1, max_row: Optional[int] = None, values_only: bool = True):
+        """Rows as value tuples padded to the table width (cells are always values)"""
+        width = self.max_column
+        for number, row in enumerate(self._raw_rows(), 1):
+            if number < min_row:
+                continue
+            if max_row is not None and number > max_row:
+                break
+            values = tuple(restore_value(v) for v in row)
+            if len(values) < width:
+                values += (None,) * (width - len(values))
+            yield values if values_only else tuple(_Cell(v) for v in values)
+
+    def __getitem__(self, row_number: int):
+        """ws[n]: cells of row n (1-based)"""
+        for cells in self.iter_rows(min_row=row_number, max_row=row_number, values_only=False):
+            return cells
+        return ()
+
+
+class SidecarWorkbook:
+    """Read-side workbook over a <name>_tables/ directory"""
+
+    def __init__(self, tables_dir: str):
+        self.tables_dir = tables_dir
+        with open(os.path.join(tables_dir, SIDECAR_INDEX), "r", encoding="utf-8") as f:
+            self._sheets = {entry['title']: entry for entry in json.load(f)['sheets']}
+
+    @classmethod
+    def for_workbook(cls, excel_path: str) -> "SidecarWorkbook":
+        return cls(sidecar_dir_for(excel_path))
+
+    @property
+    def sheetnames(self) -> List[str]:
+        return list(self._sheets)
+
+    @property
+    def worksheets(self):
+        return [self[title] for title in self._sheets]
+
+    @property
+    def active(self):
+        return self[next(iter(self._sheets))]
+
+    def __getitem__(self, title: str) -> SidecarSheet:
+        if title not in self._sheets:
+            raise KeyError(f"Worksheet {title} does not exist.")
+        return SidecarSheet(self.tables_dir, self._sheets[title])
+
+    def __contains__(self, title: str) -> bool:
+        return title in self._sheets
+
+    def close(self):
+        pass
+
+
+def write_workbook_tables(excel_path: str, formats: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Mirror every sheet of an existing .xlsx to sidecar tables (the xlsx is left as is)
+
+    Args:
+        formats: Table formats; defaults to reporting.extract_sidecars
+
+    Returns:
+        The tables directory, or None when no format is configured
+    """
+    formats = extract_table_formats() if formats is None else formats
+    if not formats:
+        return None
+
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        with ReportWriter(excel_path, sidecars=formats, xlsx=False) as tables:
+            for ws in wb.worksheets:
+                tables.add_sheet(ws.title).extend(ws.iter_rows(values_only=True))
+    finally:
+        wb.close()
+    print(f"📑 Sidecar tables written: {sidecar_dir_for(excel_path)}")
+    return sidecar_dir_for(excel_path)
+
+
+def collect_tables(root_dir: str, output_path: str, sheet: Optional[str] = None) -> int:
+    """
+    Concatenate sidecar tables found under root_dir into one table for historical analysis
+
+    Each output row is prefixed with the run directory, source workbook and
+    sheet title; the header comes from the first table found and columns
+    are aligned by position. Written as Parquet when output_path ends in .parquet and
+    pyarrow is installed, CSV otherwise.
+
+    Args:
+        sheet: Only collect sheets with this title
+
+    Returns:
+        Number of data rows written
+    """
+    if output_path.endswith(".parquet") and not PYARROW_AVAILABLE:
+        output_path = os.path.splitext(output_path)[0] + ".csv"
+        print("⚠️ pyarrow not installed, collecting tables as CSV")
+    out = _ParquetSidecar(output_path) if output_path.endswith(".parquet") else _CsvSidecar(output_path)
+
+    header_written = False
+    rows = 0
+    for dirpath, _, filenames in sorted(os.walk(root_dir)):
+        if SIDECAR_INDEX not in filenames:
+            continue
+        with open(os.path.join(dirpath, SIDECAR_INDEX), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        workbook = SidecarWorkbook(dirpath)
+        run = os.path.relpath(os.path.dirname(dirpath), root_dir)
+        for title in workbook.sheetnames:
+            if sheet is not None and title != sheet:
+                continue
+            sheet_rows = workbook[title].iter_rows(values_only=True)
+            header = next(sheet_rows, ())
+            if not header_written:
+                out.append(["run", "source", "sheet"] + list(header))
+                header_written = True
+            for row in sheet_rows:
+                out.append([run, index.get('source'), title] + list(row))
+                rows += 1
+    out.close()
+    print(f"📚 Collected {rows} rows into: {output_path}")
+    return rows
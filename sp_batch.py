@@ -0,0 +1,141 @@
+"""
+STORED PROCEDURE BATCHING
+=========================
+Share stored procedure results between comparisons queued together.
+
+BackgroundProcessor collects the tasks queued within a short window
+(performance.parallel_processing.batch_window), groups the ones that need
+the same (SP, params) pairs and gives each group one SPBatch. While a task
+runs, its group's batch is the thread's current batch, and every DB fetch
+that goes through execute_sp() is coalesced there: the first task to need
+a pair executes it, concurrent and later tasks of the group wait for and
+reuse the same rows. Outside a batch execute_sp() simply runs the query.
+
+    columns, rows = execute_sp(cursor, "SP_TopProductsBySales", params)
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+_current = threading.local()
+
+
+def positional_sql(sp_name: str, param_count: int = 7) -> str:
+    return f"EXEC [{sp_name}] " + ", ".join("?" * param_count)
+
+
+class SPBatch:
+    """(SP, params) results shared by one group of comparison tasks"""
+
+    def __init__(self, name: str, task_count: int = 1):
+        """
+        Args:
+            name: Label used in log lines
+            task_count: Tasks sharing the batch; results are dropped after the last release()
+        """
+        self.name = name
+        self.executed = 0
+        self.shared = 0
+        self._results: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._remaining = task_count
+
+    def fetch(self, key: Hashable, load: Callable[[], Any]):
+        """Result for key, running load() only if no task of the batch has requested key yet"""
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+                self.executed += 1
+            else:
+                self.shared += 1
+        if owner:
+            try:
+                future.set_result(load())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def release(self):
+        """One task of the batch finished; the last one frees the cached rows"""
+        with self._lock:
+            self._remaining -= 1
+            if self._remaining > 0:
+                return
+            self._results = {}
+        if self.executed:
+            print(f"🧺 {self.name}: {self.executed} SP calls executed, {self.shared} served from the batch")
+
+
+class batch_scope:
+    """Make batch the current thread's SPBatch (None: no batching) for the with-block"""
+
+    def __init__(self, batch: Optional[SPBatch]):
+        self.batch = batch
+
+    def __enter__(self):
+        self._previous = getattr(_current, "batch", None)
+        _current.batch = self.batch
+        return self.batch
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.batch = self._previous
+        return False
+
+
+def current_batch() -> Optional[SPBatch]:
+    return getattr(_current, "batch", None)
+
+
+def execute_sp(cursor, sp_name: str, params: Tuple, sql: Optional[str] = None,
+               sql_params: Optional[Tuple] = None) -> Tuple[List[str], List[Any]]:
+    """
+    Execute a stored procedure and fetch all rows, coalesced within the current batch
+
+    Args:
+        params: The SP parameters; (sp_name, params) is the batch key
+        sql: Statement to run (defaults to positional "EXEC [sp] ?, ..., ?")
+        sql_params: Values bound to sql (defaults to params)
+
+    Returns:
+        (columns, rows)
+    """
+    def load():
+        bound = params if sql_params is None else sql_params
+        if bound:
+            cursor.execute(sql or positional_sql(sp_name, len(params)), bound)
+        else:
+            cursor.execute(sql)
+        rows = cursor.fetchall()
+        return [desc[0] for desc in cursor.description], rows
+
+    batch = current_batch()
+    if batch is None:
+        return load()
+    return batch.fetch((sp_name, tuple(params)), load)
+
+
+def group_by_requirements(requirements: List[set]) -> List[List[int]]:
+    """
+    Group tasks that share at least one (SP, params) pair
+
+    Args:
+        requirements: Per task, the set of (SP, params) keys it is expected to need
+
+    Returns:
+        Lists of task indexes; tasks needing nothing in common end up in separate groups
+    """
+    groups: List[Tuple[set, List[int]]] = []
+    for index, needed in enumerate(requirements):
+        merged_keys, merged_tasks = set(needed), [index]
+        remaining = []
+        for keys, tasks in groups:
+            if keys & merged_keys:
+                merged_keys |= keys
+                merged_tasks = tasks + merged_tasks
+            else:
+                remaining.append((keys, tasks))
+        groups = remaining + [(merged_keys, merged_tasks)]
+    return [sorted(tasks) for _, tasks in groups]
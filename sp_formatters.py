@@ -0,0 +1,311 @@
+"""
+SP OUTPUT FORMATTER REGISTRY
+============================
+Pluggable formatters that turn stored procedure result sets into the
+"{sheet_name} - {identifier}" keyed values used by the comparison engine.
+
+Each formatter is registered for one output pattern (see sp_output_patterns
+in config/dynamic_engine_config.yaml), receives a column-index map computed
+once per result set and formats all rows in a single batch. A result set
+lacking the pattern's required_columns is formatted with generic instead.
+
+New SP shapes can be added from any module:
+
+    @register_formatter("my_pattern")
+    def format_my_pattern(result, columns, col_index, sheet_name):
+        ...
+
+and listed under formatter_plugins in dynamic_engine_config.yaml so they are
+imported on first use.
+"""
+
+import importlib
+from typing import Dict, Any, List, Callable, Optional
+
+from config_loader import config_loader
+
+MONTH_ABBREVIATIONS = {
+    'January': 'Jan', 'February': 'Feb', 'March': 'Mar', 'April': 'Apr',
+    'May': 'May', 'June': 'Jun', 'July': 'Jul', 'August': 'Aug',
+    'September': 'Sep', 'October': 'Oct', 'November': 'Nov', 'December': 'Dec'
+}
+
+
+class SPFormatter:
+    """A registered formatter plugin for one SP output pattern"""
+
+    def __init__(self, output_pattern: str, func: Callable, required_columns: Optional[List[str]] = None):
+        self.output_pattern = output_pattern
+        self.func = func
+        self._required_columns = required_columns
+
+    @property
+    def required_columns(self) -> List[str]:
+        """Required columns declared in code, else from sp_output_patterns in the YAML"""
+        if self._required_columns is None:
+            patterns = config_loader.get_dynamic_engine_config().get("sp_output_patterns", {}) or {}
+            self._required_columns = (patterns.get(self.output_pattern) or {}).get("required_columns", [])
+        return self._required_columns
+
+    @staticmethod
+    def column_index(columns: List[str]) -> Dict[str, int]:
+        """Map column name -> position (last duplicate wins, like dict(zip(...)))"""
+        return {col: i for i, col in enumerate(columns)}
+
+    def missing_columns(self, columns: List[str]) -> List[str]:
+        """
+        Required column tokens that do not appear in any result column
+
+        An entry may be a list of alternatives (["daytype", "weekcategory"]): it is
+        satisfied when any of them appears, and reported as "daytype|weekcategory".
+        """
+        col_text = ' '.join(columns).lower()
+        missing = []
+        for required in self.required_columns:
+            alternatives = [required] if isinstance(required, str) else list(required)
+            if not any(col.lower() in col_text for col in alternatives):
+                missing.append('|'.join(alternatives))
+        return missing
+
+    def format(self, result, columns: List[str], sheet_name: str) -> Dict[str, str]:
+        """Format a whole result set in one batch (generic when required columns are missing)"""
+        missing = self.missing_columns(columns)
+        if missing and self.output_pattern != 'generic':
+            print(f"   ⚠️ {self.output_pattern}: {sheet_name} result lacks {missing} in {columns}, "
+                  f"using generic formatting")
+            return FORMATTER_REGISTRY['generic'].format(result, columns, sheet_name)
+        return self.func(result, columns, self.column_index(columns), sheet_name)
+
+
+FORMATTER_REGISTRY: Dict[str, SPFormatter] = {}
+_plugins_loaded = False
+
+
+def register_formatter(output_pattern: str, required_columns: Optional[List[str]] = None):
+    """Decorator registering a batch formatter for an SP output pattern"""
+    def decorator(func):
+        FORMATTER_REGISTRY[output_pattern] = SPFormatter(output_pattern, func, required_columns)
+        return func
+    return decorator
+
+
+def load_formatter_plugins(module_names: Optional[List[str]] = None):
+    """Import modules that register additional formatters"""
+    global _plugins_loaded
+    if module_names is None:
+        if _plugins_loaded:
+            return
+        _plugins_loaded = True
+        module_names = config_loader.get_dynamic_engine_config().get("formatter_plugins", []) or []
+
+    for module_name in module_names:
+        try:
+            importlib.import_module(module_name)
+            print(f"🧩 Loaded formatter plugin: {module_name}")
+        except Exception as e:
+            print(f"⚠️ Could not load formatter plugin {module_name}: {e}")
+
+
+def get_formatter(output_pattern: str) -> SPFormatter:
+    """Look up the formatter for an output pattern, falling back to generic"""
+    load_formatter_plugins()
+    return FORMATTER_REGISTRY.get(output_pattern) or FORMATTER_REGISTRY['generic']
+
+
+def format_sp_data(result, columns: List[str], sheet_name: str, output_pattern: str) -> Dict[str, str]:
+    """Format SP data based on detected output pattern"""
+    return get_formatter(output_pattern).format(result, columns, sheet_name)
+
+
+def _value(row, idx, default=None):
+    return row[idx] if idx is not None else default
+
+
+def _format_name_sales(result, col_index, sheet_name, name_column):
+    """Shared batch body for <Entity>Name / Sales result sets"""
+    name_idx = col_index.get(name_column)
+    sales_idx = col_index.get('Sales')
+    data = {}
+    if sales_idx is None:
+        return data
+    for row in result:
+        sales = row[sales_idx]
+        if sales is not None:
+            data[f"{sheet_name} - {str(_value(row, name_idx, 'Unknown')).strip()}"] = str(sales).strip()
+    return data
+
+
+def _format_identifier_sales(result, identifier_idx, sales_idx, target_idx, sheet_name):
+    """Shared batch body for identifier / sales / optional target result sets"""
+    data = {}
+    for row in result:
+        identifier = str(row[identifier_idx]).strip()
+        sales = row[sales_idx]
+        if sales is not None:
+            data[f"{sheet_name} - {identifier}"] = str(sales).strip()
+        if target_idx is not None and row[target_idx] is not None:
+            data[f"{sheet_name} - {identifier} Target"] = str(row[target_idx]).strip()
+    return data
+
+
+@register_formatter('monthly_trends')
+def format_monthly_trends(result, columns, col_index, sheet_name):
+    """Format monthly trends data"""
+    month_idx = col_index.get('Month')
+    current_idx = col_index.get('CurrentYearSales')
+    previous_idx = col_index.get('PreviousYearSales')
+    data = {}
+    for row in result:
+        month = str(_value(row, month_idx, 'Unknown')).strip()
+        month = MONTH_ABBREVIATIONS.get(month, month)
+        if current_idx is not None and row[current_idx] is not None:
+            data[f"{sheet_name} - {month} Current Year"] = str(row[current_idx]).strip()
+        if previous_idx is not None and row[previous_idx] is not None:
+            data[f"{sheet_name} - {month} Previous Year"] = str(row[previous_idx]).strip()
+    return data
+
+
+@register_formatter('weekly_trends')
+def format_weekly_trends(result, columns, col_index, sheet_name):
+    """Format weekly trends data (comma-stripped values)"""
+    week_idx = col_index.get('Week')
+    category_idx = col_index.get('WeekCategory')
+    current_idx = col_index.get('CurrentYearSales')
+    previous_idx = col_index.get('PreviousYearSales')
+    data = {}
+    for row in result:
+        week = str(_value(row, week_idx) or _value(row, category_idx, 'Unknown')).strip()
+        if current_idx is not None and row[current_idx] is not None:
+            data[f"{sheet_name} - {week} Current Year"] = str(row[current_idx]).replace(',', '').strip()
+        if previous_idx is not None and row[previous_idx] is not None:
+            data[f"{sheet_name} - {week} Previous Year"] = str(row[previous_idx]).replace(',', '').strip()
+    print(f"🔍 Weekly trends for {sheet_name}: {len(data)} values from columns {columns}")
+    return data
+
+
+@register_formatter('weekday_weekend')
+def format_weekday_weekend(result, columns, col_index, sheet_name):
+    """Format weekday/weekend data"""
+    day_idx = col_index.get('DayType')
+    category_idx = col_index.get('WeekCategory')
+    current_idx = col_index.get('CurrentYearSales')
+    previous_idx = col_index.get('PreviousYearSales')
+    data = {}
+    for row in result:
+        day_type = str(_value(row, day_idx) or _value(row, category_idx, 'Unknown')).strip().upper()
+        if current_idx is not None and row[current_idx] is not None:
+            data[f"{sheet_name} - {day_type} SALES Current Year"] = str(row[current_idx]).strip()
+        if previous_idx is not None and row[previous_idx] is not None:
+            data[f"{sheet_name} - {day_type} SALES Previous Year"] = str(row[previous_idx]).strip()
+    return data
+
+
+@register_formatter('product_sales')
+def format_product_sales(result, columns, col_index, sheet_name):
+    """Format product sales data"""
+    return _format_name_sales(result, col_index, sheet_name, 'ProductName')
+
+
+@register_formatter('brand_sales')
+def format_brand_sales(result, columns, col_index, sheet_name):
+    """Format brand sales data"""
+    return _format_name_sales(result, col_index, sheet_name, 'BrandName')
+
+
+@register_formatter('employee_performance')
+def format_employee_performance(result, columns, col_index, sheet_name):
+    """Format employee performance data"""
+    return _format_name_sales(result, col_index, sheet_name, 'EmployeeName')
+
+
+@register_formatter('category_sales')
+def format_category_sales(result, columns, col_index, sheet_name):
+    """Format category sales data"""
+    return _format_name_sales(result, col_index, sheet_name, 'CategoryName')
+
+
+@register_formatter('store_sales')
+def format_store_sales(result, columns, col_index, sheet_name):
+    """Format store sales data"""
+    identifier_idx = sales_idx = target_idx = None
+    for i, col in enumerate(columns):
+        col_lower = col.lower()
+        if any(x in col_lower for x in ['storename', 'store', 'identifier']):
+            identifier_idx = i
+        elif any(x in col_lower for x in ['actual sales', 'sales', 'actual']):
+            sales_idx = i
+        elif 'target' in col_lower:
+            target_idx = i
+
+    if identifier_idx is None or sales_idx is None:
+        print(f"   ❌ Could not identify store columns in {columns}, using generic formatting")
+        return format_generic_sales(result, columns, col_index, sheet_name)
+
+    data = _format_identifier_sales(result, identifier_idx, sales_idx, target_idx, sheet_name)
+    print(f"🔍 Store sales for {sheet_name}: {len(data)} values "
+          f"(identifier={columns[identifier_idx]}, sales={columns[sales_idx]}, "
+          f"target={columns[target_idx] if target_idx is not None else None})")
+    return data
+
+
+@register_formatter('metric_value_pairs')
+def format_metric_value_pairs(result, columns, col_index, sheet_name):
+    """Format metric-value pair data"""
+    identifier_idx = col_index.get('Identifier')
+    metric_idx = col_index.get('Metric')
+    value_idx = col_index.get('Excel Value')
+    data = {}
+    if value_idx is None:
+        return data
+    for row in result:
+        value = row[value_idx]
+        if value is None:
+            continue
+        identifier = str(_value(row, identifier_idx, 'Unknown')).strip()
+        metric = str(_value(row, metric_idx, '')).strip()
+        metric_lower = metric.lower()
+        if metric_lower == 'actual sales':
+            key = f"{sheet_name} - {identifier}"
+        elif metric_lower == 'target':
+            key = f"{sheet_name} - {identifier} Target"
+        else:
+            key = f"{sheet_name} - {identifier} {metric}"
+        data[key] = str(value).replace(',', '').strip()
+    print(f"🔍 Metric-value pairs for {sheet_name}: {len(data)} values")
+    return data
+
+
+@register_formatter('generic_sales')
+def format_generic_sales(result, columns, col_index, sheet_name):
+    """Format generic sales data with identifier and sales columns"""
+    identifier_idx = sales_idx = target_idx = None
+    for i, col in enumerate(columns):
+        col_lower = col.lower()
+        if 'identifier' in col_lower:
+            identifier_idx = i
+        elif any(x in col_lower for x in ['name', 'store', 'product', 'brand']) and identifier_idx is None:
+            identifier_idx = i
+        elif any(x in col_lower for x in ['actual sales', 'sales', 'actual']):
+            sales_idx = i
+        elif 'target' in col_lower:
+            target_idx = i
+
+    if identifier_idx is None or sales_idx is None:
+        print(f"   ❌ Could not identify identifier or sales columns in {columns}")
+        return {}
+
+    data = _format_identifier_sales(result, identifier_idx, sales_idx, target_idx, sheet_name)
+    print(f"🔍 Generic sales for {sheet_name}: {len(data)} values")
+    return data
+
+
+@register_formatter('generic')
+def format_generic(result, columns, col_index, sheet_name):
+    """Generic data formatting (fallback)"""
+    data = {}
+    if result and len(columns) >= 2:
+        for row in result:
+            identifier = str(row[0]).strip() if row[0] else "Unknown"
+            value = str(row[1]).strip() if row[1] is not None else "0"
+            data[f"{sheet_name} - {identifier}"] = value
+    return data
@@ -0,0 +1,214 @@
+"""
+COMPILED SHEET-TO-SP MATCHER
+============================
+Table-driven scoring of Excel sheets against stored procedures.
+
+All pattern tables come from config/dynamic_engine_config.yaml and are
+compiled once (regexes, keyword sets, boost decision table), so adding a
+widget is a config change rather than a code change.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+from config_loader import config_loader
+
+
+class CompiledSPMatcher:
+    """Score sheets against stored procedures using precompiled config tables"""
+
+    def __init__(self, engine_config: Dict[str, Any]):
+        """
+        Compile matcher tables from the dynamic engine configuration
+
+        Args:
+            engine_config: Parsed dynamic_engine_config.yaml
+        """
+        engine_config = engine_config or {}
+        recognition = engine_config.get("pattern_recognition", {}) or {}
+        scoring = engine_config.get("scoring_system", {}) or {}
+        boosts = scoring.get("sp_specific_boost", {}) or {}
+
+        self.direct_name_match = scoring.get("direct_name_match", 0.8)
+        self.pattern_match = scoring.get("pattern_match", 0.4)
+        self.data_volume_bonus = scoring.get("data_volume_bonus", 0.1)
+        self.column_compatibility_bonus = scoring.get("column_compatibility_bonus", 0.1)
+        self.minimum_confidence = scoring.get("minimum_confidence_threshold", 0.3)
+
+        # Data pattern keyword sets, in config order (time, entity, value)
+        self.data_pattern_keywords = []
+        for group in (engine_config.get("data_patterns", {}) or {}).values():
+            for pattern_name, pattern_info in (group or {}).items():
+                keywords = tuple(k.lower() for k in pattern_info.get("keywords", []))
+                self.data_pattern_keywords.append((pattern_name, keywords))
+
+        # Regex suggestions for sheet analysis
+        self.suggestion_patterns = [
+            (re.compile(entry["pattern"]), entry["pattern"], entry["sp"])
+            for entry in recognition.get("suggestion_patterns", []) or []
+        ]
+
+        # Direct name mappings: (name pattern, SP with targets, SP without targets)
+        self.direct_entries = []
+        for entries in (recognition.get("direct_mappings", {}) or {}).values():
+            for entry in entries or []:
+                with_targets = entry.get("with_targets")
+                without_targets = entry.get("without_targets", entry.get("sp"))
+                self.direct_entries.append((entry["pattern"], with_targets, without_targets))
+
+        self.output_pattern_compatibility = {
+            pattern: frozenset(sheet_patterns)
+            for pattern, sheet_patterns in (recognition.get("output_pattern_compatibility", {}) or {}).items()
+        }
+
+        # Boost decision table: (sp, contains, excludes, requires, excludes_patterns, boost)
+        self.boost_rules = []
+        for rule in recognition.get("sp_boost_rules", []) or []:
+            self.boost_rules.append((
+                rule["sp"],
+                tuple(rule.get("sheet_contains", [])),
+                tuple(rule.get("sheet_excludes", [])),
+                frozenset(rule.get("requires_patterns", [])),
+                frozenset(rule.get("excludes_patterns", [])),
+                boosts.get(rule.get("boost"), 0.0)
+            ))
+
+        self._sp_cache = {}
+
+    # Sheet analysis helpers
+
+    def detect_data_patterns(self, headers: List[str]) -> List[str]:
+        """Detect data patterns from headers using the compiled keyword sets"""
+        header_text = ' '.join(headers).lower()
+        patterns = [
+            name for name, keywords in self.data_pattern_keywords
+            if any(keyword in header_text for keyword in keywords)
+        ]
+        return patterns if patterns else ['generic_data']
+
+    def suggest_stored_procedures(self, sheet_name: str, headers: List[str]) -> List[Dict[str, Any]]:
+        """Suggest stored procedures from the compiled regex table"""
+        combined_text = f"{sheet_name.lower()} {' '.join(headers).lower()}"
+
+        suggestions = [
+            {'sp_name': sp_name, 'confidence': 0.8, 'reason': f'Pattern match: {source}'}
+            for regex, source, sp_name in self.suggestion_patterns
+            if regex.search(combined_text)
+        ]
+
+        if not suggestions and 'sales' in combined_text:
+            suggestions.append({
+                'sp_name': 'SP_TopProductsBySales',
+                'confidence': 0.5,
+                'reason': 'Generic sales data'
+            })
+
+        return suggestions
+
+    # Scoring
+
+    def _compile_sheet(self, sheet_info: Dict[str, Any]) -> tuple:
+        """Evaluate every sheet-side condition of the decision table once"""
+        sheet_name = sheet_info['original_name'].lower()
+        sheet_patterns = frozenset(sheet_info['data_patterns'])
+
+        targets_case = 'target_data' in sheet_patterns and any(
+            with_targets and pattern in sheet_name
+            for pattern, with_targets, _ in self.direct_entries
+        )
+        direct_hits = frozenset(i for i, (pattern, _, _) in enumerate(self.direct_entries) if pattern in sheet_name)
+        rule_hits = [
+            all(s in sheet_name for s in contains)
+            and not any(s in sheet_name for s in excludes)
+            and requires <= sheet_patterns
+            and not (excluded & sheet_patterns)
+            for _, contains, excludes, requires, excluded, _ in self.boost_rules
+        ]
+        return sheet_patterns, targets_case, direct_hits, rule_hits, bool(sheet_info['key_columns'])
+
+    def _compile_sp(self, sp_name: str, sp_info: Dict[str, Any]) -> tuple:
+        """Resolve the SP-side columns of the decision table (cached per SP/output shape)"""
+        cache_key = (sp_name, sp_info['output_pattern'], sp_info['row_count'] > 0, bool(sp_info['columns']))
+        compiled = self._sp_cache.get(cache_key)
+        if compiled is None:
+            direct_normal = frozenset(i for i, (_, _, sp) in enumerate(self.direct_entries) if sp and sp in sp_name)
+            direct_targets = frozenset(i for i, (_, sp, _) in enumerate(self.direct_entries) if sp and sp in sp_name)
+            rule_indices = [i for i, rule in enumerate(self.boost_rules) if rule[0] in sp_name]
+            static_bonus = self.data_volume_bonus if sp_info['row_count'] > 0 else 0.0
+            compiled = (
+                direct_normal,
+                direct_targets,
+                self.output_pattern_compatibility.get(sp_info['output_pattern'], frozenset()),
+                rule_indices,
+                static_bonus,
+                bool(sp_info['columns'])
+            )
+            self._sp_cache[cache_key] = compiled
+        return compiled
+
+    def _score_compiled(self, sheet: tuple, sp: tuple) -> float:
+        sheet_patterns, targets_case, direct_hits, rule_hits, has_key_columns = sheet
+        direct_normal, direct_targets, compatible, rule_indices, static_bonus, has_columns = sp
+
+        score = 0.0
+        if direct_hits & (direct_targets if targets_case else direct_normal):
+            score += self.direct_name_match
+
+        if compatible & sheet_patterns:
+            score += self.pattern_match
+
+        for i in rule_indices:
+            if rule_hits[i]:
+                score += self.boost_rules[i][5]
+                break
+
+        score += static_bonus
+        if has_key_columns and has_columns:
+            score += self.column_compatibility_bonus
+
+        return min(score, 1.0)
+
+    def score(self, sheet_info: Dict[str, Any], sp_name: str, sp_info: Dict[str, Any]) -> float:
+        """Score a single sheet against a single SP"""
+        return self._score_compiled(self._compile_sheet(sheet_info), self._compile_sp(sp_name, sp_info))
+
+    def score_all(self, excel_analysis: Dict[str, Dict], working_sps: Dict[str, Dict]) -> Dict[str, Dict[str, float]]:
+        """
+        Score every sheet against every SP in a single pass
+
+        Returns:
+            {sheet_name: {sp_name: score}} preserving sheet and SP order
+        """
+        compiled_sps = [(sp_name, self._compile_sp(sp_name, sp_info)) for sp_name, sp_info in working_sps.items()]
+        matrix = {}
+        for sheet_name, sheet_info in excel_analysis.items():
+            sheet = self._compile_sheet(sheet_info)
+            matrix[sheet_name] = {sp_name: self._score_compiled(sheet, sp) for sp_name, sp in compiled_sps}
+        return matrix
+
+    def best_match(self, sheet_info: Dict[str, Any], scores: Dict[str, float],
+                   working_sps: Dict[str, Dict]) -> Optional[Dict[str, Any]]:
+        """Pick the highest scoring SP (first wins on ties) above the confidence threshold"""
+        best_sp = None
+        best_score = 0
+        for sp_name, score in scores.items():
+            if score > best_score:
+                best_sp, best_score = sp_name, score
+
+        if best_sp is None or best_score <= self.minimum_confidence:
+            return None
+
+        return {
+            'sp_name': best_sp,
+            'confidence': best_score,
+            'output_pattern': working_sps[best_sp]['output_pattern'],
+            'key_columns': sheet_info['key_columns'],
+            'data_patterns': sheet_info['data_patterns']
+        }
+
+
+@lru_cache(maxsize=1)
+def get_sp_matcher() -> CompiledSPMatcher:
+    """Return the process-wide matcher compiled from dynamic_engine_config.yaml"""
+    return CompiledSPMatcher(config_loader.get_dynamic_engine_config())
@@ -0,0 +1,48 @@
+"""
+WIDGET STORED PROCEDURE PARAMETERS
+==================================
+The (year, month, store, state, channel, fromdate, todate) tuples widget
+SPs are executed with, in one place for the code that runs them and the
+BackgroundProcessor batch coalescer that predicts them.
+
+Landing parameters come from default_parameters in
+config/drillthrough_filters.yaml. A drillthrough runs with the landing
+parameters, narrowed to a store when its submenu names one the SPs can
+filter on; every other drillthrough filter is not supported by the SPs.
+
+This module has no database or comparison imports, so predicting a task's
+SP calls never opens a connection.
+"""
+
+from typing import Optional
+
+from config_loader import config_loader
+
+# Submenus (store names, or store IDs given directly) the drillthrough SPs filter by store
+DRILLTHROUGH_STORE_IDS = {
+    "Love Library": "717",
+    "717": "717",
+}
+
+
+def landing_params() -> tuple:
+    """Landing page widget SP parameters"""
+    return config_loader.get_default_parameters()
+
+
+def drillthrough_store_id(submenu_selection) -> Optional[str]:
+    """Store ID (string, for the nvarchar parameter) a drillthrough submenu filters by, if any"""
+    if submenu_selection in DRILLTHROUGH_STORE_IDS:
+        return DRILLTHROUGH_STORE_IDS[submenu_selection]
+    if str(submenu_selection).isdigit():
+        return str(submenu_selection)
+    return None
+
+
+def drillthrough_params(submenu_selection) -> tuple:
+    """Drillthrough widget SP parameters for a submenu selection"""
+    params = landing_params()
+    store_id = drillthrough_store_id(submenu_selection)
+    if store_id:
+        return params[:2] + (store_id,) + params[3:]
+    return params
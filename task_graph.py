@@ -0,0 +1,328 @@
+"""
+VALIDATION PIPELINE TASK GRAPH
+==============================
+Lightweight DAG executor for the validation run, on asyncio. Each stage
+declares the artifacts it reads (inputs) and produces (outputs) and runs as
+a coroutine awaiting those inputs, so independent work (a DB fetch while
+the browser is still extracting) overlaps with as much concurrency as the
+dependencies, the worker count and the shared resources allow.
+
+Blocking stage functions (Selenium, pyodbc) run on bounded executors: one
+per resource, sized to its capacity, and a shared one for the rest. The
+run has one browser session, so every "browser" stage holds the single
+browser slot: browser stages still run one at a time, always on the same
+thread. Coroutine stage functions run on the event loop itself, e.g. to
+await background comparison futures instead of blocking a thread.
+
+    graph = TaskGraph("validation", max_workers=4, resources={"browser": 1, "db": 2})
+    graph.add_stage("kpi_extract", extract, inputs=["driver"], outputs=["kpi_excel"],
+                    kind="browser", resource="browser")
+    graph.add_stage("kpi_db_fetch", fetch, outputs=["db_kpis"], kind="db", resource="db")
+    graph.add_stage("kpi_compare", compare, inputs=["kpi_excel", "db_kpis"], kind="compare")
+    artifacts = graph.run(driver=driver)   # or: await graph.run_async(driver=driver)
+    graph.write_critical_path_report("download/pipeline_critical_path.xlsx")
+
+A stage function receives its inputs as keyword arguments and returns its
+output (a tuple for several outputs). When a stage raises, stages needing
+its outputs are skipped, unless it is optional: then its outputs are None
+and the run carries on.
+"""
+
+import asyncio
+import contextlib
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from report_writer import ReportWriter
+
+STAGE_KINDS = ("browser", "db", "compare", "report", "setup")
+
+_MISSING = object()  # Output of a stage that failed or was skipped
+
+
+class Stage:
+    """One node of the graph plus its run record"""
+
+    def __init__(self, name: str, func: Callable, inputs: Sequence[str] = (), outputs: Sequence[str] = (),
+                 kind: str = "compare", resource: Optional[str] = None, optional: bool = False):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.kind = kind
+        self.resource = resource
+        self.optional = optional
+        self.status = 'pending'  # pending, active, completed, failed, skipped
+        self.ready_at = None
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    @property
+    def duration(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+class TaskGraph:
+    """Run stages as soon as their inputs exist and report the run's critical path"""
+
+    def __init__(self, name: str = "pipeline", max_workers: int = 4, resources: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            name: Label used in log lines
+            max_workers: Stages running at the same time
+            resources: Capacity per named resource (e.g. {"browser": 1})
+        """
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.resources = dict(resources or {})
+        self.stages: Dict[str, Stage] = {}
+        self.artifacts: Dict[str, Any] = {}
+        self._producers: Dict[str, str] = {}
+        self._outputs: Dict[str, asyncio.Future] = {}
+        self.started_at = None
+        self.finished_at = None
+
+    def add_stage(self, name: str, func: Callable, inputs: Sequence[str] = (), outputs: Sequence[str] = (),
+                  kind: str = "compare", resource: Optional[str] = None, optional: bool = False) -> Stage:
+        """Declare a stage; see Stage for the arguments"""
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        if kind not in STAGE_KINDS:
+            raise ValueError(f"Unknown stage kind '{kind}' (expected one of {STAGE_KINDS})")
+        if resource is not None and resource not in self.resources:
+            raise ValueError(f"Stage {name} uses undeclared resource '{resource}'")
+        for output in outputs:
+            if output in self._producers:
+                raise ValueError(f"Artifact '{output}' produced by both {self._producers[output]} and {name}")
+            self._producers[output] = name
+        stage = Stage(name, func, inputs, outputs, kind, resource, optional)
+        self.stages[name] = stage
+        return stage
+
+    def dependencies(self, stage: Stage) -> List[str]:
+        """Names of the stages producing stage's inputs"""
+        return sorted({self._producers[i] for i in stage.inputs if i in self._producers},
+                      key=list(self.stages).index)
+
+    def topological_order(self) -> List[str]:
+        """Stage names with every stage after the stages it depends on"""
+        # Kahn's algorithm: anything left over sits on a cycle
+        remaining = {name: set(self.dependencies(stage)) for name, stage in self.stages.items()}
+        order = []
+        while remaining:
+            done = [name for name, deps in remaining.items() if not deps]
+            if not done:
+                raise ValueError(f"Dependency cycle between stages: {', '.join(sorted(remaining))}")
+            for name in done:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(done)
+            order.extend(done)
+        return order
+
+    def _validate(self, initial: Dict[str, Any]):
+        for stage in self.stages.values():
+            for name in stage.inputs:
+                if name not in self._producers and name not in initial:
+                    raise ValueError(f"Stage {stage.name} needs '{name}', which no stage produces")
+        self.topological_order()
+
+    # Execution
+
+    def run(self, **initial) -> Dict[str, Any]:
+        """Run the graph on a new event loop (see run_async)"""
+        return asyncio.run(self.run_async(**initial))
+
+    async def run_async(self, **initial) -> Dict[str, Any]:
+        """
+        Run every stage whose inputs can be produced
+
+        Each stage is a coroutine awaiting its input artifacts. Coroutine stage
+        functions run on the event loop; blocking ones (Selenium, pyodbc) run on
+        their resource's executor, sized to the resource capacity, or else on a
+        shared executor of max_workers threads.
+
+        Args:
+            **initial: Artifacts available before any stage runs (e.g. driver=...)
+
+        Returns:
+            All artifacts by name (outputs of skipped or failed stages are missing)
+        """
+        self._validate(initial)
+        loop = asyncio.get_running_loop()
+        self.artifacts = dict(initial)
+        self._outputs = {name: loop.create_future() for name in self._producers}
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._resource_slots = {name: asyncio.Semaphore(capacity) for name, capacity in self.resources.items()}
+        self._executors = {name: ThreadPoolExecutor(max_workers=capacity, thread_name_prefix=f"{self.name}-{name}")
+                           for name, capacity in self.resources.items()}
+        self._executors[None] = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        self.started_at = time.time()
+        print(f"🕸️ {self.name}: {len(self.stages)} stages, up to {self.max_workers} at a time"
+              + "".join(f", {name} x{capacity}" for name, capacity in self.resources.items()))
+
+        try:
+            # Tasks start in declaration order, so stages waiting on the same resource queue up in that order
+            await asyncio.gather(*(self._run_stage(stage) for stage in self.stages.values()))
+        finally:
+            for executor in self._executors.values():
+                executor.shutdown(wait=False)
+
+        self.finished_at = time.time()
+        counts = {}
+        for stage in self.stages.values():
+            counts[stage.status] = counts.get(stage.status, 0) + 1
+        print(f"🕸️ {self.name} finished in {self.finished_at - self.started_at:.1f}s: "
+              + ", ".join(f"{count} {status}" for status, count in counts.items()))
+        return self.artifacts
+
+    async def _input(self, name: str):
+        if name in self.artifacts:
+            return self.artifacts[name]
+        return await self._outputs[name]
+
+    async def _run_stage(self, stage: Stage):
+        kwargs = {}
+        for name in stage.inputs:
+            value = await self._input(name)
+            if value is _MISSING:
+                stage.status = 'skipped'
+                stage.error = f"needs output of {self._producers[name]}"
+                print(f"⏭️ {self.name}: skipping {stage.name} ({stage.error})")
+                self._publish(stage, {name: _MISSING for name in stage.outputs})
+                return
+            kwargs[name] = value
+        stage.ready_at = time.time()
+
+        resource_slot = self._resource_slots.get(stage.resource)
+        async with resource_slot if resource_slot else contextlib.nullcontext():
+            async with self._slots:
+                stage.status = 'active'
+                stage.started_at = time.time()
+                try:
+                    if asyncio.iscoroutinefunction(stage.func):
+                        result = await stage.func(**kwargs)
+                    else:
+                        result = await asyncio.get_running_loop().run_in_executor(
+                            self._executors[stage.resource], functools.partial(stage.func, **kwargs))
+                    stage.status = 'completed'
+                except Exception as e:
+                    stage.status, stage.error = 'failed', e
+                    print(f"❌ {self.name}: stage {stage.name} failed: {e}")
+                stage.finished_at = time.time()
+
+        if stage.status == 'completed':
+            if len(stage.outputs) == 1:
+                values = {stage.outputs[0]: result}
+            else:
+                values = dict(zip(stage.outputs, result)) if stage.outputs else {}
+        else:
+            values = {name: None if stage.optional else _MISSING for name in stage.outputs}
+        self._publish(stage, values)
+
+    def _publish(self, stage: Stage, values: Dict[str, Any]):
+        for name, value in values.items():
+            if value is not _MISSING:
+                self.artifacts[name] = value
+            self._outputs[name].set_result(value)
+
+    def failed_stages(self, include_optional: bool = False) -> List[Stage]:
+        return [s for s in self.stages.values()
+                if s.status == 'failed' and (include_optional or not s.optional)]
+
+    # Critical path
+
+    def critical_path(self) -> Dict[str, Any]:
+        """
+        Critical path of the last run over the measured stage durations
+
+        Returns:
+            {'path': [stage names], 'length': seconds, 'wall_time': seconds,
+             'stages': per-stage timing with earliest start, slack and waits}
+
+            length is the run time with unlimited workers and resources; the
+            difference to wall_time is time stages spent waiting for a worker
+            or a resource (e.g. the browser) after their inputs were ready.
+        """
+        order = self.topological_order()
+        earliest_start, earliest_finish, via = {}, {}, {}
+        for name in order:
+            deps = self.dependencies(self.stages[name])
+            via[name] = max(deps, key=lambda d: earliest_finish[d]) if deps else None
+            earliest_start[name] = earliest_finish[via[name]] if deps else 0.0
+            earliest_finish[name] = earliest_start[name] + self.stages[name].duration
+
+        length = max(earliest_finish.values(), default=0.0)
+        successors = {name: [] for name in order}
+        for name in order:
+            for dep in self.dependencies(self.stages[name]):
+                successors[dep].append(name)
+        latest_finish = {}
+        for name in reversed(order):
+            latest_finish[name] = min((latest_finish[s] - self.stages[s].duration for s in successors[name]),
+                                      default=length)
+
+        path = []
+        if earliest_finish:
+            name = max(order, key=lambda n: earliest_finish[n])
+            while name is not None:
+                path.append(name)
+                name = via[name]
+            path.reverse()
+
+        start = self.started_at or 0.0
+        stages = []
+        for name in self.stages:
+            stage = self.stages[name]
+            stages.append({
+                'stage': name,
+                'kind': stage.kind,
+                'status': stage.status,
+                'start': (stage.started_at - start) if stage.started_at else None,
+                'duration': stage.duration,
+                'earliest_start': earliest_start[name],
+                'slack': max(0.0, latest_finish[name] - earliest_finish[name]),
+                'waited': (stage.started_at - stage.ready_at) if stage.started_at and stage.ready_at else 0.0,
+                'critical': name in path,
+                'depends_on': self.dependencies(stage),
+                'error': str(stage.error) if stage.error else ""
+            })
+        wall_time = (self.finished_at - self.started_at) if self.started_at and self.finished_at else 0.0
+        return {'path': path, 'length': length, 'wall_time': wall_time, 'stages': stages}
+
+    def write_critical_path_report(self, output_path: str) -> str:
+        """
+        Report per-stage timing and the critical path of the last run
+
+        Returns:
+            output_path
+        """
+        analysis = self.critical_path()
+        with ReportWriter(output_path) as report:
+            report.write_sheet(
+                "Stages",
+                ["Stage", "Kind", "Status", "Depends On", "Start (s)", "Duration (s)", "Earliest Start (s)",
+                 "Slack (s)", "Waited (s)", "Critical", "Error"],
+                ([s['stage'], s['kind'], s['status'], ", ".join(s['depends_on']),
+                  round(s['start'], 3) if s['start'] is not None else "", round(s['duration'], 3),
+                  round(s['earliest_start'], 3), round(s['slack'], 3), round(s['waited'], 3),
+                  "Yes" if s['critical'] else "", s['error']] for s in analysis['stages'])
+            )
+            report.write_sheet(
+                "Critical Path",
+                ["Step", "Stage", "Kind", "Duration (s)"],
+                ([i + 1, name, self.stages[name].kind, round(self.stages[name].duration, 3)]
+                 for i, name in enumerate(analysis['path']))
+            )
+        print(f"🧭 Critical path ({analysis['length']:.1f}s of {analysis['wall_time']:.1f}s wall time): "
+              + " → ".join(analysis['path']))
+        waits = [s for s in analysis['stages'] if s['waited'] >= 0.5]
+        for s in sorted(waits, key=lambda s: s['waited'], reverse=True)[:3]:
+            print(f"⏳ {s['stage']} waited {s['waited']:.1f}s for a worker or its resource after its inputs were ready")
+        print(f"📄 Critical path report: {output_path}")
+        return output_path
@@ -0,0 +1,127 @@
+"""
+BACKGROUND TASK JOURNAL
+=======================
+Crash-safe record of every background comparison in a small SQLite file
+(performance.task_journal.path, default download/.task_journal.sqlite).
+
+BackgroundProcessor writes a row when a task is queued, started and
+finished. Each row holds the task payload (type, Excel input and output
+paths, parameters), so after a crash, a kill or a timeout the comparisons
+that never finished can be re-queued from their on-disk inputs
+(BackgroundProcessor.resume_from_journal) without re-driving the browser:
+
+    python background_processor.py --resume
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config_loader import config_loader
+from virtual_workbook import is_virtual_workbook, load_manifest
+
+UNFINISHED_STATUSES = ('queued', 'active')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    queued_at REAL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT
+)
+"""
+
+
+def journal_config() -> Dict[str, Any]:
+    performance = config_loader.get_dynamic_engine_config().get("performance", {}) or {}
+    return performance.get("task_journal", {}) or {}
+
+
+def inputs_available(excel_path: str) -> bool:
+    """True when a task's Excel input (or every download behind a manifest) is still on disk"""
+    if not excel_path or not os.path.exists(excel_path):
+        return False
+    if is_virtual_workbook(excel_path):
+        return all(os.path.exists(entry['path']) for entry in load_manifest(excel_path)['sheets'])
+    return True
+
+
+class TaskJournal:
+    """SQLite journal of background tasks; safe to use from executor callback threads"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None  # Opened on first use, so importing the processor creates no files
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit: every state change is durable as soon as the call returns
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(_SCHEMA)
+        return conn
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            return self._conn.execute(sql, params).fetchall()
+
+    def record_queued(self, task: Dict[str, Any], run_id: str):
+        """Insert a queued task; a resumed task keeps its row and counts another attempt"""
+        self._execute(
+            "INSERT INTO tasks (id, run_id, type, payload, status, priority, queued_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET run_id = excluded.run_id, status = 'queued', "
+            "attempts = attempts + 1, queued_at = excluded.queued_at, started_at = NULL, finished_at = NULL, result = NULL",
+            (task['id'], run_id, task['type'], json.dumps(task, default=str), task.get('priority'), time.time())
+        )
+
+    def record_started(self, task_id: str):
+        self._execute("UPDATE tasks SET status = 'active', started_at = ? WHERE id = ?", (time.time(), task_id))
+
+    def record_finished(self, task_id: str, status: str, result: Optional[Dict[str, Any]] = None):
+        self._execute(
+            "UPDATE tasks SET status = ?, finished_at = ?, result = ? WHERE id = ?",
+            (status, time.time(), json.dumps(result, default=str) if result is not None else None, task_id)
+        )
+
+    def set_status(self, task_id: str, status: str):
+        self._execute("UPDATE tasks SET status = ? WHERE id = ?", (status, task_id))
+
+    def unfinished(self, exclude_run: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Payloads of tasks queued or running when their run ended, oldest first"""
+        rows = self._execute(
+            f"SELECT payload, attempts FROM tasks WHERE status IN ({', '.join('?' * len(UNFINISHED_STATUSES))}) "
+            "AND run_id != ? ORDER BY queued_at",
+            UNFINISHED_STATUSES + (exclude_run or "",)
+        )
+        tasks = []
+        for payload, attempts in rows:
+            task = json.loads(payload)
+            task['attempts'] = attempts
+            tasks.append(task)
+        return tasks
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._execute("SELECT status, COUNT(*) FROM tasks GROUP BY status"))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
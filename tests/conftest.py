@@ -0,0 +1,44 @@
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def repo_cwd(monkeypatch):
+    """config_loader reads config/ relative to the working directory"""
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture
+def make_processor(monkeypatch, tmp_path):
+    """
+    BackgroundProcessor factory that needs no database: the comparison
+    engine (which opens a pyodbc connection) is replaced, batching is off,
+    and spill files and the journal live under tmp_path.
+    """
+    engine = types.ModuleType("dynamic_comparison_engine")
+    engine.DynamicComparisonEngine = lambda: None
+    monkeypatch.setitem(sys.modules, "dynamic_comparison_engine", engine)
+    from background_processor import BackgroundProcessor
+    from task_journal import TaskJournal
+
+    processors = []
+
+    def make(execute, queue_limit=0, policy="block", journal=None):
+        processor = BackgroundProcessor(execution_mode="thread", summary_only=False)
+        processor.batch_window = 0
+        processor.queue_limit = queue_limit
+        processor.backpressure_policy = policy
+        processor.spill_dir = str(tmp_path / "spill")
+        processor.journal = TaskJournal(journal) if journal else None
+        processor._execute_task = execute
+        processors.append(processor)
+        return processor
+
+    yield make
+    for processor in processors:
+        processor.shutdown()
@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+
+BLOCKER_TIMEOUT = 10
+
+
+def wait_until_active(processor, count):
+    with processor._tasks_changed:
+        assert processor._tasks_changed.wait_for(lambda: len(processor.active_tasks) == count, BLOCKER_TIMEOUT)
+
+
+def test_refilled_tasks_are_dispatched_by_priority(make_processor):
+    gate = threading.Event()
+    order = []
+
+    def execute(task):
+        if task['id'].startswith('blocker'):
+            assert gate.wait(BLOCKER_TIMEOUT)
+        else:
+            order.append(task['id'])
+        return {'success': True}
+
+    processor = make_processor(execute, policy="spill")
+    for i in range(processor.max_workers):
+        processor._queue_task({'id': f'blocker{i}', 'type': 'kpi_comparison'}, priority=0)
+    wait_until_active(processor, processor.max_workers)
+
+    # Every worker is busy: two tasks fit in memory, the rest are spilled oldest first
+    processor.queue_limit = 2
+    for task_id, priority in [('drill1', 2), ('drill2', 2), ('drill3', 2), ('landing', 1), ('kpi', 0)]:
+        processor._queue_task({'id': task_id, 'type': 'drillthrough_widget_comparison'}, priority=priority)
+    assert processor.spilled_total == 3
+    assert sorted(os.listdir(processor.spill_dir)) == [path.split(os.sep)[-1] for path in processor._spilled]
+
+    gate.set()
+    assert processor.wait_for_completion(BLOCKER_TIMEOUT)
+
+    # Spilled tasks come back in spill order, then queue by priority: once refilled,
+    # the landing and KPI tasks overtake the drillthrough spilled before them
+    assert order == ['drill1', 'drill2', 'landing', 'kpi', 'drill3']
+    assert os.listdir(processor.spill_dir) == []
+    assert all(record['status'] == 'completed' for record in processor.task_records.values())
+
+
+def test_unspilled_tasks_keep_priority_order(make_processor):
+    gate = threading.Event()
+    order = []
+
+    def execute(task):
+        if task['id'].startswith('blocker'):
+            assert gate.wait(BLOCKER_TIMEOUT)
+        else:
+            order.append(task['id'])
+        return {'success': True}
+
+    processor = make_processor(execute)
+    for i in range(processor.max_workers):
+        processor._queue_task({'id': f'blocker{i}', 'type': 'kpi_comparison'}, priority=0)
+    wait_until_active(processor, processor.max_workers)
+    processor._queue_task({'id': 'drill', 'type': 'drillthrough_widget_comparison'})
+    processor._queue_task({'id': 'landing', 'type': 'landing_widget_comparison'})
+    processor._queue_task({'id': 'kpi', 'type': 'kpi_comparison'})
+    processor._queue_task({'id': 'urgent', 'type': 'drillthrough_widget_comparison'}, deadline=60)
+
+    gate.set()
+    assert processor.wait_for_completion(BLOCKER_TIMEOUT)
+    assert order == ['urgent', 'kpi', 'landing', 'drill']
+
+
+def test_non_blocking_submit_spills_instead_of_waiting(make_processor):
+    gate = threading.Event()
+
+    def execute(task):
+        if task['id'].startswith('blocker'):
+            assert gate.wait(BLOCKER_TIMEOUT)
+        return {'success': True}
+
+    processor = make_processor(execute, policy="block")
+    for i in range(processor.max_workers):
+        processor._queue_task({'id': f'blocker{i}', 'type': 'kpi_comparison'}, priority=0)
+    wait_until_active(processor, processor.max_workers)
+    processor.queue_limit = 1
+    processor._queue_task({'id': 'queued', 'type': 'landing_widget_comparison'})
+
+    # Over the limit with the "block" policy: a download event must return at once
+    start = time.time()
+    processor.submit_landing_widget_comparison("widgets.vwb.json", "report.xlsx", block=False)
+    assert time.time() - start < 1
+    assert processor.spilled_total == 1 and processor.producer_wait == 0
+
+    gate.set()
+    assert processor.wait_for_completion(BLOCKER_TIMEOUT)
+    assert all(record['status'] == 'completed' for record in processor.task_records.values())
+
+
+def test_tasks_queueing_work_are_never_blocked(make_processor):
+    gate, parent_gate = threading.Event(), threading.Event()
+    follow_up = threading.Event()
+
+    def execute(task):
+        if task['id'].startswith('blocker'):
+            assert gate.wait(BLOCKER_TIMEOUT)
+        elif task['id'] == 'parent':
+            assert parent_gate.wait(BLOCKER_TIMEOUT)
+            # Runs on a pool thread; waiting here for queue room would hold a thread the queue needs
+            processor.submit_kpi_comparison("kpi.xlsx", "kpi_cmp.xlsx")
+            follow_up.set()
+        return {'success': True}
+
+    processor = make_processor(execute, policy="block")
+    for i in range(processor.max_workers - 1):
+        processor._queue_task({'id': f'blocker{i}', 'type': 'kpi_comparison'}, priority=0)
+    processor._queue_task({'id': 'parent', 'type': 'kpi_comparison'}, priority=0)
+    wait_until_active(processor, processor.max_workers)
+    processor.queue_limit = 1
+    processor._queue_task({'id': 'queued', 'type': 'landing_widget_comparison'})
+
+    parent_gate.set()
+    assert follow_up.wait(BLOCKER_TIMEOUT)
+    assert processor.spilled_total == 1 and processor.producer_wait == 0
+
+    gate.set()
+    assert processor.wait_for_completion(BLOCKER_TIMEOUT)
+
+
+def test_shutdown_runs_tasks_queued_behind_slow_ones(make_processor):
+    gate = threading.Event()
+    ran = []
+
+    def execute(task):
+        # Longer than the old 5s worker join: tasks still queued then were dropped
+        assert gate.wait(BLOCKER_TIMEOUT)
+        ran.append(task['id'])
+        return {'success': True}
+
+    processor = make_processor(execute)
+    futures = [processor._queue_task({'id': f'task{i}', 'type': 'kpi_comparison'})
+               for i in range(processor.max_workers + 2)]
+    wait_until_active(processor, processor.max_workers)
+
+    timer = threading.Timer(5.5, gate.set)
+    timer.start()
+    processor.shutdown()
+    timer.join()
+
+    assert sorted(ran) == sorted(f'task{i}' for i in range(processor.max_workers + 2))
+    assert all(future.done() and future.result() == {'success': True} for future in futures)
+    assert processor._pending == 0
+
+
+def test_background_processing_finishes_queued_comparisons(make_processor, monkeypatch):
+    import background_processor
+    from background_processor import background_processing
+
+    ran = []
+    processor = make_processor(lambda task: time.sleep(0.2) or ran.append(task['id']) or {'success': True})
+    monkeypatch.setattr(background_processor, "_instance", processor)
+
+    with background_processing() as shared:
+        assert shared is processor
+        futures = [shared._queue_task({'id': f'task{i}', 'type': 'kpi_comparison'}) for i in range(6)]
+
+    assert background_processor.current_background_processor() is None
+    assert not processor.running
+    assert len(ran) == 6 and all(future.done() for future in futures)
+
+
+def test_cancelled_future_does_not_break_task_completion(make_processor):
+    gate, reported = threading.Event(), threading.Event()
+
+    processor = make_processor(lambda task: gate.wait(BLOCKER_TIMEOUT) and {'success': True})
+    processor.add_progress_callback(lambda event: event['status'] == 'completed' and reported.set())
+    future = processor._queue_task({'id': 'kpi', 'type': 'kpi_comparison'})
+    assert future.cancel()
+
+    gate.set()
+    assert processor.wait_for_completion(BLOCKER_TIMEOUT)
+    assert processor.task_records['kpi']['status'] == 'completed'
+    assert processor.completed_tasks['kpi'] == {'success': True}
+    assert reported.wait(BLOCKER_TIMEOUT)
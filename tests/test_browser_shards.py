@@ -0,0 +1,29 @@
+from browser_shards import WorkStealingQueue
+
+
+def test_take_deals_round_robin_from_own_queue():
+    queue = WorkStealingQueue(["a", "b", "c", "d", "e"], 2)
+    assert queue.take(0) == ("a", False)
+    assert queue.take(1) == ("b", False)
+    assert queue.take(0) == ("c", False)
+    assert queue.take(1) == ("d", False)
+    assert queue.stolen == 0
+
+
+def test_take_steals_from_back_of_longest_queue():
+    queue = WorkStealingQueue(list(range(7)), 3)  # [0, 3, 6], [1, 4], [2, 5]
+    assert queue.take(1) == (1, False)
+    assert queue.take(1) == (4, False)
+    assert queue.take(1) == (6, True)
+    assert queue.take(0) == (0, False)
+    assert queue.take(0) == (3, False)
+    assert queue.take(0) == (5, True)
+    assert queue.stolen == 2
+
+
+def test_take_returns_none_once_every_queue_is_empty():
+    queue = WorkStealingQueue(["a"], 3)
+    assert queue.take(2) == ("a", True)
+    assert queue.take(0) == (None, False)
+    assert queue.take(2) == (None, False)
+    assert queue.stolen == 1
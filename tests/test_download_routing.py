@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+
+import pytest
+
+import download_routing
+from download_routing import DownloadRouter
+
+TIMEOUT = 5
+
+
+class FakeDevTools:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, method, params=None, timeout=10, session_id=None):
+        self.sent.append((method, params))
+        return {}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def router(monkeypatch, tmp_path):
+    monkeypatch.setattr(download_routing.DevToolsConnection, "open", classmethod(lambda cls, driver, on_event: FakeDevTools()))
+    router = DownloadRouter(object(), str(tmp_path), enabled=True, events=True)
+    yield router
+    router.close()
+
+
+def begin(router, guid, filename):
+    router._on_event("Browser.downloadWillBegin", {"guid": guid, "suggestedFilename": filename})
+
+
+def complete(router, guid, directory):
+    with open(os.path.join(directory, guid), "w") as f:
+        f.write(guid)
+    router._on_event("Browser.downloadProgress", {"guid": guid, "state": "completed"})
+
+
+def test_route_waits_for_previous_download_to_begin(router):
+    first = router.route("Top Stores")
+    # The first click's download begins only after the next widget is being routed
+    threading.Timer(0.3, begin, (router, "g1", "Top Stores.xlsx")).start()
+    start = time.time()
+    second = router.route("Sales Trend")
+    assert time.time() - start >= 0.25
+
+    begin(router, "g2", "Sales Trend.xlsx")
+    complete(router, "g1", first)
+    complete(router, "g2", second)
+    found = router.wait_for_all(["Top Stores", "Sales Trend"], max_wait=TIMEOUT)
+    assert found == {"Top Stores": os.path.join(first, "Top Stores.xlsx"),
+                     "Sales Trend": os.path.join(second, "Sales Trend.xlsx")}
+
+
+def test_abandoned_route_does_not_wait(router):
+    router.route("Top Stores")
+    router.abandon("Top Stores")
+    start = time.time()
+    router.route("Sales Trend")
+    router.abandon("Sales Trend")
+    router.reset()
+    assert time.time() - start < 1
+    assert router._current == (None, router.download_dir)
+
+
+def test_route_gives_up_after_begin_timeout(router, monkeypatch):
+    monkeypatch.setattr(download_routing, "DOWNLOAD_BEGIN_TIMEOUT", 0.2)
+    router.route("Top Stores")
+    start = time.time()
+    router.route("Sales Trend")
+    assert 0.15 <= time.time() - start < 1
+
+
+def test_slow_handler_runs_off_the_event_thread_and_delays_waiters(router):
+    handled = []
+    router.on_complete = lambda key, path: (time.sleep(0.3), handled.append((key, path)))
+    directory = router.route("Top Stores")
+    begin(router, "g1", "Top Stores.xlsx")
+
+    start = time.time()
+    complete(router, "g1", directory)
+    assert time.time() - start < 0.1
+    path = router.wait_for("Top Stores", max_wait=TIMEOUT)
+    assert handled == [("Top Stores", path)]
@@ -0,0 +1,69 @@
+import pytest
+
+from task_graph import TaskGraph
+
+
+def returns(value):
+    return lambda **kwargs: value
+
+
+def fails(**kwargs):
+    raise RuntimeError("boom")
+
+
+def test_failed_stage_skips_everything_downstream():
+    graph = TaskGraph("t", max_workers=2)
+    graph.add_stage("extract", fails, outputs=["excel"])
+    graph.add_stage("compare", returns("report"), inputs=["excel"], outputs=["report"])
+    graph.add_stage("publish", returns(True), inputs=["report"], outputs=["published"])
+    graph.add_stage("db", returns({"kpi": 1}), outputs=["db_kpis"], kind="db")
+
+    artifacts = graph.run()
+
+    assert [graph.stages[name].status for name in ("extract", "compare", "publish", "db")] == \
+        ["failed", "skipped", "skipped", "completed"]
+    assert graph.stages["publish"].error == "needs output of compare"
+    assert "report" not in artifacts and "published" not in artifacts
+    assert artifacts["db_kpis"] == {"kpi": 1}
+    assert [stage.name for stage in graph.failed_stages()] == ["extract"]
+
+
+def test_optional_stage_failure_passes_none_downstream():
+    received = {}
+
+    def kpi(filtered, session):
+        received.update(filtered=filtered, session=session)
+        return "kpi.xlsx"
+
+    graph = TaskGraph("t", max_workers=2, resources={"browser": 1})
+    graph.add_stage("login", returns("session"), inputs=["driver"], outputs=["session"],
+                    kind="browser", resource="browser")
+    graph.add_stage("filters", fails, inputs=["session"], outputs=["filtered"],
+                    kind="browser", resource="browser", optional=True)
+    graph.add_stage("kpi", kpi, inputs=["filtered", "session"], outputs=["kpi_excel"],
+                    kind="browser", resource="browser")
+
+    artifacts = graph.run(driver=object())
+
+    assert graph.stages["filters"].status == "failed"
+    assert graph.stages["kpi"].status == "completed"
+    assert received == {"filtered": None, "session": "session"}
+    assert artifacts["filtered"] is None and artifacts["kpi_excel"] == "kpi.xlsx"
+    assert graph.failed_stages() == []
+    assert [stage.name for stage in graph.failed_stages(include_optional=True)] == ["filters"]
+
+
+def test_several_outputs_are_published_from_a_tuple():
+    graph = TaskGraph("t")
+    graph.add_stage("split", returns((1, 2)), outputs=["a", "b"])
+    graph.add_stage("add", lambda a, b: a + b, inputs=["a", "b"], outputs=["total"])
+    assert graph.run()["total"] == 3
+
+
+def test_dependency_cycle_is_rejected_before_running():
+    graph = TaskGraph("t")
+    graph.add_stage("a", returns(1), inputs=["y"], outputs=["x"])
+    graph.add_stage("b", returns(2), inputs=["x"], outputs=["y"])
+    with pytest.raises(ValueError, match="Dependency cycle"):
+        graph.run()
+    assert all(stage.status == "pending" for stage in graph.stages.values())
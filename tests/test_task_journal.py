@@ -0,0 +1,45 @@
+import threading
+
+from task_journal import TaskJournal
+
+TIMEOUT = 10
+
+
+def test_resume_requeues_unfinished_tasks_after_a_crash(make_processor, tmp_path):
+    journal_path = str(tmp_path / "journal.sqlite")
+    inputs = []
+    for i in range(6):
+        path = tmp_path / f"widgets_{i}.xlsx"
+        path.write_text("x")
+        inputs.append(str(path))
+
+    # First run: every comparison hangs, so all six are queued or running when the "crash" hits
+    gate = threading.Event()
+    crashed = make_processor(lambda task: gate.wait(TIMEOUT) and {'success': True}, journal=journal_path)
+    task_ids = [crashed.submit_landing_widget_comparison(path, path.replace(".xlsx", "_cmp.xlsx"))
+                for path in inputs]
+    with crashed._tasks_changed:
+        assert crashed._tasks_changed.wait_for(lambda: len(crashed.active_tasks) == crashed.max_workers, TIMEOUT)
+    # Crash: the process is gone before any task reports back to the journal
+    journal, crashed.journal = crashed.journal, None
+    journal.close()
+    gate.set()
+
+    before = TaskJournal(journal_path)
+    assert before.counts() == {'active': crashed.max_workers, 'queued': 6 - crashed.max_workers}
+    assert [task['id'] for task in before.unfinished()] == task_ids
+    before.close()
+
+    # Second run: an input deleted in between cannot be resumed
+    (tmp_path / "widgets_5.xlsx").unlink()
+    executed = []
+    resumed = make_processor(lambda task: executed.append(task['id']) or {'success': True}, journal=journal_path)
+    assert resumed.resume_from_journal() == task_ids[:5]
+    assert resumed.wait_for_completion(TIMEOUT)
+
+    assert sorted(executed) == sorted(task_ids[:5])
+    assert resumed.journal.counts() == {'completed': 5, 'abandoned': 1}
+    attempts = dict(resumed.journal._execute("SELECT id, attempts FROM tasks"))
+    assert [attempts[task_id] for task_id in task_ids] == [2, 2, 2, 2, 2, 1]
+    # Nothing is left to resume
+    assert resumed.journal.unfinished() == []
@@ -0,0 +1,236 @@
+"""
+VIRTUAL MERGED WORKBOOK
+=======================
+Treat a set of individual widget downloads as one workbook without merging them.
+
+A small JSON manifest (<name>.vwb.json) lists one entry per sheet: the sheet
+title and the download it lives in. Comparison code opens it through
+open_workbook(), which returns a VirtualWorkbook exposing the openpyxl sheet
+API (sheetnames, wb[name], worksheets, close) and lazily opens each download
+only when its sheet is read. Comparisons can therefore start on the
+downloads as they are, and merging into a single .xlsx becomes an optional
+archival step (archive_virtual_workbook) run off the critical path.
+
+    manifest = write_manifest("download/widgets/Combined_Widgets_Landing.vwb.json", files)
+    wb = open_workbook(manifest, read_only=True, data_only=True)
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Any, List, Optional
+
+from openpyxl import load_workbook
+
+from config_loader import config_loader
+from sidecar_tables import SidecarWorkbook, read_sidecars_enabled, tables_available
+from xlsx_sheet_copy import unique_sheet_titles
+
+VIRTUAL_WORKBOOK_SUFFIX = ".vwb.json"
+VIRTUAL_WORKBOOK_VERSION = 1
+
+_pending_archives = []
+_pending_lock = threading.Lock()
+
+
+def virtual_workbooks_enabled() -> bool:
+    return (config_loader.get_dynamic_engine_config().get("reporting", {}) or {}).get("virtual_workbooks", False)
+
+
+def archive_enabled() -> bool:
+    return (config_loader.get_dynamic_engine_config().get("reporting", {}) or {}).get("archive_downloads", True)
+
+
+def is_virtual_workbook(path: str) -> bool:
+    return str(path).endswith(VIRTUAL_WORKBOOK_SUFFIX)
+
+
+def manifest_path_for(merged_path: str) -> str:
+    """Manifest path standing in for a merged workbook (Combined.xlsx -> Combined.vwb.json)"""
+    return os.path.splitext(merged_path)[0] + VIRTUAL_WORKBOOK_SUFFIX
+
+
+def sheet_title_for(file_path: str) -> str:
+    """Sheet title a download gets in the merged workbook (file name without extension)"""
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(manifest_path: str) -> Dict[str, Any]:
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(manifest_path: str, file_paths: List[str]) -> str:
+    """
+    Write a manifest exposing the first sheet of each download as one workbook
+
+    Sheet titles follow ExcelMerger: file name without extension, truncated to
+    31 characters and de-duplicated.
+
+    Returns:
+        The manifest path
+    """
+    file_paths = [os.path.abspath(p) for p in file_paths]
+    titles = unique_sheet_titles([sheet_title_for(p) for p in file_paths])
+    _write_json(manifest_path, {
+        'version': VIRTUAL_WORKBOOK_VERSION,
+        'sheets': [{'title': title, 'path': path, 'sheet': None} for title, path in zip(titles, file_paths)]
+    })
+    print(f"🗂️ Virtual workbook with {len(file_paths)} sheets: {manifest_path}")
+    return manifest_path
+
+
+def workbook_size(path: str) -> int:
+    """Size in bytes of a workbook, or of all downloads behind a manifest"""
+    if not is_virtual_workbook(path):
+        return os.path.getsize(path)
+    sources = {entry['path'] for entry in load_manifest(path)['sheets']}
+    return sum(os.path.getsize(p) for p in sources if os.path.exists(p))
+
+
+class VirtualWorkbook:
+    """Read-side stand-in for a merged workbook backed by the individual downloads"""
+
+    def __init__(self, entries: List[Dict[str, Any]], read_only: bool = False, data_only: bool = False):
+        """
+        Args:
+            entries: [{'title', 'path', 'sheet'}, ...]; sheet None means the first sheet of path
+            read_only, data_only: Passed to load_workbook when a source is opened
+        """
+        self._entries = {entry['title']: entry for entry in entries}
+        self._load_args = {'read_only': read_only, 'data_only': data_only}
+        self._open = {}
+
+    @classmethod
+    def from_manifest(cls, manifest_path: str, read_only: bool = False, data_only: bool = False) -> "VirtualWorkbook":
+        return cls(load_manifest(manifest_path)['sheets'], read_only, data_only)
+
+    @property
+    def sheetnames(self) -> List[str]:
+        return list(self._entries)
+
+    @property
+    def worksheets(self):
+        return [self[title] for title in self._entries]
+
+    def _source(self, path: str):
+        if path not in self._open:
+            self._open[path] = open_workbook(path, **self._load_args)
+        return self._open[path]
+
+    def __getitem__(self, title: str):
+        entry = self._entries.get(title)
+        if entry is None:
+            raise KeyError(f"Worksheet {title} does not exist.")
+        wb = self._source(entry['path'])
+        return wb[entry['sheet']] if entry.get('sheet') else wb.worksheets[0]
+
+    def __contains__(self, title: str) -> bool:
+        return title in self._entries
+
+    def close(self):
+        for wb in self._open.values():
+            wb.close()
+        self._open = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def open_workbook(path: str, read_only: bool = False, data_only: bool = False):
+    """load_workbook() that also accepts virtual workbook manifests and reads fresh sidecar tables"""
+    if is_virtual_workbook(path):
+        return VirtualWorkbook.from_manifest(path, read_only=read_only, data_only=data_only)
+    if read_sidecars_enabled() and tables_available(path):
+        return SidecarWorkbook.for_workbook(path)
+    return load_workbook(path, read_only=read_only, data_only=data_only)
+
+
+def archive_virtual_workbook(manifest_path: str, output_path: str, delete_sources: bool = True,
+                             related_manifests: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Merge the downloads behind a manifest into one .xlsx for archival
+
+    On success the manifest is repointed at the merged workbook, so it stays
+    readable (e.g. for generate_failed_reports), and the downloads are deleted.
+
+    Args:
+        related_manifests: Other manifests over the same downloads (e.g. per-widget
+            pipeline manifests) to repoint as well
+
+    Returns:
+        output_path, or None when the merge failed (downloads are kept)
+    """
+    from excel_merger import ExcelMerger
+
+    entries = load_manifest(manifest_path)['sheets']
+    sources = [entry['path'] for entry in entries if entry.get('sheet') is None and os.path.exists(entry['path'])]
+    if not sources:
+        print(f"⚠️ Nothing to archive for {os.path.basename(manifest_path)}")
+        return None
+
+    print(f"🗄️ Archiving {len(sources)} downloads into: {output_path}")
+    if not ExcelMerger.merge_specific_files(sources, output_path, one_sheet=False):
+        print(f"⚠️ Archive merge failed, keeping downloads for {os.path.basename(manifest_path)}")
+        return None
+
+    merged = load_workbook(output_path, read_only=True)
+    merged_titles = list(merged.sheetnames)
+    merged.close()
+    if len(merged_titles) != len(sources):
+        print(f"⚠️ Archive has {len(merged_titles)} sheets for {len(sources)} downloads, keeping downloads")
+        return output_path
+
+    merged_sheets = dict(zip(sources, merged_titles))
+    for path in [manifest_path] + list(related_manifests or []):
+        entries = load_manifest(path)['sheets']
+        for entry in entries:
+            if entry['path'] in merged_sheets and entry.get('sheet') is None:
+                entry['path'], entry['sheet'] = os.path.abspath(output_path), merged_sheets[entry['path']]
+        _write_json(path, {'version': VIRTUAL_WORKBOOK_VERSION, 'sheets': entries})
+
+    if delete_sources:
+        for source in sources:
+            try:
+                os.remove(source)
+            except OSError as e:
+                print(f"⚠️ Could not delete {os.path.basename(source)}: {e}")
+        print(f"🗑️ Removed {len(sources)} archived downloads")
+    return output_path
+
+
+def schedule_archive(manifest_path: str, output_path: str, related_manifests: Optional[List[str]] = None):
+    """Queue a manifest for archival once the comparisons reading it have finished"""
+    with _pending_lock:
+        _pending_archives.append((manifest_path, output_path, related_manifests))
+
+
+def run_scheduled_archives() -> List[str]:
+    """Archive every scheduled manifest; returns the merged workbook paths"""
+    with _pending_lock:
+        pending = list(_pending_archives)
+        _pending_archives.clear()
+
+    archived = []
+    for manifest_path, output_path, related_manifests in pending:
+        try:
+            result = archive_virtual_workbook(manifest_path, output_path, related_manifests=related_manifests)
+            if result:
+                archived.append(result)
+        except Exception as e:
+            print(f"❌ Archiving {os.path.basename(manifest_path)} failed: {e}")
+    return archived
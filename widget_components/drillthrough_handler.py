@@ -4,9 +4,12 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
-from kpisdataextraction import KPidataextract
+from kpisdataextraction import KPidataextract, kpi_tooltip_check_enabled
 from excel_merger import ExcelMerger
-from kpistoreprocedures import Data, compare_kpi_data, read_kpi_from_excel
+from virtual_workbook import virtual_workbooks_enabled, archive_enabled, write_manifest, manifest_path_for, schedule_archive
+from widget_pipeline import pipelined_enabled, WidgetComparisonPipeline
+from download_routing import DownloadRouter
+from network_capture import NetworkCapture
 
 extra_params = {"Store": "717"}
 
@@ -21,8 +24,12 @@ DRILLTHROUGH_MAP = {
 }
 
 class DrillthroughHandler:
-    def __init__(self, driver):
+    def __init__(self, driver, download_dir=None):
+        """download_dir: where this driver's browser downloads land (default download/; sharded sessions have their own)"""
         self.driver = driver
+        self.download_dir = os.path.abspath(download_dir or "download")
+        self.downloads = DownloadRouter.for_driver(driver, self.download_dir)
+        self.capture_since = 0  # Network responses after this mark belong to the current drillthrough page
         self.wait = WebDriverWait(driver, 15)  # Reduced from 20 to 15
         self.actions = ActionChains(driver)
         
@@ -365,6 +372,8 @@ class DrillthroughHandler:
             kpi = KPidataextract(self.driver, 'download/kpis')
             kpi.kpidata(custom_filename=kpi_filename)
             print(f"✅ Drillthrough KPI saved: {kpi_output_path}")
+            if kpi_tooltip_check_enabled():
+                kpi.verify_tooltips()
 
             # Get drillthrough parameters based on widget
             from config_loader import config_loader
@@ -394,10 +403,11 @@ class DrillthroughHandler:
         except Exception as kpi_err:
             print(f"⚠️ Drillthrough KPI Extraction/Comparison Failed: {kpi_err}")
 
-    def process_drillthrough_widgets(self, widget_title, drillthrough_dir):
-        """Process widgets in drillthrough page with timeout handling"""
-        default_download_path = os.path.abspath("download")
-        
+    def process_drillthrough_widgets(self, widget_title, drillthrough_dir, on_download=None):
+        """Process widgets in drillthrough page with timeout handling
+
+        on_download, when given, is called with each downloaded file's path as soon
+        as it has been moved into drillthrough_dir (pipelined comparisons)."""
         # Quick browser health check
         if not self.check_browser_health():
             print("⚠️ Browser not responsive, attempting refresh...")
@@ -409,6 +419,11 @@ class DrillthroughHandler:
         
         widgets = self.driver.find_elements(By.CSS_SELECTOR, ".chart-container")
         print(f"🔍 Found {len(widgets)} widgets in drillthrough for: {widget_title}")
+
+        # Network-capture mode: widgets whose data response was recorded skip the Download menu
+        capture = NetworkCapture.active(self.driver)
+        if capture is not None:
+            capture.settle()
         
         for idx, widget in enumerate(widgets):
             widget_name = f"Unknown_Widget_{idx + 1}"
@@ -423,6 +438,13 @@ class DrillthroughHandler:
                 title_element = widget.find_element(By.CLASS_NAME, "chart-title")
                 widget_name = title_element.text.strip()
                 print(f"📊 Processing Widget {idx + 1}: {widget_name}")
+
+                if capture is not None and not capture.cross_check:
+                    captured = capture.write_widget_workbook(widget_name, drillthrough_dir, since=self.capture_since)
+                    if captured:
+                        if on_download:
+                            on_download(captured)
+                        continue
                 
                 # Move to widget for interaction
                 self.actions.move_to_element(widget).pause(0.2).perform()
@@ -471,22 +493,24 @@ class DrillthroughHandler:
                     self.actions.move_to_element(menu_btn).pause(0.1).click().perform()
                     time.sleep(0.4)
                     download_btn = self.wait.until(EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'mat-menu-item') and .//span[text()='Download']]")))
+                    # This widget's download lands in its own directory
+                    download_key = f"{widget_title}/{widget_name}"
+                    self.downloads.route(download_key)
                     download_btn.click()
                     print(f"📥 Download initiated for: {widget_name}")
                     
-                    # Wait for file to download
-                    time.sleep(2)
+                    # Wait for the file to download, then move it to drillthrough_dir
+                    src = self.downloads.wait_for(download_key, max_wait=10)
                     
-                    # Move new .xlsx file to drillthrough_dir
-                    downloaded_files = [f for f in os.listdir(default_download_path) if f.endswith(".xlsx")]
-                    downloaded_files.sort(key=lambda f: os.path.getmtime(os.path.join(default_download_path, f)), reverse=True)
-                    
-                    if downloaded_files:
-                        latest_file = downloaded_files[0]
-                        src = os.path.join(default_download_path, latest_file)
+                    if src:
+                        if capture is not None and capture.cross_check:
+                            capture.check_export(widget_name, src, since=self.capture_since)
+                        latest_file = os.path.basename(src)
                         dst = os.path.join(drillthrough_dir, latest_file)
-                        os.rename(src, dst)
+                        os.replace(src, dst)
                         print(f"✅ Downloaded and moved: {latest_file}")
+                        if on_download:
+                            on_download(dst)
                     else:
                         print(f"⚠️ No new .xlsx file found for: {widget_name}")
                         
@@ -506,6 +530,8 @@ class DrillthroughHandler:
                 
                 # Continue with next widget
 
+        self.downloads.reset()
+
     def drillthrough_widget(self, widget_title):
         print(f"🧪 Starting Drillthrough: {widget_title}")
         submenu_text = None
@@ -521,6 +547,10 @@ class DrillthroughHandler:
             print(f"📁 Created drillthrough directory: {drillthrough_dir}")
             print(f"🎯 Target submenu: {submenu_text}")
 
+            capture = NetworkCapture.active(self.driver)
+            if capture is not None:
+                self.capture_since = capture.mark()
+
             # Open drillthrough menu
             print(f"🔄 Attempting to open drillthrough menu for: {widget_title}")
             menu_success = self.open_drillthrough_menu(widget_title)
@@ -556,9 +586,25 @@ class DrillthroughHandler:
                     before_files = set(os.listdir(drillthrough_dir))
                     print(f"📁 Files before widget processing: {before_files}")
                     
-                    self.process_drillthrough_widgets(widget_title, drillthrough_dir)
-                    
-                    time.sleep(3)  # Allow time for all downloads
+                    pipeline = None
+                    if pipelined_enabled():
+                        from background_processor import submit_drillthrough_widget_comparison_bg
+                        pipeline = WidgetComparisonPipeline(
+                            lambda excel_path, output_path, block=True: submit_drillthrough_widget_comparison_bg(
+                                excel_path=excel_path,
+                                widget_title=widget_title,
+                                submenu_selection=submenu_text,
+                                output_path=output_path,
+                                block=block
+                            ),
+                            staging_dir=drillthrough_dir,
+                            page_dir=drillthrough_dir
+                        )
+
+                    self.process_drillthrough_widgets(
+                        widget_title, drillthrough_dir, on_download=pipeline.on_download if pipeline else None
+                    )
+                    # Every widget's download was awaited (and moved here) inside process_drillthrough_widgets
 
                     # STEP 3: Check for new files and merge
                     after_files = set(os.listdir(drillthrough_dir))
@@ -571,41 +617,54 @@ class DrillthroughHandler:
                         output_path = os.path.join(drillthrough_dir, f"{safe_title}_{safe_submenu}_widgets.xlsx")
                         new_file_paths = [os.path.join(drillthrough_dir, f) for f in new_files]
 
-                        # Merge Excel files
-                        ExcelMerger.merge_specific_files(
-                            file_paths=new_file_paths,
-                            output_path=output_path,
-                            one_sheet=False
-                        )
+                        comparison_output_path = os.path.join(drillthrough_dir, f"{safe_title}_{safe_submenu}_widget_comparison.xlsx")
+                        if pipeline is not None:
+                            # Every widget was queued as it landed; only the page-level archival is left
+                            pipeline.finish(merged_path=output_path, report_path=comparison_output_path)
+                            comparison_input = None
+                        elif virtual_workbooks_enabled():
+                            # Compare the downloads in place; merge + cleanup run as archival after the run
+                            comparison_input = write_manifest(manifest_path_for(output_path), new_file_paths)
+                            if archive_enabled():
+                                schedule_archive(comparison_input, output_path)
+                            print(f"⚡ Widgets exposed as virtual workbook: {comparison_input}")
+                        else:
+                            comparison_input = output_path
+                            # Merge Excel files
+                            ExcelMerger.merge_specific_files(
+                                file_paths=new_file_paths,
+                                output_path=output_path,
+                                one_sheet=False
+                            )
 
-                        # Clean up downloaded files (preserve KPI files)
-                        merger = ExcelMerger(drillthrough_dir)
-                        merged_filename = os.path.basename(output_path)
-                        exclude_files = [merged_filename] + [f for f in os.listdir(drillthrough_dir) if "kpi" in f.lower()]
-                        merger.cleanup_files(exclude_files=exclude_files)
+                            # Clean up downloaded files (preserve KPI files)
+                            merger = ExcelMerger(drillthrough_dir)
+                            merged_filename = os.path.basename(output_path)
+                            exclude_files = [merged_filename] + [f for f in os.listdir(drillthrough_dir) if "kpi" in f.lower()]
+                            merger.cleanup_files(exclude_files=exclude_files)
 
-                        print(f"✅ Widgets merged and cleaned: {output_path}")
+                            print(f"✅ Widgets merged and cleaned: {output_path}")
                         print(f"📊 Widget files processed: {len(new_files)}")
                         
                         # STEP 4: Submit drillthrough widget comparison to background
-                        try:
-                            print(f"\n🔄 STEP 4: Submitting drillthrough widget comparison to background...")
-                            from background_processor import submit_drillthrough_widget_comparison_bg
+                        if comparison_input is not None:
+                            try:
+                                print(f"\n🔄 STEP 4: Submitting drillthrough widget comparison to background...")
+                                from background_processor import submit_drillthrough_widget_comparison_bg
                             
-                            comparison_output_path = os.path.join(drillthrough_dir, f"{safe_title}_{safe_submenu}_widget_comparison.xlsx")
-                            task_id = submit_drillthrough_widget_comparison_bg(
-                                excel_path=output_path,
-                                widget_title=widget_title,
-                                submenu_selection=submenu_text,
-                                output_path=comparison_output_path
-                            )
+                                task_id = submit_drillthrough_widget_comparison_bg(
+                                    excel_path=comparison_input,
+                                    widget_title=widget_title,
+                                    submenu_selection=submenu_text,
+                                    output_path=comparison_output_path
+                                )
                             
-                            print(f"✅ Drillthrough widget comparison submitted to background (ID: {task_id})")
-                            print("🔄 Continuing with next drillthrough while comparison runs in background...")
+                                print(f"✅ Drillthrough widget comparison submitted to background (ID: {task_id})")
+                                print("🔄 Continuing with next drillthrough while comparison runs in background...")
                                 
-                        except Exception as comparison_error:
-                            print(f"❌ Background submission failed: {str(comparison_error)}")
-                            print("⚠️ Continuing with navigation back...")
+                            except Exception as comparison_error:
+                                print(f"❌ Background submission failed: {str(comparison_error)}")
+                                print("⚠️ Continuing with navigation back...")
                         
                     else:
                         print(f"📭 No widget files found for: {widget_title}")
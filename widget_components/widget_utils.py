@@ -4,7 +4,6 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import time
 from excel_merger import ExcelMerger
-from widgetstoreprocedures import read_widget_values, fetch_db_widget_values, compare_widget_data, normalize
 from selenium.webdriver.common.by import By
 
 class WidgetUtils:
@@ -23,6 +22,8 @@ class WidgetUtils:
 
     def handle_widget_download_and_compare(self, drill_targets):
         """Compare landing page widgets with database - creates landing folder structure"""
+        # Import here: widgetstoreprocedures connects to the database on import
+        from widgetstoreprocedures import read_widget_values, fetch_db_widget_values, compare_widget_data, normalize
         
         print("🔄 Starting handle_widget_download_and_compare...")
         print(f"📋 Drill targets received: {drill_targets}")
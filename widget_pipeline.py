@@ -0,0 +1,211 @@
+"""
+PER-WIDGET COMPARISON PIPELINE
+==============================
+Overlap browser work with DB fetch and comparison work, widget by widget.
+
+Without pipelining a page's widgets are all downloaded and merged before a
+single comparison task is queued. In pipelined mode each finished download
+is exposed as a one-sheet virtual workbook and its comparison task (DB
+fetch + compare) is queued on the BackgroundProcessor right away, while the
+browser moves on to the next widget.
+
+Per-widget reports are written to <page dir>/pipeline/<sheet>.xlsx. The
+archival step that runs after all comparisons (virtual_workbook.
+run_scheduled_archives) then combines them into the usual page report and
+the downloads into the usual merged workbook. In summary-only mode the
+workers write <sheet>_summary.json instead and no page report is built.
+
+Enabled with performance.parallel_processing.pipelined in
+dynamic_engine_config.yaml.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+from config_loader import config_loader
+from virtual_workbook import (
+    archive_enabled, manifest_path_for, schedule_archive, sheet_title_for, write_manifest
+)
+
+PIPELINE_DIR_NAME = "pipeline"
+
+
+def pipelined_enabled() -> bool:
+    parallel_config = config_loader.get_dynamic_engine_config().get("performance", {}).get("parallel_processing", {})
+    return bool(parallel_config.get("pipelined", False))
+
+
+def _summary_only() -> bool:
+    """Whether comparisons write summaries instead of reports (the running processor's setting wins)"""
+    from background_processor import current_background_processor
+    processor = current_background_processor()
+    if processor is not None:
+        return processor.summary_only
+    return bool((config_loader.get_dynamic_engine_config().get("reporting", {}) or {}).get("summary_only", False))
+
+
+class DownloadWatcher:
+    """Background thread reporting each new, fully written .xlsx in a download directory"""
+
+    def __init__(self, directory: str, on_download: Callable[[str], None], prefix: str = "",
+                 poll_interval: float = 0.3, recursive: bool = False):
+        """
+        Args:
+            directory: Browser download directory to watch
+            on_download: Called with the file path once per completed download
+            prefix: Only report files whose name starts with this prefix
+            poll_interval: Seconds between directory scans
+            recursive: Also watch subdirectories (per-widget download directories)
+        """
+        self.directory = directory
+        self.on_download = on_download
+        self.prefix = prefix
+        self.recursive = recursive
+        self.poll_interval = poll_interval
+        self.downloads = []
+        self._sizes = {}
+        self._reported = set()
+        self._changed = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def _candidates(self):
+        """Paths relative to the watched directory"""
+        if not os.path.exists(self.directory):
+            return []
+        if self.recursive:
+            names = [os.path.relpath(os.path.join(root, f), self.directory)
+                     for root, _, files in os.walk(self.directory) for f in files]
+        else:
+            names = os.listdir(self.directory)
+        # Chrome writes to .crdownload and renames when done; Excel lock files start with ~$
+        return [name for name in names
+                if name.endswith(".xlsx") and os.path.basename(name).startswith(self.prefix)
+                and not os.path.basename(name).startswith("~$")]
+
+    def start(self):
+        # Files already present belong to an earlier step
+        self._reported = set(self._candidates())
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            self.poll()
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        """Report files whose size is non-zero and unchanged since the previous scan"""
+        for name in self._candidates():
+            if name in self._reported:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if size > 0 and self._sizes.get(name) == size:
+                self._reported.add(name)
+                try:
+                    self.on_download(path)
+                except Exception as e:
+                    print(f"❌ Download handler failed for {name}: {e}")
+                with self._changed:
+                    self.downloads.append(path)
+                    self._changed.notify_all()
+            else:
+                self._sizes[name] = size
+
+    def wait_for(self, expected_count: int, max_wait: float = 30) -> List[str]:
+        """Block until expected_count downloads were reported or max_wait elapsed"""
+        deadline = time.time() + max_wait
+        with self._changed:
+            while len(self.downloads) < expected_count:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    print(f"⚠️ Timeout reached. {len(self.downloads)}/{expected_count} downloads in {max_wait}s")
+                    break
+                self._changed.wait(remaining)
+            return list(self.downloads)
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 5)
+
+
+class WidgetComparisonPipeline:
+    """Queues one comparison task per widget download as soon as it lands"""
+
+    def __init__(self, submit: Callable[[str, str], str], staging_dir: str, page_dir: str,
+                 summary_only: Optional[bool] = None):
+        """
+        Args:
+            submit: Queues a comparison, called as submit(excel_path, output_path, block=False) -> task id;
+                download events must not wait on backpressure, so over the limit it spills instead
+            staging_dir: Where downloads are kept until archival (moved there if elsewhere)
+            page_dir: Page directory; per-widget manifests and reports go to <page_dir>/pipeline/
+            summary_only: Comparisons write summaries, not reports (default: reporting.summary_only)
+        """
+        self.submit = submit
+        self.summary_only = summary_only
+        self.staging_dir = staging_dir
+        self.pipeline_dir = os.path.join(page_dir, PIPELINE_DIR_NAME)
+        self.downloads = []
+        self.manifests = []
+        self.reports = []
+        self.task_ids = []
+        self._lock = threading.Lock()
+        os.makedirs(self.staging_dir, exist_ok=True)
+        os.makedirs(self.pipeline_dir, exist_ok=True)
+
+    def on_download(self, file_path: str) -> Optional[str]:
+        """Download-completion event: queue this widget's DB fetch and comparison"""
+        if os.path.dirname(os.path.abspath(file_path)) != os.path.abspath(self.staging_dir):
+            target = os.path.join(self.staging_dir, os.path.basename(file_path))
+            os.replace(file_path, target)
+            file_path = target
+
+        title = sheet_title_for(file_path)
+        manifest_path = write_manifest(os.path.join(self.pipeline_dir, f"{title}.vwb.json"), [file_path])
+        report_path = os.path.join(self.pipeline_dir, f"{title}.xlsx")
+        task_id = self.submit(manifest_path, report_path, block=False)
+        print(f"⚡ Pipelined comparison queued for: {title} (ID: {task_id})")
+
+        with self._lock:
+            self.downloads.append(file_path)
+            self.manifests.append(manifest_path)
+            self.reports.append(report_path)
+            self.task_ids.append(task_id)
+        return task_id
+
+    def finish(self, merged_path: str, report_path: str) -> Optional[str]:
+        """
+        Close the page: expose all downloads as one virtual workbook and schedule
+        the merged workbook and combined report for archival
+
+        Returns:
+            The downloads manifest path, or None when nothing was downloaded
+        """
+        with self._lock:
+            downloads, manifests, reports = list(self.downloads), list(self.manifests), list(self.reports)
+        if not downloads:
+            return None
+
+        manifest_path = write_manifest(manifest_path_for(merged_path), downloads)
+        if archive_enabled():
+            schedule_archive(manifest_path, merged_path, related_manifests=manifests)
+        summary_only = _summary_only() if self.summary_only is None else self.summary_only
+        if summary_only:
+            # Workers wrote <sheet>_summary.json, not the reports; the run summary collects them
+            print(f"✅ {len(downloads)} widget comparisons pipelined (summary only, no page report)")
+            return manifest_path
+        # Per-widget reports become the page report once every task is done
+        reports_manifest = write_manifest(os.path.join(self.pipeline_dir, "reports.vwb.json"), reports)
+        schedule_archive(reports_manifest, report_path)
+        print(f"✅ {len(downloads)} widget comparisons pipelined, page report: {report_path}")
+        return manifest_path
@@ -8,11 +8,17 @@ from widget_components.widget_menu import WidgetMenuHandler
 from widget_components.drillthrough_handler import DrillthroughHandler
 from widget_components.widget_utils import WidgetUtils
 from excel_merger import ExcelMerger
+from virtual_workbook import virtual_workbooks_enabled, archive_enabled, write_manifest, manifest_path_for, schedule_archive
+from widget_pipeline import pipelined_enabled, DownloadWatcher, WidgetComparisonPipeline
+from download_routing import DownloadRouter
+from network_capture import NetworkCapture, NETWORK_DIR_NAME
 import os
 
 class WidgetExtractor:
-    def __init__(self, driver):
+    def __init__(self, driver, shard_pool=None):
+        """shard_pool: BrowserShardPool spreading the drillthrough phase over several sessions (None: this driver only)"""
         self.driver = driver
+        self.shard_pool = shard_pool
         self.wait = WebDriverWait(driver, 10)
         self.actions = ActionChains(driver)
         self.loader = WidgetLoader(driver)
@@ -20,6 +26,7 @@ class WidgetExtractor:
         self.menu_handler = WidgetMenuHandler(driver, self.wait, self.actions)
         self.drillthrough_handler = DrillthroughHandler(driver)
         self.widget_utils = WidgetUtils(driver)
+        self.downloads = DownloadRouter.for_driver(driver)
 
     def smart_wait_for_downloads(self, download_dir, expected_count, max_wait=30, check_interval=0.5):
         """Smart waiting for downloads instead of fixed wait time
@@ -42,6 +49,26 @@ class WidgetExtractor:
         print(f"⚠️ Timeout reached. Found {len(xlsx_files)} files in {max_wait}s")
         return xlsx_files
 
+    def _landing_virtual_workbook(self, widget_files, widget_dir, merged_path):
+        """Expose landing downloads as one virtual workbook instead of merging them
+
+        Files are moved out of download/ (drillthrough picks the newest .xlsx there)
+        into download/widgets/landing_downloads/; merging into merged_path is
+        scheduled as an archival step after the comparisons."""
+        landing_dir = os.path.join(widget_dir, "landing_downloads")
+        os.makedirs(landing_dir, exist_ok=True)
+        moved_files = []
+        for widget_file in widget_files:
+            target = os.path.join(landing_dir, os.path.basename(widget_file))
+            os.replace(widget_file, target)
+            moved_files.append(target)
+
+        manifest_path = write_manifest(manifest_path_for(merged_path), moved_files)
+        if archive_enabled():
+            schedule_archive(manifest_path, merged_path)
+        print(f"⚡ Comparing {len(moved_files)} downloads directly, merge deferred to archival")
+        return manifest_path
+
     def _find_fresh_widget(self, original_widget, title):
         """Find a fresh widget element by title to avoid stale element issues"""
         try:
@@ -238,6 +265,34 @@ class WidgetExtractor:
             print("🔚 No widgets found.")
             return
 
+        # Network-capture mode: widgets whose data response was recorded skip the Download menu
+        capture = NetworkCapture.active(self.driver)
+        captured = {}
+        if capture is not None:
+            capture.settle()
+
+        # Pipelined mode: each landing download is compared as soon as it lands
+        pipeline = watcher = None
+        if pipelined_enabled():
+            from background_processor import submit_landing_widget_comparison_bg
+            pipeline = WidgetComparisonPipeline(
+                submit_landing_widget_comparison_bg,
+                staging_dir=os.path.join(widget_dir, "landing_downloads"),
+                page_dir=widget_dir
+            )
+            if self.downloads.events is not None:
+                # Chrome reports each download's completion; no directory to watch
+                def on_complete(key, path):
+                    if capture is not None and capture.cross_check:
+                        capture.check_export(key, path)
+                    pipeline.on_download(path)
+                self.downloads.on_complete = on_complete
+            elif self.downloads.enabled:
+                # Every widget downloads into its own directory under the routing root
+                watcher = DownloadWatcher(self.downloads.root, pipeline.on_download, recursive=True).start()
+            else:
+                watcher = DownloadWatcher(os.path.abspath("download"), pipeline.on_download, prefix="Sales Summary_").start()
+
         # Download landing page widgets with optimized processing
         for widget in widgets:
             title = self.loader.get_widget_title(widget)
@@ -246,6 +301,14 @@ class WidgetExtractor:
 
             processed.add(title)
             print(f"🧩 Processing widget: {title}")
+            if capture is not None and not capture.cross_check:
+                path = capture.write_widget_workbook(title, os.path.join(self.downloads.download_dir, NETWORK_DIR_NAME))
+                if path:
+                    captured[title] = path
+                    if pipeline is not None:
+                        pipeline.on_download(path)
+                    drill_targets.append(title)
+                    continue
             try:
                 # Streamlined processing - no unnecessary moves
                 # Get tooltip quickly
@@ -258,9 +321,12 @@ class WidgetExtractor:
 
                 # Enhanced menu operations - single menu session approach
                 print(f"🔄 Starting menu operations for: {title}")
+                self.downloads.route(title)
                 
                 # Try to handle both operations in a single menu session
                 download_success, expand_success = self._handle_both_operations(widget, title)
+                if not download_success:
+                    self.downloads.abandon(title)
                 
                 if download_success and expand_success:
                     print(f"✅ Both operations succeeded for: {title}")
@@ -279,6 +345,30 @@ class WidgetExtractor:
             except Exception as e:
                 print(f"❌ Error processing widget '{title}': {str(e)}")
 
+        self.downloads.reset()
+        downloaded_targets = [title for title in drill_targets if title not in captured]
+        if captured:
+            print(f"📡 {len(captured)} widgets from network responses, {len(downloaded_targets)} downloaded")
+
+        if pipeline is not None:
+            print("⏳ Waiting for the last pipelined downloads...")
+            if watcher is not None:
+                if capture is not None and capture.cross_check:
+                    print("⚠️ Cross-check needs DevTools download events in pipelined mode; skipped")
+                watcher.wait_for(len(downloaded_targets), max_wait=8)
+                watcher.stop()
+            else:
+                self.downloads.wait_for_all(downloaded_targets, max_wait=8)
+                self.downloads.on_complete = None
+            if not pipeline.finish(
+                merged_path=os.path.join(widget_dir, "Combined_Widgets_Landing.xlsx"),
+                report_path=os.path.join(widget_dir, "landing_widget_comparison_report.xlsx")
+            ):
+                print("❌ No widget files were downloaded!")
+                print("⚠️ Skipping drillthrough due to missing widget files")
+                return
+            return self._drillthrough_phase(drill_targets)
+
         # STEP 1: Merge landing page widget files
         print("\n" + "="*60)
         print("📁 STEP 1: Merging Landing Page Widget Files")
@@ -286,8 +376,21 @@ class WidgetExtractor:
 
         # Smart wait for downloads to complete
         print("⏳ Waiting for downloads to complete...")
-        expected_count = len(drill_targets)
-        widget_files = self.smart_wait_for_downloads(os.path.abspath("download"), expected_count, max_wait=8)  # Reduced from 15 to 8
+        expected_count = len(downloaded_targets)
+        if not downloaded_targets:
+            widget_files = []
+        elif self.downloads.enabled:
+            # One directory per widget: each file is exactly its widget's download
+            downloads = self.downloads.wait_for_all(downloaded_targets, max_wait=8)
+            if capture is not None and capture.cross_check:
+                for title, path in downloads.items():
+                    capture.check_export(title, path)
+            widget_files = list(downloads.values())
+        else:
+            if capture is not None and capture.cross_check:
+                print("⚠️ Cross-check needs per-widget download directories (isolated_downloads); skipped")
+            widget_files = self.smart_wait_for_downloads(os.path.abspath("download"), expected_count, max_wait=8)  # Reduced from 15 to 8
+        widget_files += list(captured.values())
 
         # Validate and prepare widget files (already collected by smart_wait_for_downloads)
         download_dir = os.path.abspath("download")
@@ -307,42 +410,47 @@ class WidgetExtractor:
 
         if widget_files:
             merged_path = os.path.join(widget_dir, "Combined_Widgets_Landing.xlsx")
-            print(f"\n📊 Merging {len(widget_files)} files into: {merged_path}")
-            try:
-                # Merge all widget files into combined file
-                ExcelMerger.merge_specific_files(
-                    file_paths=widget_files,
-                    output_path=merged_path,
-                    one_sheet=False
-                )
-                print(f"✅ Successfully created combined file: {merged_path}")
-
-                # Verify merged file was created
-                if os.path.exists(merged_path):
-                    merged_size = os.path.getsize(merged_path)
-                    print(f"📄 Combined file size: {merged_size} bytes")
-                else:
-                    print("❌ Combined file was not created!")
-                    return
+            if virtual_workbooks_enabled():
+                # STEP 1-2: Compare the downloads in place; merging is archived after the run
+                comparison_input = self._landing_virtual_workbook(widget_files, widget_dir, merged_path)
+            else:
+                comparison_input = merged_path
+                print(f"\n📊 Merging {len(widget_files)} files into: {merged_path}")
+                try:
+                    # Merge all widget files into combined file
+                    ExcelMerger.merge_specific_files(
+                        file_paths=widget_files,
+                        output_path=merged_path,
+                        one_sheet=False
+                    )
+                    print(f"✅ Successfully created combined file: {merged_path}")
 
-                # STEP 2: Delete individual widget files
-                print(f"\n🗑️ STEP 2: Cleaning up individual widget files...")
-                deleted_count = 0
-                for widget_file in widget_files:
-                    try:
-                        if os.path.exists(widget_file):
-                            os.remove(widget_file)
-                            print(f"  ✅ Deleted: {os.path.basename(widget_file)}")
-                            deleted_count += 1
-                        else:
-                            print(f"  ⚠️ File not found: {os.path.basename(widget_file)}")
-                    except Exception as e:
-                        print(f"  ❌ Could not delete {os.path.basename(widget_file)}: {e}")
-                print(f"✅ Cleaned up {deleted_count}/{len(widget_files)} individual files")
-
-            except Exception as merge_error:
-                print(f"❌ Error during file merging: {str(merge_error)}")
-                return
+                    # Verify merged file was created
+                    if os.path.exists(merged_path):
+                        merged_size = os.path.getsize(merged_path)
+                        print(f"📄 Combined file size: {merged_size} bytes")
+                    else:
+                        print("❌ Combined file was not created!")
+                        return
+
+                    # STEP 2: Delete individual widget files
+                    print(f"\n🗑️ STEP 2: Cleaning up individual widget files...")
+                    deleted_count = 0
+                    for widget_file in widget_files:
+                        try:
+                            if os.path.exists(widget_file):
+                                os.remove(widget_file)
+                                print(f"  ✅ Deleted: {os.path.basename(widget_file)}")
+                                deleted_count += 1
+                            else:
+                                print(f"  ⚠️ File not found: {os.path.basename(widget_file)}")
+                        except Exception as e:
+                            print(f"  ❌ Could not delete {os.path.basename(widget_file)}: {e}")
+                    print(f"✅ Cleaned up {deleted_count}/{len(widget_files)} individual files")
+
+                except Exception as merge_error:
+                    print(f"❌ Error during file merging: {str(merge_error)}")
+                    return
 
             # STEP 3: Submit widget comparison to background
             print(f"\n" + "="*60)
@@ -351,7 +459,7 @@ class WidgetExtractor:
             try:
                 from background_processor import submit_landing_widget_comparison_bg
                 comparison_output_path = os.path.join(widget_dir, "landing_widget_comparison_report.xlsx")
-                task_id = submit_landing_widget_comparison_bg(merged_path, comparison_output_path)
+                task_id = submit_landing_widget_comparison_bg(comparison_input, comparison_output_path)
                 print(f"✅ Landing page widget comparison submitted to background (ID: {task_id})")
                 print("🔄 Continuing with drillthrough while comparison runs in background...")
             except Exception as compare_error:
@@ -377,11 +485,28 @@ class WidgetExtractor:
             print("⚠️ Skipping drillthrough due to missing widget files")
             return  # Exit if no widgets to process
 
+        return self._drillthrough_phase(drill_targets)
+
+    def _drillthrough_phase(self, drill_targets):
+        """Drill through every processed landing widget"""
         # Start drillthrough phase AFTER landing page comparison is complete
         print("\n" + "="*60)
         print("📦 Starting Drillthrough Phase...")
         print("="*60)
 
+        if self.shard_pool is not None and self.shard_pool.size > 1 and len(drill_targets) > 1:
+            # Each session drills through with its own handler and download directory
+            def drill(driver, download_dir, title):
+                print(f"\n🔄 Processing drillthrough for: {title}")
+                DrillthroughHandler(driver, download_dir).drillthrough_widget(title)
+                print(f"✅ Completed drillthrough for: {title}")
+
+            self.shard_pool.run(self.driver, drill_targets, drill)
+            print("\n" + "="*60)
+            print("🎉 All drillthrough operations completed!")
+            print("="*60)
+            return
+
         for idx, title in enumerate(drill_targets, 1):
             print(f"\n🔄 [{idx}/{len(drill_targets)}] Processing drillthrough for: {title}")
             try:
@@ -3,8 +3,28 @@ import os
 from dataBase import DatabaseConnector
 from collections import defaultdict
 from openpyxl import Workbook    
+import time
 from dynamic_comparison_engine import DynamicComparisonEngine
 from config_loader import config_loader
+from sheet_comparison import (
+    compare_sheet,
+    iter_compare_sheet,
+    iter_sheet,
+    build_db_index,
+    db_key_prefixes,
+    sheet_headers,
+    list_sheet_names,
+    resolve_widget_name,
+    sheet_db_subset,
+    run_sheet_tasks,
+    get_sheet_executor
+)
+from comparison_summary import is_summary_path, write_widget_summary
+from comparison_cache import ComparisonCache, sheet_fingerprint, db_fingerprint
+from report_writer import ReportWriter
+from virtual_workbook import open_workbook, workbook_size
+from sp_batch import execute_sp
+from sp_parameters import landing_params
 
 # Import dynamic comparison engine for enhanced functionality
 try:
@@ -37,7 +57,7 @@ def normalize(name: str) -> str:
 
 
 def read_widget_values(excel_path, normalized_map):
-    wb = load_workbook(excel_path, data_only=True)
+    wb = open_workbook(excel_path, read_only=True, data_only=True)
     widget_values = {}
 
     for sheet_name in wb.sheetnames:
@@ -55,13 +75,12 @@ def read_widget_values(excel_path, normalized_map):
             print(f"⚠️ No matching widget name for sheet: {sheet_name}")
             continue
 
-        ws = wb[sheet_name]
-        headers = [str(cell.value).strip().lower() if cell.value else "" for cell in ws[1]]
+        headers, rows = iter_sheet(wb[sheet_name])
 
         if "identifier" in headers and "actual sales" in headers:
             id_idx = headers.index("identifier")
             val_idx = headers.index("actual sales")
-            for row in ws.iter_rows(min_row=2, values_only=True):
+            for row in rows:
                 identifier = str(row[id_idx]).strip() if row[id_idx] else ""
                 value = str(row[val_idx]).strip() if row[val_idx] is not None else "0"
                 widget_values[f"{sheet_name.strip()} - {identifier}"] = value
@@ -70,7 +89,7 @@ def read_widget_values(excel_path, normalized_map):
             id_idx = headers.index("identifier")
             actual_idx = headers.index("actual sales")
             target_idx = headers.index("targets")
-            for row in ws.iter_rows(min_row=2, values_only=True):
+            for row in rows:
                 identifier = str(row[id_idx]).strip() if row[id_idx] else ""
                 if row[actual_idx] is not None:
                     widget_values[f"{sheet_name.strip()} - {identifier}"] = str(row[actual_idx]).strip()
@@ -81,7 +100,7 @@ def read_widget_values(excel_path, normalized_map):
             week_idx = headers.index("week")
             metric_idx = headers.index("metric")
             value_idx = headers.index("value")
-            for row in ws.iter_rows(min_row=2, values_only=True):
+            for row in rows:
                 week = str(row[week_idx]).strip() if row[week_idx] else "Unknown"
                 metric = str(row[metric_idx]).strip() if row[metric_idx] else ""
                 val = str(row[value_idx]).strip() if row[value_idx] is not None else "0"
@@ -91,7 +110,7 @@ def read_widget_values(excel_path, normalized_map):
             id_idx = headers.index("identifier/label")
             metric_idx = headers.index("metric")
             val_idx = headers.index("excel value")
-            for row in ws.iter_rows(min_row=2, values_only=True):
+            for row in rows:
                 identifier = str(row[id_idx]).strip() if row[id_idx] else "Unknown"
                 metric = str(row[metric_idx]).strip() if row[metric_idx] else ""
                 value = str(row[val_idx]).strip() if row[val_idx] is not None else "0"
@@ -101,7 +120,7 @@ def read_widget_values(excel_path, normalized_map):
         elif "previous year" in headers and "current year" in headers:
             prev_idx = headers.index("previous year")
             curr_idx = headers.index("current year")
-            for row in ws.iter_rows(min_row=2, values_only=True):
+            for row in rows:
                 week_label = str(row[0]).strip() if row[0] else "Unknown"
                 if row[prev_idx] is not None:
                     widget_values[f"{sheet_name.strip()} - {week_label} Previous"] = str(row[prev_idx]).strip()
@@ -111,6 +130,7 @@ def read_widget_values(excel_path, normalized_map):
         else:
             print(f"⚠️ Unknown format in sheet: {sheet_name}")
 
+    wb.close()
     return widget_values
 
 
@@ -119,9 +139,7 @@ def fetch_db_widget_values(widget_sp_map, params):
 
     for display_name, sp in widget_sp_map.items():
         try:
-            cursor.execute(f"EXEC [{sp}] ?, ?, ?, ?, ?, ?, ?", params)
-            result = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
+            columns, result = execute_sp(cursor, sp, params)
             print(f"Columns for {sp}: {columns}")  # Debug: Log column names
 
             identifier_col = value_col = target_col = week_col = prev_col = curr_col = None
@@ -185,287 +203,195 @@ def fetch_db_widget_values(widget_sp_map, params):
     return db_widget_data
 
     
-def compare_widget_data(excel_path, db_data, output_path, widget_sp_map):
-    def safe_round(value):
-        try:
-            clean_val = str(value).replace(",", "").replace("$", "").replace("₹", "").replace("K", "").replace("M", "")
-            return round(float(clean_val), 2)
-        except:
-            return value
+def _sheet_widget_name(sheet_name, widget_sp_map):
+    widget_name = resolve_widget_name(sheet_name, widget_sp_map)
+    if not widget_name:
+        print(f"⚠️ Widget name not mapped for sheet '{sheet_name}', using sheet name as fallback.")
+        widget_name = sheet_name
+    return widget_name
 
-    def normalize(name: str) -> str:
-        return ''.join(str(name).lower().strip().replace("_", "").replace(" ", ""))
 
-    if not os.path.exists(excel_path):
-        print("❌ Excel file not found.")
-        return
+def _incremental_enabled():
+    return (config_loader.get_dynamic_engine_config().get("reporting", {}) or {}).get("incremental", True)
 
-    normalized_widget_map = {normalize(v): v for v in widget_sp_map.values()}
-    reverse_widget_map = {normalize(k): k for k in widget_sp_map.keys()}
 
-    wb_source = load_workbook(excel_path, data_only=True)
-    wb_out = Workbook()
-    wb_out.remove(wb_out.active)
+def _compare_sheets(excel_path, db_data, widget_sp_map, mode, sheets=None):
+    """
+    Compare every sheet of the workbook, inline or on the registered sheet executor
 
-    for sheet_name in wb_source.sheetnames:
-        print(f"\n📄 Comparing sheet: {sheet_name}")
-        ws = wb_source[sheet_name]
-        headers = [str(cell.value).strip().lower() if cell.value else "" for cell in ws[1]]
-        col_indices = {h: i for i, h in enumerate(headers)}
+    With reporting.incremental enabled, sheets whose content and DB values are
+    unchanged since the last run reuse the cached verdict, and every output row
+    gets a trailing Provenance column ('fresh' or 'reused').
 
-        id_idx = col_indices.get("identifier") or col_indices.get("identifier/label") or 0
-        actual_idx = col_indices.get("actual sales")
-        target_idx = col_indices.get("targets") or col_indices.get("target")
-        prev_idx = col_indices.get("previous year")
-        curr_idx = col_indices.get("current year")
-        metric_idx = col_indices.get("metric")
-        excelval_idx = col_indices.get("excel value")
+    Args:
+        sheets: Optional sheet names to restrict the comparison to
 
-        output = []
+    Returns:
+        [(sheet_name, header_row, output_rows), ...] in workbook order
+    """
+    executor = get_sheet_executor()
+    cache = ComparisonCache.for_workbook(excel_path, mode) if _incremental_enabled() else None
+    results = []
+
+    if executor is None:
+        wb_source = open_workbook(excel_path, data_only=True)
+        for sheet_name in wb_source.sheetnames:
+            if sheets is not None and sheet_name not in sheets:
+                continue
+            print(f"\n📄 Comparing sheet: {sheet_name}")
+            ws = wb_source[sheet_name]
+            headers = sheet_headers(cell.value for cell in ws[1])
+            rows = ws.iter_rows(min_row=2, values_only=True)
+            widget_name = _sheet_widget_name(sheet_name, widget_sp_map) if mode == "rows" else None
+
+            if cache is None:
+                header, output = compare_sheet(sheet_name, headers, rows, db_data, mode, widget_name)
+                results.append((sheet_name, header, output, None))
+                continue
+
+            rows = list(rows)
+            sheet_hash = sheet_fingerprint(headers, rows)
+            db_hash = db_fingerprint(db_data, db_key_prefixes(sheet_name, mode, widget_name))
+            cached = cache.lookup(sheet_name, sheet_hash, db_hash)
+            if cached:
+                print(f"♻️ Sheet '{sheet_name}' unchanged since last run, reusing verdict")
+                results.append((sheet_name, cached[0], cached[1], "reused"))
+            else:
+                header, output = compare_sheet(sheet_name, headers, rows, db_data, mode, widget_name)
+                cache.store(sheet_name, sheet_hash, db_hash, header, output)
+                results.append((sheet_name, header, output, "fresh"))
+    else:
+        # Sheet-level work is scheduled on the pool; DB values were already fetched by the caller
+        payloads = []
+        db_hashes = {}
+        for sheet_name in list_sheet_names(excel_path):
+            if sheets is not None and sheet_name not in sheets:
+                continue
+            payload = {'excel_path': excel_path, 'sheet_name': sheet_name, 'mode': mode}
+            if mode == "rows":
+                payload['widget_name'] = _sheet_widget_name(sheet_name, widget_sp_map)
+                # Only the keys this sheet can look up (widget and alternative prefixes) cross the pool
+                payload['db_data'] = build_db_index(db_data, db_key_prefixes(sheet_name, mode, payload['widget_name']))
+            else:
+                payload['db_data'] = sheet_db_subset(db_data, sheet_name)
+            if cache is not None:
+                db_hashes[sheet_name] = db_fingerprint(db_data, db_key_prefixes(sheet_name, mode, payload.get('widget_name')))
+                # Only let the worker skip the comparison when the DB side is unchanged too
+                cached = cache.sheets.get(sheet_name)
+                payload['cached_sheet_hash'] = cached['sheet_hash'] if cached and cached['db_hash'] == db_hashes[sheet_name] else None
+            payloads.append(payload)
+
+        print(f"🧮 Comparing {len(payloads)} sheets on the sheet executor...")
+        for r in run_sheet_tasks(payloads, executor):
+            sheet_name = r['sheet_name']
+            if cache is None:
+                results.append((sheet_name, r['header'], r['rows'], None))
+                continue
+            cached = cache.lookup(sheet_name, r['sheet_hash'], db_hashes[sheet_name])
+            if cached and r['reused']:
+                results.append((sheet_name, cached[0], cached[1], "reused"))
+            else:
+                cache.store(sheet_name, r['sheet_hash'], db_hashes[sheet_name], r['header'], r['rows'])
+                results.append((sheet_name, r['header'], r['rows'], "fresh"))
 
-        normalized_sheet = normalize(sheet_name)
-        widget_name = None
-        for norm_key, display_key in reverse_widget_map.items():
-            if norm_key in normalized_sheet:
-                widget_name = display_key
-                break
+    if cache is None:
+        return [(sheet_name, header, output) for sheet_name, header, output, _ in results]
 
-        if not widget_name:
-            print(f"⚠️ Widget name not mapped for sheet '{sheet_name}', using sheet name as fallback.")
-            widget_name = sheet_name
+    # Sheets outside a restricted run keep their cached verdicts
+    cache.save(keep_sheets=None if sheets is not None else [r[0] for r in results])
+    return [
+        (sheet_name, header + ["Provenance"], [list(line) + [provenance] for line in output])
+        for sheet_name, header, output, provenance in results
+    ]
 
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            identifier = str(row[id_idx]).strip() if row[id_idx] else "Unknown"
 
-            def compare_metric(label, col_index, suffix=""):
-                if col_index is not None and row[col_index] is not None:
-                    excel_val = row[col_index]
-                    key = f"{widget_name} - {identifier}" if label == "Actual Sales" else f"{widget_name} - {identifier} {suffix}"
-                    db_val = db_data.get(key, "Not Found")
-                    
-                    # Debug: If not found, try alternative key formats for drillthrough data
-                    if db_val == "Not Found":
-                        alternative_keys = [
-                            f"Weekly Trends - {identifier} {suffix}",
-                            f"Sales Summary_Weekday Weekend - {identifier} {suffix}",
-                            f"Weekly Trends - {identifier.replace(' SALES', '')} {suffix}",
-                            f"Weekly Trends - {identifier.replace(' SALES', '')} SALES {suffix}"
-                        ]
-                        
-                        for alt_key in alternative_keys:
-                            if alt_key in db_data:
-                                print(f"✅ Found alternative key: {alt_key} (was looking for: {key})")
-                                db_val = db_data[alt_key]
-                                break
-                        
-                        if db_val == "Not Found":
-                            print(f"❌ DB value not found for key: {key}")
-                            print(f"🔍 Available keys containing '{identifier}': {[k for k in db_data.keys() if identifier in k][:3]}")
-                    
-                    excel_rounded = safe_round(excel_val)
-                    db_rounded = safe_round(db_val)
-                    status = "Match" if excel_rounded == db_rounded else "Mismatch"
-                    output.append([identifier, label, excel_rounded, db_rounded, status])
+def _use_streaming(excel_path):
+    """Stream when reporting.streaming is set or the export is at least streaming_min_file_mb"""
+    reporting = config_loader.get_dynamic_engine_config().get("reporting", {}) or {}
+    if reporting.get("streaming", False):
+        return True
+    min_mb = reporting.get("streaming_min_file_mb")
+    return bool(min_mb) and workbook_size(excel_path) >= min_mb * 1024 * 1024
 
-            compare_metric("Actual Sales", actual_idx)
-            compare_metric("Target", target_idx, "Target")
-            compare_metric("Previous Year", prev_idx, "Previous Year")
-            compare_metric("Current Year", curr_idx, "Current Year")
 
-            if metric_idx is not None and excelval_idx is not None:
-                metric = str(row[metric_idx]).strip() if row[metric_idx] else ""
-                excel_val = row[excelval_idx]
-                key = f"{widget_name} - {identifier} {metric}"
-                db_val = db_data.get(key, "Not Found")
-                excel_rounded = safe_round(excel_val)
-                db_rounded = safe_round(db_val)
-                status = "Match" if excel_rounded == db_rounded else "Mismatch"
-                if db_val == "Not Found":
-                    print(f"❌ DB value not found for key: {key}")
-                output.append([identifier, metric, excel_rounded, db_rounded, status])
+def _stream_sheets(excel_path, db_data, widget_sp_map, mode, sheets=None):
+    """
+    Streaming variant of _compare_sheets for very large widget exports
 
-        if output:
-            ws_out = wb_out.create_sheet(title=sheet_name[:31])
-            ws_out.append(["Identifier/Label", "Metric", "Excel Value", "DB Value", "Status"])
-            for line in output:
-                ws_out.append(line)
-            print(f"✅ Sheet '{sheet_name}' compared with {len(output)} rows.")
-        else:
-            print(f"⚠️ No comparable data in sheet: {sheet_name}")
+    The source is opened read-only and each sheet is walked once as a row
+    generator, with DB values looked up in a per-sheet prebuilt index, so
+    memory stays bounded by one row rather than one sheet. The sheet cache
+    and sheet executor are not used on this path.
+
+    Yields:
+        (sheet_name, header_row, output_row_generator); consume each generator
+        before advancing to the next sheet
+    """
+    wb_source = open_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        for sheet_name in wb_source.sheetnames:
+            if sheets is not None and sheet_name not in sheets:
+                continue
+            print(f"\n📄 Streaming sheet: {sheet_name}")
+            headers, rows = iter_sheet(wb_source[sheet_name])
+            widget_name = _sheet_widget_name(sheet_name, widget_sp_map) if mode == "rows" else None
+            db_index = build_db_index(db_data, db_key_prefixes(sheet_name, mode, widget_name))
+            header, output = iter_compare_sheet(sheet_name, headers, rows, db_index, mode, widget_name)
+            yield sheet_name, header, output
+    finally:
+        wb_source.close()
+
+
+def compare_widget_data(excel_path, db_data, output_path, widget_sp_map, sheets=None):
+    if not os.path.exists(excel_path):
+        print("❌ Excel file not found.")
+        return
+
+    start = time.perf_counter()
+    compare_sheets = _stream_sheets if _use_streaming(excel_path) else _compare_sheets
+    results = compare_sheets(excel_path, db_data, widget_sp_map, "rows", sheets)
+
+    # Gating runs: compact JSON verdict instead of a workbook
+    if is_summary_path(output_path):
+        return write_widget_summary(output_path, excel_path, results, db_data, "rows",
+                                    widget_sp_map, time.perf_counter() - start)
+
+    with ReportWriter(output_path) as report:
+        for sheet_name, header, output in results:
+            output = iter(output)
+            first_line = next(output, None)
+            if first_line is not None:
+                ws_out = report.add_sheet(sheet_name, header)
+                ws_out.append(first_line)
+                ws_out.extend(output)
+                print(f"✅ Sheet '{sheet_name}' compared with {ws_out.row_count - 1} rows.")
+            else:
+                print(f"⚠️ No comparable data in sheet: {sheet_name}")
 
-    wb_out.save(output_path)
     print(f"\n📊 Comparison report saved at: {output_path}")
 
-def compare_widget_data_preserve_structure(excel_path, db_data, output_path, widget_sp_map):
+def compare_widget_data_preserve_structure(excel_path, db_data, output_path, widget_sp_map, sheets=None):
     """
     Enhanced comparison that preserves Excel column structure instead of converting to rows
     """
-    def safe_round(value):
-        try:
-            clean_val = str(value).replace(",", "").replace("$", "").replace("₹", "").replace("K", "").replace("M", "")
-            return round(float(clean_val), 2)
-        except:
-            return value
-
-    def normalize(name: str) -> str:
-        return ''.join(str(name).lower().strip().replace("_", "").replace(" ", ""))
-
     if not os.path.exists(excel_path):
         print("❌ Excel file not found.")
         return
 
-    wb_source = load_workbook(excel_path, data_only=True)
-    wb_out = Workbook()
-    wb_out.remove(wb_out.active)
+    start = time.perf_counter()
+    compare_sheets = _stream_sheets if _use_streaming(excel_path) else _compare_sheets
+    results = compare_sheets(excel_path, db_data, widget_sp_map, "preserve", sheets)
 
-    for sheet_name in wb_source.sheetnames:
-        print(f"\n📄 Comparing sheet: {sheet_name}")
-        ws = wb_source[sheet_name]
-        headers = [str(cell.value).strip().lower() if cell.value else "" for cell in ws[1]]
-        col_indices = {h: i for i, h in enumerate(headers)}
+    # Gating runs: compact JSON verdict instead of a workbook
+    if is_summary_path(output_path):
+        return write_widget_summary(output_path, excel_path, results, db_data, "preserve",
+                                    widget_sp_map, time.perf_counter() - start)
 
-        # Create output sheet with same structure as input
-        ws_out = wb_out.create_sheet(title=sheet_name[:31])
-        
-        # Determine the structure type
-        has_targets = "targets" in headers or "target" in headers
-        has_prev_curr = "previous year" in headers and "current year" in headers
-        has_metric_value = "metric" in headers and "excel value" in headers
-        
-        if has_targets:
-            # Structure: Identifier | Excel Actual | DB Actual | Actual Status | Excel Target | DB Target | Target Status
-            ws_out.append(["Identifier", "Excel Actual Sales", "DB Actual Sales", "Actual Sales Status", "Excel Targets", "DB Targets", "Target Status"])
-            
-            id_idx = col_indices.get("identifier", 0)
-            actual_idx = col_indices.get("actual sales")
-            target_idx = col_indices.get("targets") or col_indices.get("target")
-            
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                identifier = str(row[id_idx]).strip() if row[id_idx] else "Unknown"
-                
-                # Get Excel values
-                excel_actual = row[actual_idx] if actual_idx is not None and len(row) > actual_idx else None
-                excel_target = row[target_idx] if target_idx is not None and len(row) > target_idx else None
-                
-                # Get DB values
-                actual_key = f"{sheet_name} - {identifier}"
-                target_key = f"{sheet_name} - {identifier} Target"
-                
-                db_actual = db_data.get(actual_key, "Not Found")
-                db_target = db_data.get(target_key, "Not Found")
-                
-                # Compare values
-                actual_status = "Match"
-                target_status = "Match"
-                
-                if excel_actual is not None:
-                    excel_actual_rounded = safe_round(excel_actual)
-                    db_actual_rounded = safe_round(db_actual) if db_actual != "Not Found" else "Not Found"
-                    actual_status = "Match" if excel_actual_rounded == db_actual_rounded else "Mismatch"
-                    if db_actual == "Not Found":
-                        actual_status = "Not Found"
-                
-                if excel_target is not None:
-                    excel_target_rounded = safe_round(excel_target)
-                    db_target_rounded = safe_round(db_target) if db_target != "Not Found" else "Not Found"
-                    target_status = "Match" if excel_target_rounded == db_target_rounded else "Mismatch"
-                    if db_target == "Not Found":
-                        target_status = "Not Found"
-                
-                ws_out.append([
-                    identifier,
-                    excel_actual,
-                    db_actual,
-                    actual_status,
-                    excel_target,
-                    db_target,
-                    target_status
-                ])
-        
-        elif has_prev_curr:
-            # Structure: Identifier | Excel Previous | DB Previous | Previous Status | Excel Current | DB Current | Current Status
-            ws_out.append(["Identifier", "Excel Previous Year", "DB Previous Year", "Previous Year Status", "Excel Current Year", "DB Current Year", "Current Year Status"])
-            
-            id_idx = col_indices.get("identifier", 0)
-            prev_idx = col_indices.get("previous year")
-            curr_idx = col_indices.get("current year")
-            
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                identifier = str(row[id_idx]).strip() if row[id_idx] else "Unknown"
-                
-                # Get Excel values
-                excel_prev = row[prev_idx] if prev_idx is not None and len(row) > prev_idx else None
-                excel_curr = row[curr_idx] if curr_idx is not None and len(row) > curr_idx else None
-                
-                # Get DB values
-                prev_key = f"{sheet_name} - {identifier} Previous Year"
-                curr_key = f"{sheet_name} - {identifier} Current Year"
-                
-                db_prev = db_data.get(prev_key, "Not Found")
-                db_curr = db_data.get(curr_key, "Not Found")
-                
-                # Compare values
-                prev_status = "Match"
-                curr_status = "Match"
-                
-                if excel_prev is not None:
-                    excel_prev_rounded = safe_round(excel_prev)
-                    db_prev_rounded = safe_round(db_prev) if db_prev != "Not Found" else "Not Found"
-                    prev_status = "Match" if excel_prev_rounded == db_prev_rounded else "Mismatch"
-                    if db_prev == "Not Found":
-                        prev_status = "Not Found"
-                
-                if excel_curr is not None:
-                    excel_curr_rounded = safe_round(excel_curr)
-                    db_curr_rounded = safe_round(db_curr) if db_curr != "Not Found" else "Not Found"
-                    curr_status = "Match" if excel_curr_rounded == db_curr_rounded else "Mismatch"
-                    if db_curr == "Not Found":
-                        curr_status = "Not Found"
-                
-                ws_out.append([
-                    identifier,
-                    excel_prev,
-                    db_prev,
-                    prev_status,
-                    excel_curr,
-                    db_curr,
-                    curr_status
-                ])
-        
-        else:
-            # Standard structure: Identifier | Excel Actual Sales | DB Actual Sales | Status
-            ws_out.append(["Identifier", "Excel Actual Sales", "DB Actual Sales", "Status"])
-            
-            id_idx = col_indices.get("identifier", 0)
-            actual_idx = col_indices.get("actual sales")
-            
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                identifier = str(row[id_idx]).strip() if row[id_idx] else "Unknown"
-                
-                # Get Excel value
-                excel_actual = row[actual_idx] if actual_idx is not None and len(row) > actual_idx else None
-                
-                # Get DB value
-                actual_key = f"{sheet_name} - {identifier}"
-                db_actual = db_data.get(actual_key, "Not Found")
-                
-                # Compare values
-                status = "Match"
-                if excel_actual is not None:
-                    excel_actual_rounded = safe_round(excel_actual)
-                    db_actual_rounded = safe_round(db_actual) if db_actual != "Not Found" else "Not Found"
-                    status = "Match" if excel_actual_rounded == db_actual_rounded else "Mismatch"
-                    if db_actual == "Not Found":
-                        status = "Not Found"
-                
-                ws_out.append([
-                    identifier,
-                    excel_actual,
-                    db_actual,
-                    status
-                ])
+    # Create output sheet with same structure as input
+    with ReportWriter(output_path) as report:
+        for sheet_name, header, output in results:
+            report.write_sheet(sheet_name, header, output)
 
-    wb_out.save(output_path)
     print(f"\n📊 Enhanced comparison report saved at: {output_path}")
 
 def dynamic_compare_widget_data(excel_path, output_path, params=None):
@@ -482,7 +408,7 @@ def dynamic_compare_widget_data(excel_path, output_path, params=None):
         
         # Use default parameters if not provided
         if params is None:
-            params = (2024, None, None, None, None, None, None)
+            params = landing_params()
         
         # Initialize dynamic engine
         dynamic_engine = DynamicComparisonEngine()
@@ -511,7 +437,7 @@ def dynamic_compare_widget_data(excel_path, output_path, params=None):
         # Fallback to legacy method
         try:
             if params is None:
-                params = (2024, None, None, None, None, None, None)
+                params = landing_params()
             db_values = fetch_db_widget_values(widget_sp_map, params)
             compare_widget_data(excel_path, db_values, output_path, widget_sp_map)
             return True
@@ -537,7 +463,7 @@ def dynamic_compare_widget_data(excel_path, output_path, params=None):
     normalized_widget_map = {normalize(v): v for v in widget_sp_map.values()}
     reverse_widget_map = {normalize(k): k for k in widget_sp_map.keys()}
 
-    wb_source = load_workbook(excel_path, data_only=True)
+    wb_source = open_workbook(excel_path, data_only=True)
     wb_out = Workbook()
     wb_out.remove(wb_out.active)
 
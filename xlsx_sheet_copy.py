@@ -0,0 +1,261 @@
+"""
+XLSX SHEET PART COPY
+====================
+Merge the first worksheet of several .xlsx files into one workbook by copying
+worksheet XML between zip containers, without parsing cells into Python objects.
+
+Cell XML is copied as-is apart from references that only make sense inside
+the source package:
+  - shared string indexes become inline strings
+  - style ids are dropped (date-formatted numbers keep a single date style)
+  - formulas are dropped, their cached values are kept (like data_only reads)
+  - sheet parts that need other package parts (drawings, hyperlinks, tables,
+    conditional formats, ...) are not copied; only <sheetData> is
+
+Fully empty rows at the end of a sheet are dropped, as pandas.read_excel does.
+Anything unexpected raises XlsxCopyError so callers can fall back to a
+row-streaming merge.
+"""
+
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+from typing import List, Tuple
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_SHEET_DATA_RE = re.compile(r'<sheetData\s*/>|<sheetData\b[^>]*>(.*?)</sheetData>', re.S)
+_ROW_RE = re.compile(r'<row\b([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+_CELL_RE = re.compile(r'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_ATTR_RE = re.compile(r'\b(r|t|s)="([^"]*)"')
+_VALUE_RE = re.compile(r'<v>(.*?)</v>|<v/>', re.S)
+_INLINE_RE = re.compile(r'<is>.*?</is>', re.S)
+_INVALID_TITLE_RE = re.compile(r'[\\/*?:\[\]]')
+
+DATE_STYLE = '1'  # cellXfs index of the date format in the merged styles.xml
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{overrides}</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<Relationships xmlns="{PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<styleSheet xmlns="{MAIN_NS}">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+class XlsxCopyError(Exception):
+    """The source package does not have the structure the part copy expects"""
+
+
+def _resolve(base_dir: str, target: str) -> str:
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def _first_sheet_parts(zf: zipfile.ZipFile) -> Tuple[str, str, str]:
+    """Paths of the first worksheet, shared strings and styles parts (None when absent)"""
+    root_rels = ET.fromstring(zf.read('_rels/.rels'))
+    workbook_path = next(
+        (_resolve('', rel.get('Target')) for rel in root_rels
+         if rel.get('Type', '').endswith('/officeDocument')), None)
+    if not workbook_path:
+        raise XlsxCopyError("no workbook part")
+
+    workbook_dir = posixpath.dirname(workbook_path)
+    rels_path = posixpath.join(workbook_dir, '_rels', posixpath.basename(workbook_path) + '.rels')
+    rels = {rel.get('Id'): rel for rel in ET.fromstring(zf.read(rels_path))}
+
+    sheets = ET.fromstring(zf.read(workbook_path)).find(f'{{{MAIN_NS}}}sheets')
+    if sheets is None or not len(sheets):
+        raise XlsxCopyError("workbook has no sheets")
+    first_rel = rels[sheets[0].get(f'{{{REL_NS}}}id')]
+
+    def part(kind):
+        return next((_resolve(workbook_dir, rel.get('Target')) for rel in rels.values()
+                     if rel.get('Type', '').endswith(kind)), None)
+
+    return _resolve(workbook_dir, first_rel.get('Target')), part('/sharedStrings'), part('/styles')
+
+
+def _shared_strings(zf: zipfile.ZipFile, path: str) -> List[str]:
+    """Plain text of each shared string item (rich text runs joined, phonetic runs skipped)"""
+    if not path:
+        return []
+    strings = []
+    t_tag, r_tag, si_tag = f'{{{MAIN_NS}}}t', f'{{{MAIN_NS}}}r', f'{{{MAIN_NS}}}si'
+    with zf.open(path) as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag == si_tag:
+                parts = []
+                for child in elem:
+                    if child.tag == t_tag:
+                        parts.append(child.text or '')
+                    elif child.tag == r_tag:
+                        parts.extend(t.text or '' for t in child.iter(t_tag))
+                strings.append(''.join(parts))
+                elem.clear()
+    return strings
+
+
+def _date_style_ids(zf: zipfile.ZipFile, path: str) -> set:
+    """cellXfs indexes whose number format is a date/time format"""
+    if not path:
+        return set()
+    root = ET.fromstring(zf.read(path))
+    custom = {
+        int(fmt.get('numFmtId')): fmt.get('formatCode', '')
+        for fmt in root.iter(f'{{{MAIN_NS}}}numFmt')
+    }
+    cell_xfs = root.find(f'{{{MAIN_NS}}}cellXfs')
+    date_ids = set()
+    for i, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+        fmt_id = int(xf.get('numFmtId', 0))
+        code = custom.get(fmt_id, BUILTIN_FORMATS.get(fmt_id, ''))
+        if code and is_date_format(code):
+            date_ids.add(str(i))
+    return date_ids
+
+
+def _copy_sheet_data(sheet_xml: str, strings: List[str], date_styles: set) -> str:
+    """Rewrite <sheetData> rows so they no longer depend on the source package"""
+    match = _SHEET_DATA_RE.search(sheet_xml)
+    if match is None:
+        raise XlsxCopyError("no <sheetData> (prefixed or unexpected worksheet XML)")
+    body = match.group(1) or ''
+    values_in_row = [0]
+
+    def copy_cell(cell_match):
+        attrs = dict(_ATTR_RE.findall(cell_match.group(1)))
+        content = cell_match.group(2) or ''
+        ref = f' r="{attrs["r"]}"' if 'r' in attrs else ''
+        cell_type = attrs.get('t', 'n')
+
+        inline = _INLINE_RE.search(content) if cell_type == 'inlineStr' else None
+        value = _VALUE_RE.search(content)
+        if inline is None and (value is None or value.group(1) is None):
+            # Empty (style-only) cell; positional cells without r keep a placeholder
+            return '' if ref else '<c/>'
+
+        values_in_row[0] += 1
+        if inline is not None:
+            return f'<c{ref} t="inlineStr">{inline.group(0)}</c>'
+        value = value.group(1)
+
+        if cell_type == 's':
+            text = escape(strings[int(value)])
+            return f'<c{ref} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+        if cell_type in ('str', 'b', 'e', 'd'):
+            return f'<c{ref} t="{cell_type}"><v>{value}</v></c>'
+        style = f' s="{DATE_STYLE}"' if attrs.get('s') in date_styles else ''
+        return f'<c{ref}{style}><v>{value}</v></c>'
+
+    rows = []
+    last_non_empty = -1
+    for row_match in _ROW_RE.finditer(body):
+        row_ref = re.search(r'\br="(\d+)"', row_match.group(1))
+        values_in_row[0] = 0
+        cells = _CELL_RE.sub(copy_cell, row_match.group(2) or '')
+        row_attrs = f' r="{row_ref.group(1)}"' if row_ref else ''
+        rows.append(f'<row{row_attrs}>{cells}</row>' if cells else f'<row{row_attrs}/>')
+        if values_in_row[0]:
+            last_non_empty = len(rows) - 1
+
+    return ''.join(rows[:last_non_empty + 1])
+
+
+def merge_first_sheets(sources: List[Tuple[str, str]], output_path: str):
+    """
+    Write a workbook with one sheet per source file
+
+    Args:
+        sources: [(xlsx_path, sheet_title), ...]; titles must be unique and valid
+        output_path: Merged .xlsx path
+    """
+    sheet_entries = []
+    overrides = []
+    rels = []
+
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as out:
+        for index, (path, title) in enumerate(sources, start=1):
+            if _INVALID_TITLE_RE.search(title) or not title:
+                raise XlsxCopyError(f"invalid sheet title: {title!r}")
+            with zipfile.ZipFile(path) as zf:
+                sheet_path, strings_path, styles_path = _first_sheet_parts(zf)
+                sheet_data = _copy_sheet_data(
+                    zf.read(sheet_path).decode('utf-8'),
+                    _shared_strings(zf, strings_path),
+                    _date_style_ids(zf, styles_path)
+                )
+
+            out.writestr(
+                f'xl/worksheets/sheet{index}.xml',
+                f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<worksheet xmlns="{MAIN_NS}"><sheetData>{sheet_data}</sheetData></worksheet>'
+            )
+            name = escape(title, {'"': '&quot;'})
+            sheet_entries.append(f'<sheet name="{name}" sheetId="{index}" r:id="rId{index}"/>')
+            rels.append(f'<Relationship Id="rId{index}" Type="{REL_NS}/worksheet" Target="worksheets/sheet{index}.xml"/>')
+            overrides.append(
+                f'<Override PartName="/xl/worksheets/sheet{index}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            )
+
+        styles_id = len(sources) + 1
+        rels.append(f'<Relationship Id="rId{styles_id}" Type="{REL_NS}/styles" Target="styles.xml"/>')
+
+        out.writestr('[Content_Types].xml', _CONTENT_TYPES.format(overrides=''.join(overrides)))
+        out.writestr('_rels/.rels', _ROOT_RELS)
+        out.writestr(
+            'xl/workbook.xml',
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}"><sheets>{"".join(sheet_entries)}</sheets></workbook>'
+        )
+        out.writestr(
+            'xl/_rels/workbook.xml.rels',
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<Relationships xmlns="{PKG_REL_NS}">{"".join(rels)}</Relationships>'
+        )
+        out.writestr('xl/styles.xml', _STYLES)
+
+
+def unique_sheet_titles(titles: List[str]) -> List[str]:
+    """Truncate to 31 characters and de-duplicate case-insensitively (Title, Title1, Title2, ...)"""
+    used = set()
+    result = []
+    for title in titles:
+        title = title[:31]
+        candidate = title
+        n = 0
+        while candidate.lower() in used:
+            n += 1
+            candidate = title[:31 - len(str(n))] + str(n)
+        used.add(candidate.lower())
+        result.append(candidate)
+    return result